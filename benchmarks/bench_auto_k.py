@@ -0,0 +1,61 @@
+"""Time of the automatic k recommendation on planted clusters, in total and per candidate k.
+
+The per-k times bound what parallel workers can save: with one k per core the scoring
+cannot finish faster than the slowest k plus the shared sampling and distance matrix.
+
+    python -m benchmarks.bench_auto_k --rows 120000 --dim 768 --clusters 7
+"""
+import argparse
+import time
+import numpy as np
+from sklearn.metrics import pairwise_distances
+
+from utils.auto_k import recommend_k, stratified_sample, score_k, CANDIDATE_KS, SAMPLE_ROWS, SCORE_ROWS
+
+
+def planted(rows, dim, clusters, days, seed=42):
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dim)).astype(np.float32) * 3
+    labels = rng.integers(0, clusters, rows)
+    embeddings = centers[labels] + rng.standard_normal((rows, dim), dtype=np.float32)
+    # Skewed days, the way busy opening days dominate a range
+    strata = rng.zipf(1.5, rows) % days
+    return embeddings, strata
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=120_000)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--clusters", type=int, default=7)
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--n-jobs", type=int, default=-1)
+    args = parser.parse_args()
+
+    embeddings, strata = planted(args.rows, args.dim, args.clusters, args.days)
+
+    start = time.perf_counter()
+    best, curve = recommend_k(embeddings, strata, n_jobs=args.n_jobs)
+    total = time.perf_counter() - start
+    print(f"recommend_k on {args.rows} x {args.dim} ({args.clusters} planted): k = {best} in {total:.2f}s (n_jobs={args.n_jobs})")
+
+    # The same work step by step, one k at a time
+    start = time.perf_counter()
+    positions = stratified_sample(strata, SAMPLE_ROWS)
+    sample = embeddings[positions]
+    scored = stratified_sample(strata[positions], SCORE_ROWS)
+    distances = pairwise_distances(sample[scored])
+    shared = time.perf_counter() - start
+    print(f"sample + shared distance matrix  {shared:.2f}s")
+    per_k = {}
+    for k in CANDIDATE_KS:
+        start = time.perf_counter()
+        score_k(sample, k, scored, distances)
+        per_k[k] = time.perf_counter() - start
+        print(f"k = {k:>2}                          {per_k[k]:.2f}s")
+    print(f"sum over k                       {sum(per_k.values()):.2f}s")
+    print(f"slowest k + shared work          {max(per_k.values()) + shared:.2f}s (lower bound with one k per core)")
+
+
+if __name__ == "__main__":
+    main()
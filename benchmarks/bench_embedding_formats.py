@@ -0,0 +1,73 @@
+"""Blob size, decode time and accuracy of the embedding storage formats.
+
+Accuracy is measured against float32 on clustered synthetic embeddings: the largest
+error in query/response cosine similarity and the agreement (adjusted Rand index) of
+k-means run with the same seed on the decoded matrices.
+
+    python -m benchmarks.bench_embedding_formats --rows 100000 --dim 768
+"""
+import argparse
+import time
+import numpy as np
+from sklearn.cluster import KMeans
+from sklearn.metrics import adjusted_rand_score
+
+from utils.embedding_codec import FORMATS, encode_embeddings, decode_embeddings
+
+
+COSINE_TOLERANCE = {"float32": 0.0, "float16": 1e-4, "int8": 5e-3}
+ARI_TOLERANCE = 0.98
+
+
+def clustered(rows, dim, clusters, rng):
+    centers = rng.standard_normal((clusters, dim)).astype(np.float32)
+    labels = rng.integers(0, clusters, rows)
+    return centers[labels] + 0.5 * rng.standard_normal((rows, dim)).astype(np.float32)
+
+
+def cosine(a, b):
+    return np.einsum("ij,ij->i", a, b) / (np.linalg.norm(a, axis=1) * np.linalg.norm(b, axis=1))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--clusters", type=int, default=8)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    queries = clustered(args.rows, args.dim, args.clusters, rng)
+    responses = queries + 0.5 * rng.standard_normal(queries.shape).astype(np.float32)
+    reference = cosine(queries, responses)
+    sample = queries[:min(args.rows, 20_000)]
+    reference_labels = KMeans(args.clusters, random_state=42, n_init="auto").fit_predict(sample)
+    legacy = [row.tobytes() for row in queries]
+
+    start = time.perf_counter()
+    decode_embeddings(legacy)
+    print(f"{'legacy':<8} {len(legacy[0]):>6} B/row  decode {time.perf_counter() - start:.2f}s")
+
+    failed = False
+    for fmt in FORMATS:
+        blobs_q = encode_embeddings(queries, fmt)
+        start = time.perf_counter()
+        decoded_q = decode_embeddings(blobs_q)
+        decode_time = time.perf_counter() - start
+        decoded_r = decode_embeddings(encode_embeddings(responses, fmt))
+
+        cosine_error = np.abs(cosine(decoded_q, decoded_r) - reference).max()
+        labels = KMeans(args.clusters, random_state=42, n_init="auto").fit_predict(decoded_q[:len(sample)])
+        ari = adjusted_rand_score(reference_labels, labels)
+        ok = cosine_error <= COSINE_TOLERANCE[fmt] + 1e-6 and ari >= ARI_TOLERANCE
+        failed |= not ok
+        print(
+            f"{fmt:<8} {len(blobs_q[0]):>6} B/row  decode {decode_time:.2f}s  "
+            f"max cosine error {cosine_error:.2e}  k-means ARI {ari:.4f}  {'ok' if ok else 'OUT OF TOLERANCE'}"
+        )
+    if failed:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
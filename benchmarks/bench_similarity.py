@@ -0,0 +1,85 @@
+"""Scaling of the query/response similarity kernels from 10k to 1M rows.
+
+Embeddings are written block by block to memory-mapped files, as in the embedding
+store, so the 1M row case runs without holding the matrices in memory. The old
+np.diag(cosine_similarity(Q, R)) is timed only where its n x n matrix fits the limit.
+
+    python -m benchmarks.bench_similarity --sizes 10000 100000 1000000 --dim 768
+"""
+import os
+import argparse
+import tempfile
+import time
+import numpy as np
+from sklearn.metrics.pairwise import cosine_similarity
+
+from utils.similarity import rowwise_cosine, upper_triangle, pairwise_cosine
+
+
+GENERATE_BLOCK = 65536
+DIAG_LIMIT_BYTES = 2 << 30
+
+
+def memmap_embeddings(path, rows, dim, rng):
+    matrix = np.memmap(path, dtype=np.float32, mode="w+", shape=(rows, dim))
+    for start in range(0, rows, GENERATE_BLOCK):
+        stop = min(start + GENERATE_BLOCK, rows)
+        matrix[start:stop] = rng.standard_normal((stop - start, dim), dtype=np.float32)
+    matrix.flush()
+    return np.memmap(path, dtype=np.float32, mode="r", shape=(rows, dim))
+
+
+def check(dim, rng):
+    # The kernels against sklearn on a size both can handle
+    a = rng.standard_normal((2000, dim)).astype(np.float32)
+    b = rng.standard_normal((2000, dim)).astype(np.float32)
+    a[3] = 0
+    reference = cosine_similarity(a, b)
+    errors = {
+        "rowwise": np.abs(rowwise_cosine(a, b, block=333) - np.diag(reference)).max(),
+        "pairwise": np.abs(pairwise_cosine(a, b, memory_bytes=1 << 20) - reference).max(),
+        "upper triangle": np.abs(
+            upper_triangle(a, memory_bytes=1 << 20) - cosine_similarity(a)[np.triu_indices(len(a), k=1)]
+        ).max(),
+    }
+    for name, error in errors.items():
+        print(f"{name:<15} max error vs sklearn {error:.2e}")
+    return max(errors.values()) < 1e-5
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--dir", default=None, help="where the memory-mapped inputs go (needs 2 x rows x dim x 4 bytes)")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    ok = check(args.dim, rng)
+
+    with tempfile.TemporaryDirectory(dir=args.dir) as directory:
+        for rows in args.sizes:
+            queries = memmap_embeddings(os.path.join(directory, "q.bin"), rows, args.dim, rng)
+            responses = memmap_embeddings(os.path.join(directory, "r.bin"), rows, args.dim, rng)
+
+            start = time.perf_counter()
+            rowwise_cosine(queries, responses)
+            rowwise_time = time.perf_counter() - start
+
+            if rows * rows * 8 <= DIAG_LIMIT_BYTES:
+                start = time.perf_counter()
+                np.diag(cosine_similarity(queries, responses))
+                diag = f"{time.perf_counter() - start:8.2f}s"
+            else:
+                diag = f"skipped (n x n needs {rows * rows * 8 / 2**30:,.0f} GiB)"
+            print(
+                f"rows {rows:>9,}  rowwise {rowwise_time:7.2f}s  "
+                f"({rows / rowwise_time:,.0f} rows/s)  diag(cosine_similarity) {diag}"
+            )
+            del queries, responses
+    if not ok:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""Cold start on a synthetic interactions_all: DB-style rows vs the local Arrow snapshot.
+
+The "before" path builds the frame from row tuples with one embedding blob per cell, the
+way `fetch_to_df` hands them over, and decodes every blob on its own. It leaves out the
+network transfer itself, so the real gap is larger. The last timing upserts a few rows
+behind the watermark, which only rewrites the snapshot parts they fall in.
+
+The 1M x 768 default holds about 6 GiB of embedding blobs in memory for the "before" path.
+--append grows the snapshot block by block instead and skips the in-memory paths.
+
+    python -m benchmarks.bench_snapshot --rows 1000000 --dim 768
+    python -m benchmarks.bench_snapshot --rows 1000000 --dim 768 --append
+"""
+import argparse
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+
+from utils.snapshot import Snapshot
+
+
+QUERIES = ["화장실 어디야", "전시관 안내해줘", "몇 시에 닫아", "안녕", "공룡 전시 어디 있어", "주차장 어디야"]
+RESPONSES = ["화장실은 1층에 있습니다.", "전시관으로 안내할게요.", "오후 6시에 닫습니다.", "안녕하세요!", "공룡 전시는 2층입니다."]
+GENERATE_BLOCK = 65536
+TOUCHED_ROWS = 100
+
+
+def synthetic_rows(rows, dim, seed=42):
+    rng = np.random.default_rng(seed)
+    timestamps = pd.Timestamp("2024-01-01") + pd.to_timedelta(np.sort(rng.integers(0, 365 * 86400, rows)), unit="s")
+    timestamps = timestamps + pd.to_timedelta(np.arange(rows) % 1000, unit="us")
+    data = pd.DataFrame({
+        "timestamp": timestamps,
+        "user_query": np.array(QUERIES, dtype=object)[rng.integers(0, len(QUERIES), rows)],
+        "response": np.array(RESPONSES, dtype=object)[rng.integers(0, len(RESPONSES), rows)],
+        "latency": rng.integers(200, 3000, rows),
+    })
+    data["query_stemmed_words"] = data["user_query"]
+    data["response_stemmed_words"] = data["response"]
+    data["status"] = '{"location": {"lat": 1.0, "lon": 2.0}}'
+    for name in ["query_embedding", "response_embedding"]:
+        # Block by block, only the blobs are kept
+        blobs = []
+        for start in range(0, rows, GENERATE_BLOCK):
+            matrix = rng.standard_normal((min(GENERATE_BLOCK, rows - start), dim), dtype=np.float32)
+            blobs.extend(row.tobytes() for row in matrix)
+        data[name] = blobs
+    return data
+
+
+def load_from_rows(records, columns):
+    # What get_data did after the transfer
+    data = pd.DataFrame(records, columns=columns)
+    data["timestamp"] = pd.to_datetime(data["timestamp"]) + pd.Timedelta(hours=9)
+    data = data.sort_values(by="timestamp")
+    data["query_embedding"] = data["query_embedding"].apply(lambda x: np.frombuffer(x, dtype=np.float32))
+    data["response_embedding"] = data["response_embedding"].apply(lambda x: np.frombuffer(x, dtype=np.float32))
+    return data
+
+
+def touch(snapshot, touched):
+    # Rows re-uploaded from the middle of the table, as after an ON DUPLICATE KEY UPDATE
+    touched = touched.copy()
+    touched["latency"] = touched["latency"] + 1
+    parts = {part["name"] for part in snapshot.manifest()["parts"]}
+    start = time.perf_counter()
+    snapshot.upsert(touched)
+    rewrite = time.perf_counter() - start
+    rewritten = len(parts - {part["name"] for part in snapshot.manifest()["parts"]})
+    print(f"upsert {len(touched)} rows behind the watermark           {rewrite:.2f}s ({rewritten} of {len(parts)} parts rewritten)")
+
+
+def append_blocks(snapshot, rows, dim):
+    # The snapshot grown the way sync_snapshot grows it, one delta at a time
+    touched = None
+    for i, start in enumerate(range(0, rows, GENERATE_BLOCK)):
+        block = synthetic_rows(min(GENERATE_BLOCK, rows - start), dim, seed=i)
+        block["timestamp"] = block["timestamp"] + pd.Timedelta(days=366 * i)
+        if touched is None and start + GENERATE_BLOCK >= rows // 2:
+            touched = block.iloc[:TOUCHED_ROWS]
+        snapshot.upsert(block)
+    return touched
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument(
+        "--append", action="store_true",
+        help="build the snapshot block by block and skip the in-memory paths, for sizes that do not fit in memory",
+    )
+    args = parser.parse_args()
+
+    if args.append:
+        with tempfile.TemporaryDirectory() as directory:
+            snapshot = Snapshot(directory)
+            start = time.perf_counter()
+            touched = append_blocks(snapshot, args.rows, args.dim)
+            print(f"snapshot of {args.rows} rows (dim {args.dim}) appended in {time.perf_counter() - start:.2f}s")
+
+            start = time.perf_counter()
+            snapshot.read(["timestamp", "latency", "user_query", "response"])
+            print(f"after:  snapshot core + text columns                 {time.perf_counter() - start:.2f}s")
+
+            start = time.perf_counter()
+            snapshot.read_embeddings([(touched["timestamp"].min(), touched["timestamp"].max())])
+            print(f"after:  embedding matrices of {len(touched)} rows               {time.perf_counter() - start:.2f}s")
+            touch(snapshot, touched)
+        return
+
+    start = time.perf_counter()
+    data = synthetic_rows(args.rows, args.dim)
+    print(f"generated {args.rows} rows (dim {args.dim}) in {time.perf_counter() - start:.2f}s")
+
+    records, columns = data.values.tolist(), list(data.columns)
+    start = time.perf_counter()
+    load_from_rows(records, columns)
+    before = time.perf_counter() - start
+    del records
+
+    with tempfile.TemporaryDirectory() as directory:
+        snapshot = Snapshot(directory)
+        start = time.perf_counter()
+        snapshot.write(data)
+        print(f"snapshot written in {time.perf_counter() - start:.2f}s")
+
+        start = time.perf_counter()
+        snapshot.read(["timestamp", "latency", "user_query", "response"])
+        after_core = time.perf_counter() - start
+
+        start = time.perf_counter()
+        snapshot.read_embeddings()
+        after_embeddings = time.perf_counter() - start
+
+        print(f"before: rows -> frame with per-row embedding arrays  {before:.2f}s")
+        print(f"after:  snapshot core + text columns                 {after_core:.2f}s")
+        print(f"after:  snapshot embedding matrices                  {after_embeddings:.2f}s")
+        middle = len(data) // 2
+        touch(snapshot, data.iloc[middle:middle + TOUCHED_ROWS])
+
+
+if __name__ == "__main__":
+    main()
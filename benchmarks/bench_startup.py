@@ -0,0 +1,50 @@
+"""Startup cost of utils.data with lazy resources vs building everything up front.
+
+Importing utils.data used to connect to MySQL, start the JVM for the KoNLPy analyzers
+and load the SentenceTransformer. Now the import only registers factories, the
+read-only pages create the DB connection on first query and nothing else. Resources
+that cannot be built on the host (no DB route, no JVM, no model files) are reported
+as unavailable and left out of the totals.
+
+    python -m benchmarks.bench_startup
+"""
+import time
+
+
+def timed(name, build):
+    # Seconds to build one resource, None (and the reason) when it cannot be built here
+    start = time.perf_counter()
+    try:
+        build()
+    except Exception as e:
+        print(f"{name:<26} unavailable ({type(e).__name__}: {e})")
+        return None
+    return time.perf_counter() - start
+
+
+def main():
+    start = time.perf_counter()
+    from utils.data import get_db, get_tokenizer, get_model
+    import_time = time.perf_counter() - start
+
+    costs = {
+        "db connection": timed("db connection", get_db),
+        "tokenizer pool warm-up": timed("tokenizer pool warm-up", lambda: get_tokenizer().stems(["준비"])),
+        "in-process analyzers": timed("in-process analyzers", lambda: __import__("utils.tokenizer").tokenizer.Backend("okt")),
+        "model": timed("model", get_model),
+    }
+    for name, seconds in costs.items():
+        if seconds is not None:
+            print(f"{name:<26} {seconds:.2f}s")
+    # What the old import built: the connection, the analyzers in this process and the model
+    measured = [name for name in ("db connection", "in-process analyzers", "model") if costs[name] is not None]
+    read_only = import_time + (costs["db connection"] or 0)
+    eager = import_time + sum(costs[name] for name in measured)
+    print(f"import utils.data          {import_time:.2f}s")
+    print(f"read-only page start (lazy) {read_only:.2f}s" + ("" if costs["db connection"] is not None else " (without the db connection)"))
+    print(f"every resource up front     {eager:.2f}s (measured: {', '.join(measured) or 'none'})")
+    get_tokenizer().close()
+
+
+if __name__ == "__main__":
+    main()
@@ -5,7 +5,7 @@ from utils.common_utils import date_range_selector
 
 st.title("Responses")
 
-data = get_data()
+data = get_data(groups=("core", "text"))
 data = date_range_selector(data)
 
 
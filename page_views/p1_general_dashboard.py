@@ -7,8 +7,9 @@ from components.component_bar import Bar
 from components.component_table import Table
 from components.component_line import Line
 from components.component_card import Card
-from utils.common_utils import load_lottiefile, load_data
-from utils.general_dashboard_utils import calculate_counts, convert_dataframe_to_listof_dic
+from utils.common_utils import load_lottiefile, load_date_range
+from utils.data import load_rollups
+from utils.general_dashboard_utils import calculate_rollup_counts, convert_rollups_to_listof_dic, average_latency
 
 
 # Custom CSS for styling
@@ -63,15 +64,12 @@ def main():
             """
         )
 
-    # Load and preprocess data
-    data = load_data()
-    if len(data) > 0:
-        data["hour"] = data["timestamp"].dt.hour.apply(lambda x: f"{x:02d}:00")
-        data["day_of_week"] = data["timestamp"].dt.dayofweek
-        data["day_name"] = data["timestamp"].dt.day_name()
-
+    # Load the hourly rollups of the selected dates
+    date_range = load_date_range()
+    rollups = load_rollups(*date_range) if date_range is not None else []
+    if len(rollups) > 0:
         # Calculate counts
-        hourly_counts, weekday_counts, daily_queries = calculate_counts(data)
+        hourly_counts, weekday_counts, daily_queries = calculate_rollup_counts(rollups)
         
         # Sidebar options
         with st.sidebar:
@@ -89,7 +87,7 @@ def main():
         }[option]
 
         # Convert data for bar chart
-        listof_dic = convert_dataframe_to_listof_dic(data)
+        listof_dic = convert_rollups_to_listof_dic(rollups)
         keys = ["09:00 - 11:00", "11:00 - 13:00", "13:00 - 15:00", "15:00 - 17:00", "17:00 - 19:00"]
         index = "day_name"
 
@@ -124,7 +122,7 @@ def main():
             
             latency_card = Card(
                 board, 6, 2, 3, 1,
-                title="Latency Card", value=f"{int(data['latency'].mean())}ms",
+                title="Latency Card", value=f"{int(average_latency(rollups))}ms",
                 subtitle="Avg Response Latency", minW=1, minH=1
                 )
 
@@ -14,7 +14,9 @@ from utils.queries_and_responses_utils import (
     calculate_keyword_data,
     calculate_kmeans_clustering,
     prepare_pie_chart_data,
-    calculate_avg_unique_responses
+    calculate_avg_unique_responses,
+    auto_k,
+    CLUSTERING_METHODS
 )
 
 
@@ -70,12 +72,18 @@ def main():
 
             #### Adjustable Number of Clusters:  
             - Change the number of K clusters by inputting a different value in the "Number of K Clusters" field on the left sidebar.
+            - Or turn on "Auto K" to use the k with the best silhouette score (Davies-Bouldin breaking ties) for queries and responses separately, scored on a sample spread over every day of the range.
+
+            #### Clustering Method:  
+            - "K-means" (default) refits K-means for every number of clusters.
+            - "Cluster Tree" builds one cluster tree per date range, so changing the number of clusters is instant and a cluster keeps its number across k.  
+            - "Stored Model" shows the labels assigned at upload by the persisted centroid model, the number of clusters is the model's.
                     
         """
         )
 
     # Load data
-    data = load_data()
+    data = load_data(groups=("core", "text", "clusters"))
     if len(data) > 0:
         # Sidebar options
         with st.sidebar:
@@ -88,13 +96,23 @@ def main():
                     "Medoid Sentence",
                 ),
             )
+            use_auto_k = st.toggle("Auto K")
             num_clusters = st.number_input(
-                label="Number of K Clusters", min_value=1, max_value=15, value=12, step=1
+                label="Number of K Clusters", min_value=1, max_value=15, value=12, step=1, disabled=use_auto_k
             )
+            clustering_method = st.selectbox("Clustering Method", CLUSTERING_METHODS)
+
+        if use_auto_k:
+            recommendations = auto_k(data)
+            num_clusters = {option: k for option, (k, _) in recommendations.items()}
+            with st.expander(f"Auto K: {num_clusters['q']} query clusters, {num_clusters['r']} response clusters"):
+                for option, title in (("q", "Queries"), ("r", "Responses")):
+                    st.write(title)
+                    st.line_chart(recommendations[option][1].set_index("k"))
         
         # Prepare data for draggable elements
-        top_5_q_words, top_5_r_words = calculate_keyword_data(data)
-        q_representative_sentences, r_representative_sentences = calculate_kmeans_clustering(data, num_clusters, representative_type)
+        top_5_q_words, top_5_r_words = calculate_keyword_data()
+        q_representative_sentences, r_representative_sentences = calculate_kmeans_clustering(data, num_clusters, representative_type, clustering_method)
         pie_q_data = prepare_pie_chart_data(data, q_representative_sentences, "q_k_cluster_label")
         pie_r_data = prepare_pie_chart_data(data, r_representative_sentences, "r_k_cluster_label")
         
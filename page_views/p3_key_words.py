@@ -1,8 +1,9 @@
 import streamlit as st
 from streamlit_lottie import st_lottie_spinner
 
-from utils.common_utils import load_lottiefile, load_data, return_keyword_df
-from utils.key_word_utils import draw_graph
+from utils.common_utils import load_lottiefile, load_date_range, load_keyword_matrix, load_keyword_index
+from utils.key_word_utils import draw_graph, show_matching_interactions
+from utils.keyword_graph import parse_node_id
 
 
 # Load Lottie animation 
@@ -23,18 +24,17 @@ def main():
             - Stemming Option: Includes a toggle option to enable or disable the stemming of nouns, allowing for more refined keyword analysis.
             - Dynamic Data Display: Users can adjust the number of queries and responses displayed using sliders.
             - Word Search: Provides an option to search for individual keywords within the queries or responses. 
+            - Graph Depth: The node graph can expand several hops from the selected word, keeping only the strongest neighbours of each word.
         """
         )
-    # Load data
-    data = load_data()
-    if len(data) > 0:
-        # Toggler for stemming
-        on = st.toggle("Stem Nouns", key="key1")
-        keyword_df = return_keyword_df(on, data)
-
+    # Toggler for stemming
+    on = st.toggle("Stem Nouns", key="key1")
+    # Summed from per-day partials, no rows are loaded unless a day is new
+    date_range = load_date_range()
+    keyword_matrix = load_keyword_matrix(on, date_range) if date_range is not None else None
+    if keyword_matrix is not None and min(keyword_matrix.shape) > 0:
         # Slider for number of queries and responses
-        max_rows = keyword_df.shape[0]
-        max_columns = keyword_df.shape[1]
+        max_rows, max_columns = keyword_matrix.shape
         number_of_rows = 10
         number_of_columns = 10
 
@@ -54,9 +54,13 @@ def main():
                 max_value=max_columns,
                 value=10,
             )
+            st.subheader("Node Graph")
+            hops = st.slider(label="Hops", min_value=1, max_value=3, value=1)
+            top_k = st.slider(label="Neighbours per word", min_value=1, max_value=30, value=10)
+            min_weight = st.number_input(label="Minimum co-occurrences", min_value=1, value=1, step=1)
 
         # Display Query - Response visualization by table
-        keyword_df = keyword_df.head(number_of_rows).iloc[:, :number_of_columns]
+        keyword_df = keyword_matrix.frame(number_of_rows, number_of_columns)
 
         # Option for view in node graph, create a word_bank off choice
         option = st.radio(
@@ -75,8 +79,28 @@ def main():
             label_visibility="collapsed",
         )
 
-        # Draw the node graph
-        draw_graph(option, select_word, keyword_df)
+        # Draw the node graph, clicking a word shows the interactions behind its edge
+        graph, clicked = draw_graph(option, select_word, keyword_matrix, hops, top_k, min_weight)
+
+        st.subheader("Matching Interactions")
+        side = "q" if option == "Query" else "r"
+        terms = [(select_word, side)]
+        # The clicked edge is (parent, clicked): the centre word for hop-1 nodes, the node
+        # it was reached from further out
+        clicked_side, clicked_word = parse_node_id(clicked)
+        if clicked in graph.nodes and clicked != graph.center:
+            parent = graph.nodes[graph.parent(clicked)]
+            terms = [(parent["word"], parent["side"]), (clicked_word, clicked_side)]
+        extra_words = st.text_input(
+            label="Also match words",
+            placeholder="Also match words in the query or response...",
+            label_visibility="collapsed",
+        )
+        terms += [(word, "any") for word in (extra_words or "").split()]
+        mode = st.radio(label="Match", options=["All words", "Any word"], horizontal=True, label_visibility="collapsed")
+        show_matching_interactions(
+            load_keyword_index(on), terms, "and" if mode == "All words" else "or", date_range
+        )
 
         st.subheader("Data Set (Rows: Responses, Columns: User Queries)")
         st.write(keyword_df)
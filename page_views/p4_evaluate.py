@@ -1,20 +1,21 @@
 import streamlit as st
 import plotly.express as px
+import pandas as pd
 from streamlit_lottie import st_lottie_spinner
 
-from utils.common_utils import load_lottiefile, load_data, time_func
+from utils.common_utils import load_lottiefile, load_data, current_date_range, time_func
+from utils.data import load_similarity_histogram, get_data_version
+from utils.similarity_histogram import histogram_mean, histogram_count
 from utils.evaluate_utils import (
     get_similarity_score_list, 
-    compute_similarities, 
     display_similarity_histogram, 
     display_samples, 
     unique_word_ratio, 
     get_lda_model, 
     prepare_topic_data, 
     make_topic_pie,
-    check_response_consistency,
+    get_response_consistency,
     highlight_inconsistent,
-    extract_coordinates,
     draw_heatmap
 )
 
@@ -25,18 +26,19 @@ lottie_streamlit = load_lottiefile("./lottiefiles/Data Loading Animation.json")
 
 def main():
     # Load data
-    data = load_data()
-    # Compute similarities
+    data = load_data(groups=("core", "text", "robot", "tokens", "similarity"))
     if len(data) > 0:
-        data["similarity_score"] = compute_similarities(data)
+        # Similarities are stored at upload, the chart and counts are sums of the daily histograms
+        date_range = current_date_range()
+        histogram = load_similarity_histogram(*date_range)
 
         # **Display Query-Response Similarity Score Histogram**
         st.header("Query-Response Similarity Score Distribution")
-        similarity_score_list = get_similarity_score_list(data, bin_width=0.02)
+        similarity_score_list = get_similarity_score_list(histogram, bin_width=0.02)
         display_similarity_histogram(similarity_score_list)
         
         # Average Similarity
-        average_similarity = data["similarity_score"].mean()
+        average_similarity = histogram_mean(histogram)
         st.write(f"Average similarity score of: ***{average_similarity:.4f}***")
 
         st.divider()
@@ -62,7 +64,10 @@ def main():
             """
             )
 
-        # Classify Coherence
+        # Classify Coherence, counts from the histogram and samples from the stored scores
+        parroting_count = histogram_count(histogram, low=0.95)
+        coherent_count = histogram_count(histogram, low=0.3, high=0.95)
+        incoherent_count = histogram_count(histogram, high=0.3)
         parroting = data[data["similarity_score"] >= 0.95]
         coherent = data[
             (data["similarity_score"] >= 0.3) & (data["similarity_score"] < 0.95)
@@ -78,11 +83,11 @@ def main():
         # Display samples for each category
         col1, col2, col3 = st.columns(3)
         with col1:
-            display_samples(parroting, "Parroting")
+            display_samples(parroting, f"Parroting ({parroting_count:,})")
         with col2:
-            display_samples(coherent, "Coherent Response")
+            display_samples(coherent, f"Coherent Response ({coherent_count:,})")
         with col3:
-            display_samples(incoherent, "Incoherent Response")
+            display_samples(incoherent, f"Incoherent Response ({incoherent_count:,})")
 
         st.divider()
 
@@ -106,10 +111,8 @@ def main():
         st.code(ttr_code, language="python")
 
         # Compute word_diversty
-        if len(data) > 100:
-            data["word_diversity"] = data.sample(100)["response"].apply(unique_word_ratio)
-        else:
-            data["word_diversity"] = data["response"].apply(unique_word_ratio) 
+        responses = data.sample(100)["response"] if len(data) > 100 else data["response"]
+        data["word_diversity"] = pd.Series(unique_word_ratio(responses.tolist()), index=responses.index)
     
         st.write(
             f"""
@@ -128,8 +131,8 @@ def main():
 
 
                 - Text Preprocessing:
-                    - The responses are processed to extract nouns using the Okt (Open Korean Text) tokenizer.
-                    - Only nouns with more than one character are retained to ensure meaningful topics.  
+                    - The stemmed words of each response, stored as token ids at upload, are used as is.
+                    - Only words with more than one character are retained to ensure meaningful topics.  
 
                 ------------------------------
                 - Corpus Creation:
@@ -138,7 +141,7 @@ def main():
 
                 ------------------------------
                 - Dictionary and Bag-of-Words (BoW) Generation:
-                    - A dictionary is created from the corpus, mapping each unique word to an ID.
+                    - The dictionary is the shared token vocabulary, restricted to the words in the corpus.
                     - The corpus is transformed into a Bag-of-Words format, which counts the occurrences of each word in each response.  
 
                 ------------------------------
@@ -148,15 +151,10 @@ def main():
             """
             )
         topic_modeling_code = """
-        from gensim import corpora
         from gensim.models.ldamodel import LdaModel
         
-        def preprocess(text):
-            return [word for word in okt.nouns(text) if len(word) > 1]
-        
-        corpus = [preprocess(text) for text in data.sample(500)['response']]
-        dictionary = corpora.Dictionary(corpus)
-        bow_corpus = [dictionary.doc2bow(text) for text in corpus]
+        # Stemmed token ids stored with every row, counted per (response, word) pair
+        bow_corpus, dictionary = topic_corpus(data.sample(500)['response_stem_ids'].tolist())
 
         lda_model = LdaModel(bow_corpus, num_topics=6, id2word=dictionary, passes=20)
 
@@ -184,7 +182,7 @@ def main():
         st.divider()
 
         # **Response Consistency**
-        consistency_results = check_response_consistency(data)
+        consistency_results = get_response_consistency(*date_range, get_data_version())
         if len(consistency_results) > 0:
             sorted_results = consistency_results.sort_values(
                 ["unique_responses_count", "mean_similarity"], ascending=[False, False]
@@ -287,7 +285,7 @@ def main():
             st.divider()
 
         # **Robot Activity Heatmap**
-        data["x"], data["y"] = zip(*data["status"].apply(extract_coordinates))
+        data["x"], data["y"] = data["location_x"], data["location_y"]
         data = data.dropna(subset=["x", "y"])
         padding = 2 
 
@@ -1,8 +1,13 @@
 import streamlit as st
-import pandas as pd
 import json
 from streamlit_lottie import st_lottie_spinner
-from utils.data import get_data, process_chunk, clear_table, vrd
+from utils.data import (
+    get_data, refresh_data, clear_table, get_db, migrate_embeddings, migrate_token_ids, migrate_similarity_scores,
+    refit_clusters, get_cluster_models, EMBEDDING_FORMAT,
+)
+from utils.embedding_codec import FORMATS
+from utils.ingest_pipeline import IngestPipeline
+from utils.csv_reader import read_upload, validate_header, UploadReport
 
 if 'chunk_counter' not in st.session_state:
     st.session_state.chunk_counter = 0
@@ -12,25 +17,76 @@ def load_lottiefile(filepath: str):
         return json.load(f)
 
 lottie_streamlit = load_lottiefile("./lottiefiles/CSV Upload Animation.json")
-chunk_size = 1000
 upload_option = st.radio(
         label="Choose One", options=["Add Additional Dataset", "Add Clean Dataset"], label_visibility="collapsed"
     )
 uploaded_file = st.file_uploader("Upload new CSV file to database")
-if uploaded_file is not None:
+# Widgets further down rerun the page with the file still selected, it is ingested once
+if uploaded_file is not None and st.session_state.get("ingested_upload") == uploaded_file.file_id:
     st.write("filename: ", uploaded_file.name)
+    st.write("This file has been inserted. Upload it again to insert it once more.")
+elif uploaded_file is not None:
+    st.write("filename: ", uploaded_file.name)
+    # A malformed file is rejected before the table is cleared or the model is loaded
+    try:
+        validate_header(uploaded_file)
+    except ValueError as e:
+        st.error(str(e))
+        st.stop()
     with st_lottie_spinner(lottie_streamlit, height=300, key="uploading", speed=0.6):
         if upload_option == "Add Clean Dataset":
             clear_table()
-        for chunk in pd.read_csv(uploaded_file, chunksize=chunk_size):
-            chunk = chunk.where(pd.notnull(chunk), None)
-            process_chunk(chunk, vrd)
+        upload_report = UploadReport()
+        pipeline = IngestPipeline(get_db())
+        try:
+            report = pipeline.run(read_upload(uploaded_file, report=upload_report))
+        except ValueError as e:
+            st.error(str(e))
+            st.stop()
+        st.dataframe(upload_report.as_frame(), hide_index=True)
+        for error in pipeline.errors:
+            st.write(f"An error occurred during insertion: {error}")
         st.write("Data processing and insertion completed.")
+        st.dataframe(report)
+        cache_stats = pipeline.stem_cache_stats()
+        if cache_stats["hit_rate"] is not None:
+            st.write(f"Stem cache hit rate: {cache_stats['hit_rate']:.2%} ({cache_stats.get('misses', 0)} tokens sent to the analyzers)")
         if 'chunk_counter' in st.session_state:
             del st.session_state['chunk_counter']
         if 'date_range' in st.session_state:
             del st.session_state['date_range']
-        get_data.clear()
+        refresh_data()
+        # First upload or drift past the threshold: refit and relabel the stored rows
+        refit = refit_clusters()
+        if refit:
+            st.write(f"Cluster models refit for: {', '.join(refit)}")
+            refresh_data()
+        st.session_state["ingested_upload"] = uploaded_file.file_id
+
+with st.expander("Re-encode stored embeddings"):
+    target_format = st.selectbox("Format", list(FORMATS), index=list(FORMATS).index(EMBEDDING_FORMAT))
+    if st.button("Re-encode"):
+        progress = st.empty()
+        migrated = migrate_embeddings(target_format, on_batch=lambda n: progress.write(f"{n} rows re-encoded"))
+        st.write(f"Re-encoded {migrated} rows to {target_format}.")
+        refresh_data()
+
+with st.expander("Backfill token ids and similarity scores"):
+    # Rows stored before these columns existed, pages read NULL for them until this runs
+    if st.button("Backfill"):
+        progress = st.empty()
+        tokenized = migrate_token_ids(on_batch=lambda n: progress.write(f"{n} rows tokenized"))
+        scored = migrate_similarity_scores(on_batch=lambda n: progress.write(f"{n} rows scored"))
+        st.write(f"Token ids written for {tokenized} rows, similarity scores for {scored} rows.")
+        refresh_data()
+
+with st.expander("Cluster models"):
+    st.dataframe(get_cluster_models().status(), hide_index=True)
+    if st.button("Refit now"):
+        progress = st.empty()
+        refit_clusters(force=True, on_batch=lambda n: progress.write(f"{n} rows relabelled"))
+        refresh_data()
+        st.dataframe(get_cluster_models().status(), hide_index=True)
 
 st.subheader("Current Dataset: ")
 st.write(get_data())
\ No newline at end of file
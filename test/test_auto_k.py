@@ -0,0 +1,43 @@
+import unittest
+import numpy as np
+
+from utils.auto_k import recommend_k, stratified_sample
+
+
+class StratifiedSampleTest(unittest.TestCase):
+    def test_every_stratum_gets_its_share(self):
+        # A busy day of 9000 rows next to two quiet ones
+        strata = np.repeat(["2024-01-01", "2024-01-02", "2024-01-03"], [9000, 90, 10])
+        positions = stratified_sample(strata, 1000)
+        self.assertTrue(np.all(np.diff(positions) > 0))
+        days, counts = np.unique(strata[positions], return_counts=True)
+        self.assertEqual(days.tolist(), ["2024-01-01", "2024-01-02", "2024-01-03"])
+        self.assertEqual(counts.tolist(), [989, 10, 1])
+
+    def test_small_inputs_are_kept_whole(self):
+        np.testing.assert_array_equal(stratified_sample(["a", "b", "a"], 5), [0, 1, 2])
+
+    def test_same_seed_same_sample(self):
+        strata = np.arange(500) % 7
+        np.testing.assert_array_equal(stratified_sample(strata, 50), stratified_sample(strata, 50))
+
+
+class RecommendKTest(unittest.TestCase):
+    def test_finds_well_separated_clusters(self):
+        rng = np.random.default_rng(0)
+        centres = rng.uniform(-50, 50, (4, 5))
+        embeddings = np.concatenate([centre + rng.standard_normal((60, 5)) for centre in centres])
+        strata = np.arange(len(embeddings)) % 3
+        k, curve = recommend_k(embeddings, strata, candidates=range(2, 8), sample_rows=200, score_rows=100, n_jobs=1)
+        self.assertEqual(k, 4)
+        self.assertEqual(curve["k"].tolist(), list(range(2, 8)))
+        self.assertEqual(curve["silhouette"].idxmax(), 2)
+
+    def test_too_few_rows(self):
+        k, curve = recommend_k(np.zeros((2, 3)), [0, 0], n_jobs=1)
+        self.assertEqual(k, 1)
+        self.assertEqual(len(curve), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,101 @@
+import re
+import unittest
+import numpy as np
+import pandas as pd
+
+from utils.cluster_model import DRIFT_THRESHOLD, MIN_DRIFT_ROWS, CentroidModel, ClusterModels, nearest_centroids
+
+
+COLUMNS = ["side", "n_clusters", "centroids", "baseline_distance", "assigned_count", "assigned_distance_sum", "fitted_at"]
+
+
+class ModelTable:
+    # cluster_models in memory, enough SQL for ClusterModels
+    def __init__(self):
+        self.rows = {}
+        self.manager = self
+
+    def send_query(self, query):
+        if query.startswith("SELECT"):
+            return pd.DataFrame(list(self.rows.values()), columns=COLUMNS)
+        match = re.search(r"assigned_count \+ (\d+), assigned_distance_sum = assigned_distance_sum \+ ([\d.e+-]+)\s+WHERE side = '(\w)'", query)
+        if match:
+            row = self.rows[match.group(3)]
+            row[4] += int(match.group(1))
+            row[5] += float(match.group(2))
+        elif query.startswith("DELETE"):
+            self.rows = {}
+        return pd.DataFrame()
+
+    def write_list_to_db(self, query, data):
+        for row in data:
+            self.rows[row[0]] = list(row)
+
+
+class NearestCentroidsTest(unittest.TestCase):
+    def test_blocks_match_brute_force(self):
+        rng = np.random.default_rng(0)
+        rows, centroids = rng.standard_normal((50, 6)), rng.standard_normal((4, 6)).astype(np.float32)
+        labels, distances = nearest_centroids(rows, centroids, block=7)
+        full = np.linalg.norm(rows[:, None, :] - centroids[None, :, :], axis=2)
+        np.testing.assert_array_equal(labels, full.argmin(axis=1))
+        np.testing.assert_allclose(distances, full.min(axis=1), rtol=1e-4)
+
+
+class CentroidModelTest(unittest.TestCase):
+    def test_drift_is_relative_growth_of_the_mean_distance(self):
+        model = CentroidModel(np.zeros((2, 3)), baseline_distance=2.0)
+        model.assigned_count, model.assigned_distance_sum = MIN_DRIFT_ROWS - 1, 10.0 * MIN_DRIFT_ROWS
+        self.assertEqual(model.drift, 0.0)
+        model.assigned_count = MIN_DRIFT_ROWS
+        self.assertAlmostEqual(model.drift, 4.0)
+
+    def test_fit_baseline_is_the_mean_distance_of_the_fitted_rows(self):
+        rng = np.random.default_rng(1)
+        rows = np.concatenate([rng.normal(0, 1, (100, 2)), rng.normal(20, 1, (100, 2))])
+        model = CentroidModel.fit(rows, n_clusters=2)
+        _, distances = model.assign(rows)
+        self.assertAlmostEqual(model.baseline_distance, distances.mean(), places=4)
+        self.assertEqual(model.n_clusters, 2)
+
+
+class ClusterModelsTest(unittest.TestCase):
+    def setUp(self):
+        self.table = ModelTable()
+        self.models = ClusterModels(self.table)
+        self.centroids = np.array([[0, 0], [10, 10]], dtype=np.float32)
+
+    def test_no_model_means_no_labels_and_a_refit(self):
+        self.assertIsNone(self.models.label("q", np.zeros((3, 2))))
+        self.assertTrue(self.models.drifted("q"))
+        self.models.record("q", np.ones(3))
+        self.assertEqual(self.table.rows, {})
+
+    def test_models_and_drift_counts_are_shared_through_the_table(self):
+        self.models.save("q", CentroidModel(self.centroids, baseline_distance=1.0))
+        labels, distances = self.models.label("q", np.array([[1, 0], [9, 10]], dtype=np.float32))
+        self.assertEqual(labels.tolist(), [0, 1])
+        self.assertFalse(self.models.drifted("q"))
+
+        # Rows twice as far from their centroid as at the fit
+        self.models.record("q", np.full(MIN_DRIFT_ROWS, 2.0))
+        self.assertTrue(self.models.drifted("q"))
+        self.assertGreater(self.models.get("q").drift, DRIFT_THRESHOLD)
+
+        other = ClusterModels(self.table)
+        np.testing.assert_array_equal(other.get("q").centroids, self.centroids)
+        self.assertEqual(other.get("q").assigned_count, MIN_DRIFT_ROWS)
+        self.assertAlmostEqual(other.get("q").drift, 1.0)
+        self.assertEqual(other.status()["side"].tolist(), ["q"])
+
+    def test_saving_a_refit_resets_the_counts(self):
+        self.models.save("r", CentroidModel(self.centroids, baseline_distance=1.0))
+        self.models.record("r", np.full(MIN_DRIFT_ROWS, 5.0))
+        self.models.save("r", CentroidModel(self.centroids, baseline_distance=5.0))
+        self.assertEqual(ClusterModels(self.table).get("r").assigned_count, 0)
+        self.models.clear()
+        self.assertIsNone(ClusterModels(self.table).get("r"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,79 @@
+import unittest
+import numpy as np
+from scipy.cluster.hierarchy import fcluster, linkage
+
+from utils.cluster_tree import ClusterTree, weighted_ward
+
+
+def blobs(n_per_blob=40, seed=0):
+    rng = np.random.default_rng(seed)
+    centres = np.array([[0, 0], [10, 0], [0, 10], [10, 10]], dtype=np.float64)
+    return np.concatenate([centre + rng.standard_normal((n_per_blob, 2)) for centre in centres])
+
+
+def partition(merges, m, k):
+    # Sets of leaves after all but the last k - 1 merges
+    groups = {i: frozenset([i]) for i in range(m)}
+    for step, (a, b) in enumerate(merges[:m - k]):
+        groups[m + step] = groups.pop(a) | groups.pop(b)
+    return set(groups.values())
+
+
+def same_partition(labels, other):
+    return len(set(zip(labels, other))) == len(set(labels)) == len(set(other))
+
+
+class WeightedWardTest(unittest.TestCase):
+    def test_unit_weights_match_scipy(self):
+        points = np.random.default_rng(1).standard_normal((30, 3))
+        merges = weighted_ward(points, np.ones(len(points)))
+        expected = linkage(points, method="ward")[:, :2].astype(int)
+        self.assertEqual([tuple(sorted(pair)) for pair in merges], [tuple(sorted(pair)) for pair in expected])
+
+    def test_weights_count_as_repeated_rows(self):
+        points = np.random.default_rng(2).standard_normal((12, 2))
+        weights = np.array([1, 3, 2, 1, 5, 1, 2, 1, 1, 4, 1, 2])
+        repeated = np.repeat(points, weights, axis=0)
+        owner = np.repeat(np.arange(len(points)), weights)
+        merges = weighted_ward(points, weights)
+        for k in (2, 3, 5):
+            expected = fcluster(linkage(repeated, method="ward"), k, criterion="maxclust")
+            groups = partition(merges, len(points), k)
+            labels = np.empty(len(points), dtype=int)
+            for label, group in enumerate(groups):
+                labels[list(group)] = label
+            self.assertTrue(same_partition(labels[owner], expected))
+
+
+class ClusterTreeTest(unittest.TestCase):
+    def setUp(self):
+        self.points = blobs()
+        self.tree = ClusterTree(self.points, n_centroids=32, max_k=6)
+
+    def test_four_blobs_at_k_four(self):
+        truth = np.repeat(np.arange(4), 40)
+        self.assertTrue(same_partition(self.tree.labels(4), truth))
+
+    def test_each_k_splits_one_cluster_and_keeps_the_other_labels(self):
+        for k in range(2, 7):
+            previous, labels = self.tree.labels(k - 1), self.tree.labels(k)
+            self.assertEqual(set(labels), set(range(k)))
+            moved = labels != previous
+            self.assertTrue(np.all(labels[moved] == k - 1))
+            self.assertEqual(len(set(previous[moved])), 1)
+
+    def test_k_is_clamped(self):
+        np.testing.assert_array_equal(self.tree.labels(0), np.zeros(len(self.points)))
+        np.testing.assert_array_equal(self.tree.labels(50), self.tree.labels(6))
+
+    def test_sample_weight_reaches_the_tree(self):
+        # A blob carrying most of the weight is the first split and, being larger, keeps label 0
+        weights = np.ones(len(self.points))
+        weights[40:80] = 100
+        labels = ClusterTree(self.points, sample_weight=weights, n_centroids=32, max_k=4).labels(2)
+        self.assertEqual(set(labels[40:80]), {0})
+        self.assertEqual(set(np.delete(labels, np.s_[40:80])), {1})
+
+
+if __name__ == "__main__":
+    unittest.main()
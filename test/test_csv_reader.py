@@ -0,0 +1,58 @@
+import io
+import unittest
+import pandas as pd
+
+from utils.csv_reader import UploadReport, read_upload, validate_header
+
+
+def upload(lines, header="timestamp,user_query,response,latency,extra"):
+    return io.BytesIO(("\n".join([header] + lines) + "\n").encode("utf-8"))
+
+
+class ReadUploadTest(unittest.TestCase):
+    def test_chunks_keep_file_row_numbers_and_drop_bad_timestamps(self):
+        lines = [f"2024-01-01 00:{minute:02d}:00,질문 {minute},답변,{minute}.5,x" for minute in range(40)]
+        lines[3] = "not a time,질문,답변,1,x"
+        report = UploadReport()
+        chunks = list(read_upload(upload(lines), chunk_bytes=256, report=report))
+        self.assertGreater(len(chunks), 1)
+        data = pd.concat(chunks)
+        self.assertEqual(len(data), 39)
+        self.assertNotIn(3, data.index)
+        self.assertEqual(data.index[-1], 39)
+        self.assertEqual(data["timestamp"].iloc[0], "2024-01-01 00:00:00.000000")
+        self.assertEqual(report.rows, 39)
+        self.assertEqual(report.dropped_rows, 1)
+        self.assertEqual(report.chunks, len(chunks))
+        self.assertEqual(report.ignored_columns, ["extra"])
+        self.assertEqual(report.last_timestamp, pd.Timestamp("2024-01-01 00:39"))
+
+    def test_offsets_are_converted_to_utc(self):
+        lines = ["2024-01-01T09:00:00+09:00,질문,답변,1,x", "2024/01/02 03:04:05,질문,답변,1,x"]
+        data = pd.concat(read_upload(upload(lines)))
+        self.assertEqual(data["timestamp"].tolist(), ["2024-01-01 00:00:00.000000", "2024-01-02 03:04:05.000000"])
+
+    def test_report_counts_repeats_nulls_and_negative_latency(self):
+        lines = [f"2024-01-01 00:{minute % 25:02d}:00,질문,,{-1 if minute == 7 else 1},x" for minute in range(40)]
+        report = UploadReport()
+        for _ in read_upload(upload(lines), chunk_bytes=256, report=report):
+            pass
+        self.assertEqual(report.duplicate_timestamps, 15)
+        self.assertEqual(report.null_counts["response"], 40)
+        self.assertEqual(report.negative_latency, 1)
+        self.assertEqual(report.first_timestamp, pd.Timestamp("2024-01-01 00:00"))
+        frame = report.as_frame().set_index("check")["value"]
+        self.assertEqual(frame["duplicate timestamps"], "15")
+
+    def test_missing_column_is_rejected_before_reading(self):
+        source = upload(["2024-01-01,질문"], header="timestamp,user_query")
+        with self.assertRaises(ValueError):
+            validate_header(source)
+        self.assertEqual(source.tell(), 0)
+        good = upload(["2024-01-01,질문,답변,1,x"])
+        self.assertIn("response", validate_header(good))
+        self.assertEqual(len(pd.concat(read_upload(good))), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,71 @@
+import unittest
+from unittest import mock
+import pandas as pd
+
+from utils.resources import resources
+
+
+class RangeDB:
+    # Answers SHOW COLUMNS and the range SELECT, keeps every query it was sent
+    def __init__(self, rows, columns):
+        self.rows = rows
+        self.columns = columns
+        self.queries = []
+
+    def send_query(self, query):
+        self.queries.append(query)
+        if query.startswith("SHOW COLUMNS"):
+            return pd.DataFrame({"Field": self.columns})
+        if "information_schema.statistics" in query:
+            return pd.DataFrame({"n": [1]})
+        if query.startswith("select "):
+            low, high = [pd.Timestamp(bound) for bound in query.split("BETWEEN ")[1].split(")")[0].replace("'", "").split(" AND ")]
+            return self.rows[(self.rows["timestamp"] >= low) & (self.rows["timestamp"] <= high)].copy()
+        raise AssertionError(f"unexpected query: {query}")
+
+
+class DateRangeTest(unittest.TestCase):
+    def setUp(self):
+        import utils.data
+        self.data = utils.data
+        self.factories = dict(resources._factories)
+        resources.reset()
+
+    def tearDown(self):
+        resources.reset()
+        resources._factories.update(self.factories)
+
+    def test_ranges_predicate(self):
+        low, high = pd.Timestamp("2024-01-01"), pd.Timestamp("2024-01-02 12:00")
+        predicate = self.data.ranges_predicate([(low, high), (high, None), (None, low)])
+        self.assertEqual(predicate, (
+            "(timestamp BETWEEN '2024-01-01 00:00:00.000000' AND '2024-01-02 12:00:00.000000')"
+            " OR (timestamp >= '2024-01-02 12:00:00.000000')"
+            " OR (timestamp <= '2024-01-01 00:00:00.000000')"
+        ))
+        self.assertIsNone(self.data.ranges_predicate([(low, high), (None, None)]))
+
+    def test_date_range_bounds_cover_whole_kst_days(self):
+        low, high = self.data.date_range_bounds("2024-01-02", "2024-01-03")
+        self.assertEqual(low, pd.Timestamp("2024-01-01 15:00"))
+        self.assertEqual(high, pd.Timestamp("2024-01-03 14:59:59.999999"))
+
+    def test_range_data_fetches_only_the_selected_days(self):
+        # 23:00 UTC on the 3rd is midnight KST on the 4th, outside the range
+        rows = pd.DataFrame({
+            "timestamp": pd.to_datetime(["2024-01-01 14:00", "2024-01-01 15:00", "2024-01-03 14:59", "2024-01-03 15:00"]),
+            "latency": [1.0, 2.0, 3.0, 4.0],
+        })
+        db = RangeDB(rows, self.data.STATUS_COLUMNS + list(self.data.CLUSTER_COLUMNS.values()))
+        resources.override("db", db)
+        with mock.patch.object(self.data, "USE_SNAPSHOT", False):
+            data = self.data.get_range_data("2024-01-02", "2024-01-03", version=-2, groups=("core",))
+        self.assertEqual(data["latency"].tolist(), [2.0, 3.0])
+        self.assertEqual(data["timestamp"].iloc[0], pd.Timestamp("2024-01-02 00:00"))
+        select = [query for query in db.queries if query.startswith("select ")]
+        self.assertEqual(len(select), 1)
+        self.assertIn("select timestamp, latency from", select[0])
+
+
+if __name__ == "__main__":
+    unittest.main()
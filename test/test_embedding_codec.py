@@ -0,0 +1,62 @@
+import unittest
+import numpy as np
+
+from utils.embedding_codec import FORMATS, HEADER_SIZE, blob_format, decode_embedding, decode_embeddings, encode_embeddings
+
+
+def embeddings(n=16, dim=32, seed=0):
+    matrix = np.random.default_rng(seed).standard_normal((n, dim)).astype(np.float32)
+    # A zero row must survive int8's per-vector scale
+    matrix[3] = 0
+    return matrix
+
+
+class EmbeddingCodecTest(unittest.TestCase):
+    def test_float32_round_trip_is_exact(self):
+        matrix = embeddings()
+        blobs = encode_embeddings(matrix, "float32")
+        self.assertEqual({blob_format(blob) for blob in blobs}, {"float32"})
+        np.testing.assert_array_equal(decode_embeddings(blobs), matrix)
+
+    def test_float16_round_trip(self):
+        matrix = embeddings()
+        blobs = encode_embeddings(matrix, "float16")
+        self.assertEqual(len(blobs[0]), HEADER_SIZE + 2 * matrix.shape[1])
+        np.testing.assert_allclose(decode_embeddings(blobs), matrix, rtol=1e-3, atol=1e-3)
+
+    def test_int8_round_trip_within_half_a_step(self):
+        matrix = embeddings()
+        blobs = encode_embeddings(matrix, "int8")
+        self.assertEqual(len(blobs[0]), HEADER_SIZE + 4 + matrix.shape[1])
+        decoded = decode_embeddings(blobs)
+        step = np.abs(matrix).max(axis=1, keepdims=True) / 127
+        self.assertTrue(np.all(np.abs(decoded - matrix) <= step / 2 + 1e-6))
+        np.testing.assert_array_equal(decoded[3], 0)
+
+    def test_legacy_untagged_blobs(self):
+        matrix = embeddings()
+        blobs = [row.tobytes() for row in matrix]
+        self.assertEqual(blob_format(blobs[0]), "legacy")
+        np.testing.assert_array_equal(decode_embeddings(blobs), matrix)
+        np.testing.assert_array_equal(decode_embedding(memoryview(blobs[5])), matrix[5])
+
+    def test_mixed_format_column_keeps_row_order(self):
+        matrix = embeddings(n=12)
+        formats = ["legacy", *FORMATS] * 3
+        blobs = [
+            matrix[i].tobytes() if fmt == "legacy" else encode_embeddings(matrix[i:i + 1], fmt)[0]
+            for i, fmt in enumerate(formats)
+        ]
+        decoded = decode_embeddings(blobs)
+        self.assertEqual(decoded.shape, matrix.shape)
+        self.assertEqual([blob_format(blob) for blob in blobs], formats)
+        np.testing.assert_allclose(decoded, matrix, atol=0.05)
+        exact = [i for i, fmt in enumerate(formats) if fmt in ("legacy", "float32")]
+        np.testing.assert_array_equal(decoded[exact], matrix[exact])
+
+    def test_empty_column(self):
+        self.assertEqual(decode_embeddings([]).shape, (0, 0))
+
+
+if __name__ == "__main__":
+    unittest.main()
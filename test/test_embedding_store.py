@@ -0,0 +1,72 @@
+import shutil
+import tempfile
+import unittest
+import numpy as np
+import pandas as pd
+
+from utils.embedding_store import EmbeddingStore
+
+
+def rows(n, value, dim=4):
+    return np.full((n, dim), value, dtype=np.float32)
+
+
+class EmbeddingStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.store = EmbeddingStore(self.directory)
+        self.timestamps = pd.date_range("2024-01-01", periods=6, freq="h")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_append_keeps_one_generation(self):
+        self.store.upsert(self.timestamps[:3], rows(3, 1), rows(3, -1))
+        generation = self.store.meta["generation"]
+        self.store.upsert(self.timestamps[3:], rows(3, 2), rows(3, -2))
+        self.assertEqual(self.store.meta["generation"], generation)
+        np.testing.assert_array_equal(self.store.take("q", self.timestamps)[:, 0], [1, 1, 1, 2, 2, 2])
+        np.testing.assert_array_equal(self.store.take("r", self.timestamps[4:])[:, 0], [-2, -2])
+
+    def test_append_drops_bytes_of_an_interrupted_append(self):
+        self.store.upsert(self.timestamps[:3], rows(3, 1), rows(3, -1))
+        generation = self.store.meta["generation"]
+        # Data written but meta.json never updated
+        for name in ("keys", "q", "r"):
+            with open(self.store._path(name, generation), "ab") as f:
+                f.write(b"\x07" * 13)
+        self.store.upsert(self.timestamps[3:], rows(3, 2), rows(3, -2))
+        reopened = EmbeddingStore(self.directory)
+        self.assertEqual(len(reopened), 6)
+        np.testing.assert_array_equal(reopened.take("q", self.timestamps)[:, 0], [1, 1, 1, 2, 2, 2])
+
+    def test_rewrite_replaces_existing_rows(self):
+        self.store.upsert(self.timestamps[::2], rows(3, 1), rows(3, -1))
+        self.store.upsert(self.timestamps[:2], rows(2, 5), rows(2, -5))
+        self.assertEqual(len(self.store), 4)
+        np.testing.assert_array_equal(self.store.take("q", self.timestamps[[0, 1, 2, 4]])[:, 0], [5, 5, 1, 1])
+
+    def test_repeated_keys_keep_the_last_copy(self):
+        timestamps = self.timestamps[[0, 1, 1]]
+        self.store.upsert(timestamps, np.arange(3, dtype=np.float32)[:, None].repeat(4, 1), rows(3, 0))
+        np.testing.assert_array_equal(self.store.take("q", self.timestamps[:2])[:, 0], [0, 2])
+
+    def test_contiguous_range_is_a_view(self):
+        self.store.upsert(self.timestamps, rows(6, 1), rows(6, -1))
+        taken = self.store.take("q", self.timestamps[1:4])
+        self.assertTrue(np.shares_memory(taken, self.store.matrices["q"]))
+
+    def test_missing_rows_raise(self):
+        self.store.upsert(self.timestamps[:2], rows(2, 1), rows(2, -1))
+        with self.assertRaises(KeyError):
+            self.store.positions(self.timestamps[:3])
+
+    def test_reset_empties_the_store(self):
+        self.store.upsert(self.timestamps, rows(6, 1), rows(6, -1))
+        self.store.reset()
+        self.assertEqual(len(self.store), 0)
+        self.assertIsNone(self.store.watermark)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,95 @@
+import threading
+import unittest
+from unittest import mock
+import numpy as np
+import pandas as pd
+
+from utils.resources import resources
+from utils.token_ids import TokenVocabulary
+from utils.cluster_model import ClusterModels, CentroidModel
+
+
+class ThreadRecordingDB:
+    # Notes the thread behind every call and keeps the vocabulary rows it was sent
+    def __init__(self):
+        self.threads = set()
+        self.words = []
+        self.inserted = []
+        self.queries = []
+        self.manager = self
+
+    def send_query(self, query):
+        self.threads.add(threading.get_ident())
+        self.queries.append(query)
+        if "SELECT id, word" in query:
+            first = int(query.split("id >= ")[1].split()[0])
+            ids = list(range(1, len(self.words) + 1))
+            return pd.DataFrame({"id": ids[first - 1:], "word": self.words[first - 1:]})
+        if "COUNT(*)" in query:
+            return pd.DataFrame({"n": [1]})
+        return pd.DataFrame()
+
+    def write_list_to_db(self, query, data):
+        self.threads.add(threading.get_ident())
+        if "INSERT IGNORE" in query:
+            self.words.extend(row[0] for row in data if row[0] not in self.words)
+        else:
+            self.inserted.append(threading.get_ident())
+
+
+class FakeModel:
+    def encode(self, texts, batch_size=None):
+        return np.stack([np.random.default_rng(len(text)).standard_normal(8) for text in texts]).astype(np.float32)
+
+
+def chunks(n_chunks=3, rows=4):
+    for i in range(n_chunks):
+        start = pd.Timestamp("2024-01-01") + pd.Timedelta(hours=i)
+        yield pd.DataFrame({
+            "timestamp": [start + pd.Timedelta(minutes=m) for m in range(rows)],
+            "user_query": [f"질문 {i} {m}" for m in range(rows)],
+            "response": [f"답변 {i} {m} 입니다" for m in range(rows)],
+            # Already stemmed, so no stemming worker is spawned
+            "query_stemmed_words": [f"질문 {m}" for m in range(rows)],
+            "response_stemmed_words": [f"답변 {m}" for m in range(rows)],
+        })
+
+
+class PipelineThreadTest(unittest.TestCase):
+    def setUp(self):
+        self.factories = dict(resources._factories)
+        resources.reset()
+        self.db = ThreadRecordingDB()
+        resources.override("db", self.db)
+        resources.override("model", FakeModel())
+        resources.override("token_vocabulary", TokenVocabulary(self.db))
+        self.models = ClusterModels(self.db)
+        centroids = np.random.default_rng(0).standard_normal((3, 8)).astype(np.float32)
+        self.models.models = {side: CentroidModel(centroids, 1.0) for side in ("q", "r")}
+        resources.override("cluster_models", self.models)
+        # Setup ran on this thread, only the pipeline's calls count
+        self.db.threads.clear()
+        self.db.queries.clear()
+
+    def tearDown(self):
+        resources.reset()
+        resources._factories.update(self.factories)
+
+    def test_only_the_writer_thread_uses_the_connection(self):
+        from utils.ingest_pipeline import IngestPipeline
+        with mock.patch("utils.ingest_pipeline.warm_ingest"), mock.patch("utils.data.mark_touched"):
+            pipeline = IngestPipeline(self.db, stem_workers=1, queue_size=1)
+            pipeline.run(chunks())
+
+        self.assertEqual(pipeline.errors, [])
+        self.assertEqual(len(self.db.inserted), 3)
+        self.assertEqual(self.db.threads, {self.db.inserted[0]})
+        self.assertNotEqual(self.db.inserted[0], threading.get_ident())
+        # Vocabulary rows and drift statistics still reach the DB, from the writer
+        self.assertIn("질문", self.db.words)
+        self.assertEqual(self.models.get("q").assigned_count, 12)
+        self.assertTrue(any("assigned_count = assigned_count + 4" in query for query in self.db.queries))
+
+
+if __name__ == "__main__":
+    unittest.main()
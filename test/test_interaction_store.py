@@ -0,0 +1,133 @@
+import unittest
+import numpy as np
+import pandas as pd
+
+from utils.interaction_store import InteractionStore, KEY_RESOLUTION
+
+
+GROUPS = {"core": ["latency"], "text": ["user_query"]}
+
+
+class FakeTable:
+    # interactions_all in memory, fetch() answers the inclusive key ranges the store asks for
+    def __init__(self, rows):
+        self.rows = rows
+        self.requests = []
+
+    def fetch(self, ranges, columns):
+        self.requests.append((ranges, list(columns)))
+        rows = self.rows
+        if ranges is not None:
+            mask = np.zeros(len(rows), dtype=bool)
+            for low, high in ranges:
+                mask |= (rows["timestamp"] >= (low or pd.Timestamp.min)) & (rows["timestamp"] <= (high or pd.Timestamp.max))
+            rows = rows[mask]
+        return rows[[c for c in columns if c in rows.columns]].copy()
+
+    def upsert(self, rows):
+        kept = self.rows[~self.rows["timestamp"].isin(rows["timestamp"])]
+        self.rows = pd.concat([kept, rows]).sort_values("timestamp", ignore_index=True)
+
+
+def rows(start, n, latency=1.0):
+    return pd.DataFrame({
+        "timestamp": pd.date_range(start, periods=n, freq="h"),
+        "latency": np.full(n, latency),
+        "user_query": [f"질문 {i}" for i in range(n)],
+    })
+
+
+def prepare(raw):
+    return raw.sort_values("timestamp")
+
+
+class InteractionStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.table = FakeTable(rows("2024-01-01", 3))
+        self.store = InteractionStore(self.table.fetch, prepare, GROUPS)
+
+    def test_first_load_reads_everything_and_sets_the_watermark(self):
+        data = self.store.load(["core"])
+        self.assertEqual(len(data), 3)
+        self.assertEqual(self.table.requests, [(None, ["timestamp", "latency"])])
+        self.assertEqual(self.store.watermark, pd.Timestamp("2024-01-01 02:00"))
+
+    def test_refresh_fetches_past_the_watermark_only(self):
+        self.store.load(["core"])
+        version = self.store.version
+        self.table.upsert(rows("2024-01-02", 2, latency=5.0))
+        self.store.refresh()
+        ranges, _ = self.table.requests[-1]
+        self.assertEqual(ranges, [(pd.Timestamp("2024-01-01 02:00") + KEY_RESOLUTION, None)])
+        data = self.store.load(["core"])
+        self.assertEqual(data["latency"].tolist(), [1, 1, 1, 5, 5])
+        self.assertEqual(self.store.watermark, pd.Timestamp("2024-01-02 01:00"))
+        self.assertGreater(self.store.version, version)
+
+    def test_touched_rows_behind_the_watermark_are_replaced(self):
+        self.store.load(["core"])
+        rewritten = rows("2024-01-01 01:00", 1, latency=9.0)
+        earlier = rows("2023-12-31", 1, latency=7.0)
+        self.table.upsert(pd.concat([rewritten, earlier]))
+        self.store.mark_touched(pd.concat([rewritten, earlier])["timestamp"])
+        self.store.refresh()
+        ranges, _ = self.table.requests[-1]
+        self.assertEqual(ranges[1], (pd.Timestamp("2023-12-31"), pd.Timestamp("2024-01-01 01:00")))
+        data = self.store.load(["core"])
+        self.assertEqual(data["latency"].tolist(), [7, 1, 9, 1])
+        self.assertTrue(data["timestamp"].is_monotonic_increasing)
+
+    def test_refresh_before_any_load_only_bumps_the_version(self):
+        version = self.store.version
+        self.store.mark_touched(["2024-01-01"])
+        self.store.refresh()
+        self.assertEqual(self.table.requests, [])
+        self.assertGreater(self.store.version, version)
+
+    def test_patch_sets_held_rows(self):
+        self.store.load(["core"])
+        before = self.store.load(["core"])
+        self.store.patch(pd.to_datetime(["2024-01-01 02:00", "2024-01-01 00:00", "2025-01-01 00:00"]), {"latency": [3.0, 4.0, 8.0], "missing": [1, 2, 3]})
+        self.assertEqual(self.store.load(["core"])["latency"].tolist(), [4, 1, 3])
+        # Frames handed out earlier do not change under the reader
+        self.assertEqual(before["latency"].tolist(), [1, 1, 1])
+        self.assertEqual(len(self.table.requests), 1)
+
+    def test_reset_forces_a_full_load(self):
+        self.store.load(["core"])
+        self.store.reset()
+        self.assertIsNone(self.store.watermark)
+        self.store.load(["core"])
+        self.assertEqual([ranges for ranges, _ in self.table.requests], [None, None])
+
+
+class ColumnGroupTest(unittest.TestCase):
+    def setUp(self):
+        self.table = FakeTable(rows("2024-01-01", 3))
+        self.store = InteractionStore(self.table.fetch, prepare, GROUPS)
+
+    def test_groups_are_fetched_once_and_only_when_asked_for(self):
+        core = self.store.load(["core"])
+        self.assertEqual(list(core.columns), ["timestamp", "latency"])
+        text = self.store.load(["text"])
+        self.assertEqual(list(text.columns), ["timestamp", "user_query"])
+        # The new group stops at the watermark so it lines up with the rows held
+        self.assertEqual(self.table.requests[-1], ([(None, pd.Timestamp("2024-01-01 02:00"))], ["timestamp", "user_query"]))
+        self.store.load(["core", "text"])
+        self.assertEqual(len(self.table.requests), 2)
+
+    def test_refresh_fetches_every_loaded_group(self):
+        self.store.load(["core"])
+        self.store.load(["text"])
+        self.table.upsert(rows("2024-01-02", 1))
+        self.store.refresh()
+        self.assertEqual(self.table.requests[-1][1], ["timestamp", "latency", "user_query"])
+        self.assertEqual(self.store.load(["text"])["user_query"].tolist(), ["질문 0", "질문 1", "질문 2", "질문 0"])
+
+    def test_columns_for_keeps_the_key_first_without_repeats(self):
+        store = InteractionStore(self.table.fetch, prepare, {"a": ["x", "timestamp"], "b": ["x", "y"]})
+        self.assertEqual(store.columns_for(["a", "b"]), ["timestamp", "x", "y"])
+
+
+if __name__ == "__main__":
+    unittest.main()
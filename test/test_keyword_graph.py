@@ -0,0 +1,47 @@
+import unittest
+
+from utils.keyword_matrix import KeywordMatrix, cooccurrence
+from utils.keyword_graph import EgoGraph, MAX_NODES, node_id, parse_node_id
+
+
+def matrix():
+    queries = ["전시 시간", "전시 시간", "전시 위치", "주차"]
+    responses = ["오전 개관", "오전 개관", "본관 이층", "주차장 무료"]
+    return KeywordMatrix(*cooccurrence(queries, responses))
+
+
+class EgoGraphTest(unittest.TestCase):
+    def test_one_hop_keeps_the_strongest_neighbours(self):
+        graph = EgoGraph(matrix(), "q", "전시", hops=1, top_k=2)
+        self.assertEqual(graph.center, "q_전시")
+        neighbours = {edge["target"]: edge["weight"] for edge in graph.edges}
+        self.assertEqual(neighbours, {"r_오전": 2, "r_개관": 2})
+        self.assertTrue(all(graph.nodes[node]["hop"] == 1 for node in neighbours))
+
+    def test_min_weight_prunes_edges(self):
+        graph = EgoGraph(matrix(), "q", "전시", hops=1, top_k=10, min_weight=2)
+        self.assertEqual({edge["target"] for edge in graph.edges}, {"r_오전", "r_개관"})
+
+    def test_parent_of_a_second_hop_node(self):
+        graph = EgoGraph(matrix(), "q", "전시", hops=2, top_k=10)
+        # 시간 is only reached through a response word of 전시
+        self.assertEqual(graph.nodes["q_시간"]["hop"], 2)
+        self.assertIn(graph.parent("q_시간"), ("r_오전", "r_개관"))
+        self.assertEqual(graph.parent("r_본관"), graph.center)
+        self.assertEqual(graph.parent(graph.center), graph.center)
+
+    def test_every_node_is_reached_once(self):
+        graph = EgoGraph(matrix(), "q", "전시", hops=3, top_k=10)
+        targets = [edge["target"] for edge in graph.edges]
+        self.assertEqual(len(targets), len(set(targets)))
+        self.assertEqual(len(graph.nodes), len(targets) + 1)
+        self.assertNotIn("q_주차", graph.nodes)
+        self.assertLessEqual(len(graph.nodes), MAX_NODES)
+
+    def test_node_ids_round_trip(self):
+        self.assertEqual(parse_node_id(node_id("r", "주차_장")), ("r", "주차_장"))
+        self.assertEqual(parse_node_id(None), (None, None))
+
+
+if __name__ == "__main__":
+    unittest.main()
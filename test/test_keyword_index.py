@@ -0,0 +1,126 @@
+import unittest
+import numpy as np
+import pandas as pd
+
+from utils.keyword_index import KeywordIndex, KeywordIndexCache
+from utils.keyword_matrix import Vocabulary
+from utils.token_ids import TokenArrays
+
+
+class SyncedVocabulary(Vocabulary):
+    # Id 0 is the unstored token, as in TokenVocabulary
+    def __init__(self):
+        super().__init__([""])
+
+    def sync(self):
+        pass
+
+
+def frame(start, queries, responses, freq="h"):
+    return pd.DataFrame({
+        "timestamp": pd.date_range(start, periods=len(queries), freq=freq),
+        "user_query": queries,
+        "response": responses,
+    })
+
+
+class KeywordIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.vocabulary = SyncedVocabulary()
+
+    def arrays(self, data):
+        return (
+            data["timestamp"],
+            TokenArrays.from_texts(data["user_query"], self.vocabulary),
+            TokenArrays.from_texts(data["response"], self.vocabulary),
+        )
+
+    def build(self, data):
+        return KeywordIndex(*self.arrays(data), self.vocabulary)
+
+    def assert_same(self, index, expected):
+        np.testing.assert_array_equal(index.timestamps, expected.timestamps)
+        for word in ("전시", "시간", "주차", "오전", "무료", "본관"):
+            for side in ("q", "r", "any"):
+                np.testing.assert_array_equal(index.rows(word, side), expected.rows(word, side))
+
+    def test_search_and_or_with_a_date_range(self):
+        data = frame("2024-01-01", ["전시 시간", "전시 위치", "주차", "전시 시간"], ["오전 개관", "본관", "무료", "오후"])
+        index = self.build(data)
+        np.testing.assert_array_equal(index.search([("전시", "q"), ("시간", "q")]), [0, 3])
+        np.testing.assert_array_equal(index.search([("주차", "q"), ("본관", "r")], mode="or"), [1, 2])
+        np.testing.assert_array_equal(index.search([("전시", "any")], low=data["timestamp"][1], high=data["timestamp"][2]), [1])
+        self.assertEqual(index.keys([2])[0], data["timestamp"][2])
+        self.assertEqual(len(index.search([("없는", "q")])), 0)
+
+    def test_appended_rows_match_a_full_build(self):
+        old = frame("2024-01-01", ["전시 시간", "주차"], ["오전", "무료"])
+        new = frame("2024-01-02", ["전시", "주차 시간"], ["본관", "오전 무료"])
+        merged = self.build(old).merge(*self.arrays(new), self.vocabulary)
+        self.assert_same(merged, self.build(pd.concat([old, new], ignore_index=True)))
+
+    def test_rewritten_and_earlier_rows_match_a_full_build(self):
+        old = frame("2024-01-01", ["전시 시간", "주차", "전시"], ["오전", "무료", "본관"], freq="2h")
+        # Replaces the middle row and lands one row between the first two
+        new = pd.DataFrame({
+            "timestamp": pd.to_datetime(["2024-01-01 02:00", "2024-01-01 01:00"]),
+            "user_query": ["시간", "주차 전시"],
+            "response": ["본관 오전", "무료"],
+        })
+        merged = self.build(old).merge(*self.arrays(new), self.vocabulary)
+        expected = pd.concat([old.drop(index=1), new]).sort_values("timestamp", ignore_index=True)
+        self.assert_same(merged, self.build(expected))
+        self.assertEqual(len(merged), 4)
+
+    def test_merging_nothing_keeps_the_index(self):
+        index = self.build(frame("2024-01-01", ["전시"], ["오전"]))
+        self.assertIs(index.merge([], TokenArrays.from_blobs([]), TokenArrays.from_blobs([]), self.vocabulary), index)
+
+
+class KeywordIndexCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.vocabulary = SyncedVocabulary()
+        self.table = frame("2024-01-01", ["전시", "주차"], ["오전", "무료"])
+        self.loads = []
+        self.cache = KeywordIndexCache(self.load, self.vocabulary)
+
+    def load(self, ranges):
+        self.loads.append(ranges)
+        rows = self.table
+        if ranges is not None:
+            mask = np.zeros(len(rows), dtype=bool)
+            for low, high in ranges:
+                mask |= (rows["timestamp"] >= (low or pd.Timestamp.min)) & (rows["timestamp"] <= (high or pd.Timestamp.max))
+            rows = rows[mask]
+        return (
+            rows["timestamp"],
+            TokenArrays.from_texts(rows["user_query"], self.vocabulary),
+            TokenArrays.from_texts(rows["response"], self.vocabulary),
+        )
+
+    def test_loads_only_new_and_touched_rows(self):
+        self.assertEqual(len(self.cache.get(1)), 2)
+        self.assertIs(self.cache.get(1), self.cache.get(1))
+        self.assertEqual(self.loads, [None])
+
+        rewritten = frame("2024-01-01", ["시간"], ["본관"])
+        appended = frame("2024-01-03", ["전시"], ["오후"])
+        self.table = pd.concat([rewritten, self.table.iloc[1:], appended], ignore_index=True)
+        self.cache.mark_touched(rewritten["timestamp"])
+        index = self.cache.get(2)
+
+        watermark = pd.Timestamp("2024-01-01 01:00")
+        self.assertEqual(self.loads[1][0][0], watermark + pd.Timedelta(microseconds=1))
+        self.assertEqual(self.loads[1][1], (pd.Timestamp("2024-01-01"), pd.Timestamp("2024-01-01")))
+        np.testing.assert_array_equal(index.rows("전시", "q"), [2])
+        np.testing.assert_array_equal(index.rows("시간", "q"), [0])
+
+    def test_reset_reloads_everything(self):
+        self.cache.get(1)
+        self.cache.reset()
+        self.cache.get(1)
+        self.assertEqual(self.loads, [None, None])
+
+
+if __name__ == "__main__":
+    unittest.main()
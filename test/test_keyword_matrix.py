@@ -0,0 +1,73 @@
+import re
+import unittest
+from collections import Counter
+import numpy as np
+
+from utils.keyword_matrix import KeywordMatrix, SEPARATOR, Vocabulary, cooccurrence, explode_tokens
+
+
+QUERIES = ["전시 시간 전시", "주차 가능?", None, "Parking 주차"]
+RESPONSES = ["오전 9시", "주차 가능 오전", "무료", f"parking{SEPARATOR}free"]
+
+
+def counter_cooccurrence(queries, responses):
+    # The per-row Counter loop cooccurrence() replaced
+    counts = Counter()
+    for query, response in zip(queries, responses):
+        query_words = Counter(re.findall(r"\w+", str(query or "").lower()))
+        response_words = Counter(re.findall(r"\w+", str(response or "").lower()))
+        for r, r_count in response_words.items():
+            for q, q_count in query_words.items():
+                counts[r, q] += r_count * q_count
+    return counts
+
+
+class CooccurrenceTest(unittest.TestCase):
+    def test_explode_keeps_rows_for_empty_texts_and_separators(self):
+        rows, tokens = explode_tokens(["A b", None, "", f"c{SEPARATOR}d"])
+        self.assertEqual(rows.tolist(), [0, 0, 3, 3])
+        self.assertEqual(tokens.tolist(), ["a", "b", "c", "d"])
+        self.assertEqual(len(explode_tokens([])[0]), 0)
+
+    def test_matches_the_counter_loop(self):
+        matrix, vocab = cooccurrence(QUERIES, RESPONSES)
+        expected = counter_cooccurrence(QUERIES, RESPONSES)
+        ids = {word: i for i, word in enumerate(vocab)}
+        actual = {(vocab[r], vocab[q]): count for (r, q), count in matrix.todok().items()}
+        self.assertEqual(actual, {pair: count for pair, count in expected.items() if count})
+        self.assertEqual(matrix[ids["오전"], ids["전시"]], 2)
+
+    def test_vocabulary_ids_are_stable_across_calls(self):
+        vocabulary = Vocabulary()
+        _, first = cooccurrence(["전시"], ["오전"], vocabulary)
+        _, second = cooccurrence(["주차 전시"], ["오후"], vocabulary)
+        self.assertEqual(second[:len(first)].tolist(), first.tolist())
+        self.assertEqual(vocabulary.lookup(np.array(["오후", "새말"], dtype=object)).tolist(), [3, 4])
+
+
+class KeywordMatrixTest(unittest.TestCase):
+    def setUp(self):
+        self.keywords = KeywordMatrix(*cooccurrence(QUERIES, RESPONSES))
+
+    def test_sorted_by_totals_without_empty_words(self):
+        self.assertEqual(self.keywords.query_words[:2].tolist(), ["주차", "전시"])
+        self.assertTrue(np.all(np.diff(self.keywords.query_totals) <= 0))
+        self.assertTrue(np.all(np.diff(self.keywords.response_totals) <= 0))
+        self.assertNotIn("무료", self.keywords.response_words.tolist())
+        self.assertEqual(self.keywords.top_query_words(1).to_dict(), {"주차": 5})
+
+    def test_frame_slices_the_top_words(self):
+        frame = self.keywords.frame(2, 3)
+        self.assertEqual(frame.shape, (2, 3))
+        self.assertEqual(frame.loc["오전", "전시"], 2)
+
+    def test_neighbours(self):
+        positions, counts = self.keywords.neighbours("q", "전시")
+        self.assertEqual(dict(zip(self.keywords.response_words[positions], counts)), {"오전": 2, "9시": 2})
+        positions, counts = self.keywords.neighbours("r", "parking")
+        self.assertEqual(dict(zip(self.keywords.query_words[positions], counts)), {"parking": 1, "주차": 1})
+        self.assertEqual(len(self.keywords.neighbours("q", "없는")[0]), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
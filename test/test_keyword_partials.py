@@ -0,0 +1,83 @@
+import os
+import shutil
+import tempfile
+import unittest
+import pandas as pd
+
+from utils.keyword_matrix import Vocabulary, cooccurrence_ids
+from utils.keyword_partials import KeywordPartials
+from utils.token_ids import TokenArrays
+
+
+class SyncedVocabulary(Vocabulary):
+    def __init__(self):
+        super().__init__([""])
+
+    def sync(self):
+        pass
+
+
+class KeywordPartialsTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.vocabulary = SyncedVocabulary()
+        self.partials = KeywordPartials(self.directory, self.vocabulary)
+        self.data = pd.DataFrame({
+            "timestamp": pd.to_datetime(["2024-01-01 09:00", "2024-01-01 23:00", "2024-01-02 10:00", "2024-01-04 08:00"]),
+            "user_query": ["전시 시간", "주차", "전시", "주차 요금"],
+            "response": ["오전", "무료", "본관 오전", "무료"],
+        })
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def add(self, days, data):
+        self.partials.add_days(
+            days,
+            data["timestamp"],
+            TokenArrays.from_texts(data["user_query"], self.vocabulary),
+            TokenArrays.from_texts(data["response"], self.vocabulary),
+        )
+
+    def expected(self, data):
+        query_ids = TokenArrays.from_texts(data["user_query"], self.vocabulary)
+        response_ids = TokenArrays.from_texts(data["response"], self.vocabulary)
+        return cooccurrence_ids(query_ids, response_ids, len(self.vocabulary))
+
+    def test_a_range_is_the_sum_of_its_days(self):
+        days = ["2024-01-01", "2024-01-02", "2024-01-03", "2024-01-04"]
+        self.add(days, self.data)
+        self.assertEqual(self.partials.missing(days), [])
+        matrix, words = self.partials.total(days)
+        self.assertEqual(len(words), matrix.shape[0])
+        self.assertEqual((matrix != self.expected(self.data)).nnz, 0)
+        first_two, _ = self.partials.total(days[:2])
+        self.assertEqual((first_two != self.expected(self.data.iloc[:3])).nnz, 0)
+
+    def test_touched_days_are_rebuilt(self):
+        self.add(["2024-01-01", "2024-01-02"], self.data)
+        self.partials.total(["2024-01-01"])
+        self.partials.mark_touched(["2024-01-01 12:00:00", "bad"])
+        touched = self.partials.pop_touched()
+        self.assertEqual(touched, ["2024-01-01"])
+        self.assertEqual(self.partials.pop_touched(), [])
+        self.partials.invalidate(touched)
+        self.assertEqual(self.partials.missing(["2024-01-01", "2024-01-02"]), ["2024-01-01"])
+
+        changed = self.data.iloc[:2].assign(response=["주차 무료", "본관"])
+        self.add(touched, changed)
+        matrix, words = self.partials.total(["2024-01-01"])
+        ids = {word: i for i, word in enumerate(words)}
+        self.assertEqual(matrix[ids["본관"], ids["주차"]], 1)
+        self.assertEqual(matrix[ids["오전"], ids["전시"]], 0)
+
+    def test_no_days_and_clear(self):
+        matrix, _ = self.partials.total([])
+        self.assertEqual(matrix.nnz, 0)
+        self.add(["2024-01-01"], self.data)
+        self.partials.clear()
+        self.assertEqual(os.listdir(self.directory), ["lock"])
+
+
+if __name__ == "__main__":
+    unittest.main()
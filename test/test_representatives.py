@@ -0,0 +1,61 @@
+import unittest
+import numpy as np
+
+from utils.representatives import Segments, medoid_scores, representatives
+
+
+def naive(texts, weights, labels, embeddings, kind):
+    # The per-cluster loop representatives() replaced
+    unit = embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
+    result = {}
+    for label in np.unique(labels):
+        members = np.flatnonzero(labels == label)
+        if kind == "central":
+            centroid = (weights[members, None] * embeddings[members]).sum(axis=0)
+            scores = unit[members] @ (centroid / np.linalg.norm(centroid))
+        elif kind == "frequent":
+            scores = weights[members]
+        elif kind == "shortest":
+            scores = -np.array([len(texts[i]) for i in members])
+        else:
+            scores = (unit[members] @ unit[members].T) @ weights[members]
+        result[label] = texts[members[np.argmax(scores)]]
+    return result
+
+
+class RepresentativesTest(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        n = 60
+        self.texts = np.array([f"문장 {'가' * int(rng.integers(1, 9))} {i}" for i in range(n)], dtype=object)
+        self.weights = rng.integers(1, 5, n).astype(np.float64)
+        self.labels = rng.integers(0, 5, n) * 3
+        self.embeddings = rng.standard_normal((n, 8))
+
+    def test_every_kind_matches_the_per_cluster_loop(self):
+        for kind in ("central", "frequent", "shortest", "medoid"):
+            with self.subTest(kind=kind):
+                self.assertEqual(
+                    representatives(self.texts, self.weights, self.labels, self.embeddings, kind),
+                    naive(self.texts, self.weights, self.labels, self.embeddings, kind),
+                )
+
+    def test_blocked_medoid_scores_match_the_closed_form(self):
+        segments = Segments(self.labels)
+        closed = medoid_scores(segments, self.embeddings, self.weights)
+        # A budget of a few rows forces several blocks per cluster
+        blocked = medoid_scores(segments, self.embeddings, self.weights, method="blocked", memory_bytes=256)
+        np.testing.assert_allclose(blocked, closed, rtol=1e-5)
+
+    def test_ties_pick_the_first_row(self):
+        segments = Segments([2, 1, 2, 1, 2])
+        self.assertEqual(segments.argmax([5, 1, 7, 1, 7]).tolist(), [1, 2])
+        self.assertEqual(segments.argmax([np.nan, 0, np.nan, 3, 1]).tolist(), [3, 4])
+
+    def test_unknown_kind(self):
+        with self.assertRaises(ValueError):
+            representatives(self.texts, self.weights, self.labels, self.embeddings, "longest")
+
+
+if __name__ == "__main__":
+    unittest.main()
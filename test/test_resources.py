@@ -0,0 +1,87 @@
+import unittest
+from unittest import mock
+import pandas as pd
+
+from utils.resources import ResourceRegistry, resources
+
+
+class FakeDB:
+    # Answers the two queries behind the sidebar date bounds and plain reads of the table
+    def __init__(self, columns=()):
+        self.queries = []
+        self.columns = list(columns)
+
+    def send_query(self, query):
+        self.queries.append(query)
+        if query.startswith("SHOW COLUMNS"):
+            return pd.DataFrame({"Field": self.columns})
+        if "information_schema.statistics" in query:
+            return pd.DataFrame({"n": [1]})
+        if "min(timestamp)" in query:
+            return pd.DataFrame({"min_ts": ["2024-01-01 00:00:00"], "max_ts": ["2024-01-31 15:00:00"]})
+        if query.startswith("select ") and "twinnydb.interactions_all" in query:
+            return pd.DataFrame(columns=["timestamp"])
+        raise AssertionError(f"unexpected query: {query}")
+
+
+def unavailable(name):
+    def factory():
+        raise AssertionError(f"{name} must not be built on a read-only path")
+    return factory
+
+
+class ResourceRegistryTest(unittest.TestCase):
+    def test_builds_once_on_first_get(self):
+        registry = ResourceRegistry()
+        calls = []
+        registry.register("db", lambda: calls.append(1) or object())
+        self.assertFalse(registry.is_loaded("db"))
+        first = registry.get("db")
+        self.assertIs(registry.get("db"), first)
+        self.assertEqual(len(calls), 1)
+        self.assertIn("db", registry.timings())
+
+    def test_override_replaces_the_factory(self):
+        registry = ResourceRegistry()
+        registry.register("model", unavailable("model"))
+        fake = object()
+        registry.override("model", fake)
+        self.assertIs(registry.get("model"), fake)
+        registry.reset("model")
+        self.assertFalse(registry.is_loaded("model"))
+
+
+class ReadOnlyPathTest(unittest.TestCase):
+    def setUp(self):
+        import utils.data
+        self.data = utils.data
+        self.db = FakeDB(utils.data.STATUS_COLUMNS + list(utils.data.CLUSTER_COLUMNS.values()))
+        self.factories = dict(resources._factories)
+        resources.reset()
+        resources.override("db", self.db)
+        # Anything heavy a read-only page touched would fail the test
+        for name in ("model", "tokenizer", "cluster_models"):
+            resources.register(name, unavailable(name))
+
+    def tearDown(self):
+        resources.reset()
+        resources._factories.update(self.factories)
+
+    def test_date_bounds_use_the_fake_db_only(self):
+        low, high = self.data.get_date_bounds(version=-1)
+        self.assertEqual(low, pd.Timestamp("2024-01-01 09:00:00"))
+        self.assertEqual(high, pd.Timestamp("2024-02-01 00:00:00"))
+        self.assertTrue(any("min(timestamp)" in query for query in self.db.queries))
+        for name in ("model", "tokenizer", "cluster_models"):
+            self.assertFalse(resources.is_loaded(name))
+
+    def test_reads_never_migrate(self):
+        failing = mock.Mock(side_effect=AssertionError("migration on a read"))
+        with mock.patch.object(self.data, "migrate_token_ids", failing), \
+                mock.patch.object(self.data, "migrate_similarity_scores", failing):
+            self.data.fetch_from_db(columns=["timestamp"])
+        self.assertFalse(any(query.lstrip().upper().startswith(("ALTER", "UPDATE")) for query in self.db.queries))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,88 @@
+import unittest
+import pandas as pd
+
+from utils.general_dashboard_utils import average_latency, calculate_rollup_counts, convert_rollups_to_listof_dic
+from utils.rollups import ROLLUP_TABLE, clear_rollups, ensure_rollup_table, rollup_upsert_query, update_rollups
+
+
+class RecordingDB:
+    def __init__(self, existing=0):
+        self.existing = existing
+        self.queries = []
+
+    def send_query(self, query):
+        self.queries.append(" ".join(query.split()))
+        if "COUNT(*) AS n" in query:
+            return pd.DataFrame({"n": [self.existing]})
+        return pd.DataFrame()
+
+
+def rollups(rows):
+    return pd.DataFrame(rows, columns=["date", "hour", "query_count", "latency_sum", "latency_count"]).assign(
+        date=lambda frame: pd.to_datetime(frame["date"])
+    )
+
+
+class UpdateRollupsTest(unittest.TestCase):
+    def setUp(self):
+        ensure_rollup_table.clear()
+
+    def test_empty_table_is_backfilled_once(self):
+        db = RecordingDB(existing=0)
+        update_rollups(db, ["2024-01-01 00:10:00"])
+        update_rollups(db, ["2024-01-01 00:20:00"])
+        backfills = [q for q in db.queries if q.startswith(f"INSERT INTO {ROLLUP_TABLE}") and "WHERE" not in q]
+        self.assertEqual(len(backfills), 1)
+
+    def test_recomputes_the_whole_hours_touched(self):
+        db = RecordingDB(existing=5)
+        update_rollups(db, ["2024-01-01 03:59:59.5", "bad", "2024-01-01 01:30:00"])
+        self.assertIn(
+            "WHERE timestamp >= '2024-01-01 01:00:00.000000' AND timestamp < '2024-01-01 04:00:00.000000'",
+            db.queries[-1],
+        )
+        # Buckets are grouped by KST hour
+        self.assertIn("HOUR(timestamp + INTERVAL 9 HOUR)", rollup_upsert_query())
+
+    def test_nothing_to_update(self):
+        db = RecordingDB()
+        update_rollups(db, ["bad"])
+        self.assertEqual(db.queries, [])
+
+    def test_clear_truncates(self):
+        db = RecordingDB(existing=5)
+        clear_rollups(db)
+        self.assertEqual(db.queries[-1], f"TRUNCATE TABLE {ROLLUP_TABLE};")
+
+
+class RollupCountsTest(unittest.TestCase):
+    def setUp(self):
+        # Monday the 1st and Wednesday the 3rd, nothing on the 2nd
+        self.rollups = rollups([
+            ("2024-01-01", 9, 3, 6.0, 3),
+            ("2024-01-01", 14, 1, 4.0, 1),
+            ("2024-01-03", 9, 2, 2.0, 1),
+            ("2024-01-03", 10, 0, None, 0),
+        ])
+
+    def test_hourly_weekday_and_daily_counts(self):
+        hourly, weekday, daily = calculate_rollup_counts(self.rollups)
+        self.assertEqual(hourly.to_dict("list"), {"hour": ["09:00", "14:00"], "user_query_count": [5, 1]})
+        counts = weekday.set_index("day_name")["user_query_count"]
+        self.assertEqual(list(counts.index[:3]), ["Monday", "Tuesday", "Wednesday"])
+        self.assertEqual(counts.tolist(), [4, 0, 2, 0, 0, 0, 0])
+        self.assertEqual(daily.to_dict("list"), {"date": ["2024-01-01", "2024-01-02", "2024-01-03"], "user_query_count": [4, 0, 2]})
+
+    def test_interval_pivot(self):
+        pivot = convert_rollups_to_listof_dic(self.rollups)
+        self.assertEqual([row["day_name"] for row in pivot], ["Monday", "Wednesday"])
+        self.assertEqual(pivot[0]["09:00 - 11:00"], 3)
+        self.assertEqual(pivot[0]["13:00 - 15:00"], 1)
+        self.assertEqual(pivot[1]["09:00 - 11:00"], 2)
+
+    def test_average_latency_weights_by_count(self):
+        self.assertAlmostEqual(average_latency(self.rollups), 12.0 / 5)
+
+
+if __name__ == "__main__":
+    unittest.main()
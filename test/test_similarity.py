@@ -0,0 +1,50 @@
+import os
+import tempfile
+import unittest
+import numpy as np
+from sklearn.metrics.pairwise import cosine_similarity
+
+from utils.similarity import pairwise_cosine, rowwise_cosine, rowwise_dot, upper_triangle
+
+
+def matrix(n=40, d=6, seed=0):
+    rows = np.random.default_rng(seed).standard_normal((n, d)).astype(np.float32)
+    rows[min(5, n - 1)] = 0
+    return rows
+
+
+class SimilarityTest(unittest.TestCase):
+    def test_rowwise_cosine_is_the_diagonal(self):
+        a, b = matrix(seed=0), matrix(seed=1)
+        expected = np.diag(cosine_similarity(a, b))
+        np.testing.assert_allclose(rowwise_cosine(a, b, block=7), expected, atol=1e-6)
+        self.assertEqual(rowwise_cosine(a, b)[5], 0)
+
+    def test_rowwise_cosine_reads_memory_mapped_rows(self):
+        a = matrix(n=30)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "rows.npy")
+            np.save(path, a)
+            mapped = np.load(path, mmap_mode="r")
+            np.testing.assert_allclose(rowwise_cosine(mapped, mapped[::-1], block=4), rowwise_cosine(a, a[::-1]), atol=1e-6)
+
+    def test_rowwise_dot_with_an_index(self):
+        rows, vectors = matrix(n=10), matrix(n=3, seed=2)
+        index = np.array([2, 0, 1, 1, 0, 2, 2, 0, 1, 0])
+        np.testing.assert_allclose(rowwise_dot(rows, vectors, index, block=3), (rows * vectors[index]).sum(axis=1), rtol=1e-5)
+
+    def test_blocked_pairwise_matches_sklearn(self):
+        a = matrix()
+        # Room for a few rows per block
+        np.testing.assert_allclose(pairwise_cosine(a, memory_bytes=1000), cosine_similarity(a), atol=1e-6)
+
+    def test_upper_triangle_order(self):
+        a = matrix(n=23)
+        expected = cosine_similarity(a)[np.triu_indices(len(a), k=1)]
+        np.testing.assert_allclose(upper_triangle(a, memory_bytes=400), expected, atol=1e-6)
+        self.assertEqual(len(upper_triangle(a[:1])), 0)
+        self.assertEqual(len(upper_triangle(a[:0])), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,106 @@
+import math
+import unittest
+import numpy as np
+import pandas as pd
+
+from utils.similarity_histogram import (
+    BIN_LOW, BIN_WIDTH, N_BINS, HISTOGRAM_TABLE, bin_sql, coarsen_histogram, ensure_histogram_table,
+    get_similarity_histogram, histogram_count, histogram_mean, update_similarity_histogram,
+)
+
+
+SQL_FUNCTIONS = {"FLOOR": math.floor, "ROUND": round, "LEAST": min, "GREATEST": max}
+
+
+def sql_bin(score):
+    # bin_sql() evaluated for one score, MySQL's functions mapped to Python's
+    return eval(bin_sql("score"), dict(SQL_FUNCTIONS, score=score))
+
+
+class HistogramDB:
+    def __init__(self, summed=None):
+        self.summed = summed if summed is not None else pd.DataFrame(columns=["bin", "count", "score_sum"])
+        self.queries = []
+
+    def send_query(self, query):
+        self.queries.append(" ".join(query.split()))
+        if "COUNT(*) AS n" in query:
+            return pd.DataFrame({"n": [1]})
+        if "GROUP BY bin" in query:
+            return self.summed
+        return pd.DataFrame()
+
+
+def histogram(scores):
+    scores = np.asarray(scores, dtype=np.float64)
+    bins = np.array([sql_bin(score) for score in scores])
+    summed = pd.DataFrame({"bin": bins, "score": scores}).groupby("bin")["score"].agg(count="count", score_sum="sum").reset_index()
+    return get_similarity_histogram(HistogramDB(summed), "2024-01-01", "2024-01-02", len(scores))
+
+
+class BinTest(unittest.TestCase):
+    def test_edges_land_in_the_bin_above(self):
+        for edge in (-0.5, 0.0, 0.3, 0.29, 0.7, 0.71):
+            self.assertEqual(sql_bin(edge), round((edge - BIN_LOW) / BIN_WIDTH))
+        self.assertEqual(sql_bin(0.3 - 1e-4), sql_bin(0.3) - 1)
+
+    def test_ends_are_clamped(self):
+        self.assertEqual(sql_bin(-1.0), 0)
+        self.assertEqual(sql_bin(1.0), N_BINS - 1)
+        self.assertEqual(sql_bin(1.0000001), N_BINS - 1)
+
+
+class HistogramTest(unittest.TestCase):
+    def setUp(self):
+        ensure_histogram_table.clear()
+        self.scores = [-0.2, 0.0, 0.29, 0.3, 0.3, 0.55, 0.7, 0.95, 1.0]
+        self.histogram = histogram(self.scores)
+
+    def test_every_bin_is_present_with_its_edges(self):
+        self.assertEqual(len(self.histogram), N_BINS)
+        self.assertEqual(self.histogram["low"].iloc[0], -1.0)
+        self.assertEqual(self.histogram["high"].iloc[-1], 1.0)
+        self.assertEqual(self.histogram["count"].sum(), len(self.scores))
+
+    def test_threshold_counts_are_exact(self):
+        scores = np.array(self.scores)
+        for low, high in ((None, 0.3), (0.3, 0.7), (0.7, None), (0.0, 0.01)):
+            expected = ((scores >= (low if low is not None else -np.inf)) & (scores < (high if high is not None else np.inf))).sum()
+            self.assertEqual(histogram_count(self.histogram, low, high), expected, (low, high))
+        self.assertAlmostEqual(histogram_mean(self.histogram), np.mean(self.scores))
+
+    def test_coarsen_keeps_counts_and_edges(self):
+        coarse = coarsen_histogram(self.histogram, 0.1)
+        self.assertEqual(len(coarse), 20)
+        self.assertEqual(coarse["count"].sum(), len(self.scores))
+        self.assertEqual(coarse.loc[13, ["low", "high"]].tolist(), [0.3, 0.4])
+        self.assertEqual(coarse.loc[13, "count"], 2)
+
+    def test_empty_range(self):
+        empty = get_similarity_histogram(HistogramDB(), "2024-02-01", "2024-02-01", 0)
+        self.assertEqual(empty["count"].sum(), 0)
+        self.assertTrue(math.isnan(histogram_mean(empty)))
+
+
+class UpdateHistogramTest(unittest.TestCase):
+    def setUp(self):
+        ensure_histogram_table.clear()
+
+    def test_rebuilds_whole_kst_days(self):
+        db = HistogramDB()
+        # 23:59 on the 1st and 00:00 on the 2nd in KST
+        update_similarity_histogram(db, ["2024-01-01 14:59:00", "2024-01-01 15:00:00", "bad"])
+        self.assertEqual(db.queries[-2], f"DELETE FROM {HISTOGRAM_TABLE} WHERE date BETWEEN '2024-01-01' AND '2024-01-02';")
+        self.assertIn(
+            "timestamp >= '2023-12-31 15:00:00.000000' AND timestamp < '2024-01-02 15:00:00.000000'",
+            db.queries[-1],
+        )
+
+    def test_nothing_to_update(self):
+        db = HistogramDB()
+        update_similarity_histogram(db, [])
+        self.assertEqual(db.queries, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,123 @@
+import json
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from unittest import mock
+import numpy as np
+import pandas as pd
+
+from utils.snapshot import Snapshot
+
+
+def rows(start, n, text="질문"):
+    timestamps = pd.date_range(start, periods=n, freq="min")
+    return pd.DataFrame({
+        "timestamp": timestamps,
+        "user_query": [f"{text} {i}" for i in range(n)],
+        "response": ["답변"] * n,
+        "latency": np.arange(n, dtype=np.float64),
+        "query_embedding": list(np.full((n, 4), 1, dtype=np.float32)),
+        "response_embedding": list(np.full((n, 4), 2, dtype=np.float32)),
+    })
+
+
+# Small parts and batches so a few rows exercise the part logic
+@mock.patch("utils.snapshot.PART_ROWS", 4)
+@mock.patch("utils.snapshot.BATCH_ROWS", 2)
+class SnapshotTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.snapshot = Snapshot(self.directory)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def part_names(self):
+        return [part["name"] for part in self.snapshot.manifest()["parts"]]
+
+    def test_manifest_holds_ordered_disjoint_parts(self):
+        self.snapshot.write(rows("2024-01-01", 10))
+        manifest = self.snapshot.manifest()
+        self.assertEqual([part["rows"] for part in manifest["parts"]], [4, 4, 2])
+        self.assertEqual([len(part["batches"]) for part in manifest["parts"]], [2, 2, 1])
+        bounds = [(pd.Timestamp(p["batches"][0][0]), pd.Timestamp(p["batches"][-1][1])) for p in manifest["parts"]]
+        self.assertTrue(all(high < low for (_, high), (low, _) in zip(bounds, bounds[1:])))
+        self.assertEqual(self.snapshot.watermark, pd.Timestamp("2024-01-01 00:09"))
+        with open(os.path.join(self.directory, "manifest.json")) as f:
+            self.assertEqual(json.load(f)["next_part"], 3)
+
+    def test_read_columns_and_ranges(self):
+        self.snapshot.write(rows("2024-01-01", 10))
+        data = self.snapshot.read(["timestamp", "user_query"], [(pd.Timestamp("2024-01-01 00:03"), pd.Timestamp("2024-01-01 00:05"))])
+        self.assertEqual(list(data.columns), ["timestamp", "user_query"])
+        self.assertEqual(data["user_query"].tolist(), ["질문 3", "질문 4", "질문 5"])
+        timestamps, queries, responses = self.snapshot.read_embeddings()
+        self.assertEqual(queries.shape, (10, 4))
+        self.assertTrue((responses == 2).all())
+
+    def test_upsert_past_the_watermark_adds_parts(self):
+        self.snapshot.write(rows("2024-01-01", 8))
+        before = self.part_names()
+        self.snapshot.upsert(rows("2024-01-02", 3))
+        self.assertEqual(self.part_names()[:2], before)
+        self.assertEqual(len(self.snapshot.read()), 11)
+        self.assertEqual(self.snapshot.watermark, pd.Timestamp("2024-01-02 00:02"))
+
+    def test_rewrite_only_touches_overlapping_parts(self):
+        self.snapshot.write(rows("2024-01-01", 12))
+        first, second, third = self.part_names()
+        self.snapshot.upsert(rows("2024-01-01 00:05", 2, text="수정"))
+        names = self.part_names()
+        self.assertEqual(names[0], first)
+        self.assertEqual(names[-1], third)
+        self.assertNotIn(second, names)
+        self.assertFalse(os.path.exists(os.path.join(self.directory, second)))
+        data = self.snapshot.read(["timestamp", "user_query"])
+        self.assertEqual(len(data), 12)
+        self.assertEqual(data["user_query"].tolist()[4:8], ["질문 4", "수정 0", "수정 1", "질문 7"])
+
+    def test_patch_sets_columns_in_place(self):
+        self.snapshot.write(rows("2024-01-01", 8))
+        keys = pd.to_datetime(["2024-01-01 00:06", "2024-01-01 00:01"])
+        self.snapshot.patch(keys, {"latency": [60.0, 10.0], "query_cluster": [3, 1]})
+        data = self.snapshot.read(["timestamp", "latency", "query_cluster"])
+        self.assertEqual(data["latency"].tolist(), [0, 10, 2, 3, 4, 5, 60, 7])
+        self.assertEqual(data["query_cluster"].tolist()[1], 1)
+        self.assertEqual(data["query_cluster"].tolist()[6], 3)
+        self.assertTrue(pd.isna(data["query_cluster"].tolist()[0]))
+
+    def test_compact_merges_small_neighbours(self):
+        for day in range(1, 5):
+            self.snapshot.upsert(rows(f"2024-01-0{day}", 2))
+        self.assertEqual(len(self.part_names()), 4)
+        self.snapshot.compact()
+        self.assertEqual([part["rows"] for part in self.snapshot.manifest()["parts"]], [4, 4])
+        self.assertEqual(len(self.snapshot.read()), 8)
+
+    def test_writer_waits_for_readers(self):
+        self.snapshot.write(rows("2024-01-01", 4))
+        written = threading.Event()
+
+        def write():
+            self.snapshot.upsert(rows("2024-01-01", 2, text="수정"))
+            written.set()
+
+        with self.snapshot._file_lock(shared=True), self.snapshot._file_lock(shared=True):
+            writer = threading.Thread(target=write)
+            writer.start()
+            self.assertFalse(written.wait(0.3))
+        writer.join(5)
+        self.assertTrue(written.is_set())
+        self.assertEqual(self.snapshot.read()["user_query"].tolist()[0], "수정 0")
+
+    def test_invalidate_keeps_the_lock_file(self):
+        self.snapshot.write(rows("2024-01-01", 4))
+        self.snapshot.invalidate()
+        self.assertFalse(self.snapshot.exists())
+        self.assertEqual(os.listdir(self.directory), ["lock"])
+
+
+if __name__ == "__main__":
+    unittest.main()
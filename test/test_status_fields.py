@@ -0,0 +1,65 @@
+import json
+import unittest
+import numpy as np
+import pandas as pd
+
+from utils.status_fields import STATUS_COLUMNS, ensure_status_columns, extract_status_columns, parse_status
+
+
+class ColumnsDB:
+    def __init__(self, columns):
+        self.columns = columns
+        self.queries = []
+
+    def send_query(self, query):
+        self.queries.append(" ".join(query.split()))
+        if query.startswith("SHOW COLUMNS"):
+            return pd.DataFrame({"Field": self.columns})
+        return pd.DataFrame()
+
+
+class ExtractStatusTest(unittest.TestCase):
+    def test_parses_json_and_python_reprs(self):
+        self.assertEqual(parse_status('{"battery": NaN}'), {"battery": None})
+        self.assertEqual(parse_status("{'location': {'lat': 1.5}}"), {"location": {"lat": 1.5}})
+        self.assertIsNone(parse_status("[1, 2]"))
+        self.assertIsNone(parse_status(None))
+
+    def test_typed_columns_follow_the_paths_in_order(self):
+        chunk = pd.DataFrame({"status": [
+            '{"location": {"lat": 37.5, "lon": 127.0}, "battery": {"percentage": 80, "level": 3}}',
+            "{'battery': {'level': 2}}",
+            '{"battery": 55, "location": {"lat": "n/a"}}',
+            '{"battery": true}',
+            "not json",
+            None,
+        ]})
+        chunk = extract_status_columns(chunk)
+        np.testing.assert_array_equal(chunk["location_x"], [37.5, np.nan, np.nan, np.nan, np.nan, np.nan])
+        np.testing.assert_array_equal(chunk["location_y"], [127.0, np.nan, np.nan, np.nan, np.nan, np.nan])
+        np.testing.assert_array_equal(chunk["battery"], [80, 2, 55, np.nan, np.nan, np.nan])
+        # The archive keeps valid JSON where the status parsed and the raw text elsewhere
+        self.assertEqual(json.loads(chunk["status"][1]), {"battery": {"level": 2}})
+        self.assertEqual(chunk["status"][4], "not json")
+        self.assertTrue(pd.isna(chunk["status"][5]))
+
+
+class EnsureStatusColumnsTest(unittest.TestCase):
+    def setUp(self):
+        ensure_status_columns.clear()
+
+    def test_adds_and_backfills_only_missing_columns(self):
+        db = ColumnsDB(["timestamp", "status", "location_x"])
+        self.assertEqual(ensure_status_columns(db), ["location_y", "battery"])
+        self.assertIn("ADD COLUMN location_y DOUBLE NULL, ADD COLUMN battery DOUBLE NULL", db.queries[1])
+        self.assertNotIn("location_x =", db.queries[2])
+        self.assertIn("JSON_EXTRACT(REPLACE(status, \"'\", '\"'), '$.battery.percentage')", db.queries[2])
+
+    def test_nothing_to_add(self):
+        db = ColumnsDB(["timestamp", "status", *STATUS_COLUMNS])
+        self.assertEqual(ensure_status_columns(db), [])
+        self.assertEqual(len(db.queries), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
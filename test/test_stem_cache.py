@@ -0,0 +1,61 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from utils.stem_cache import StemCache
+
+
+class CountingAnalyzer:
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, tokens):
+        self.calls.append(list(tokens))
+        return [[token[:2], token[2:]] for token in tokens]
+
+
+class StemCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "stems", "cache.sqlite")
+        self.cache = StemCache(self.path, capacity=2)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_stem_many_analyzes_each_distinct_token_once(self):
+        analyze = CountingAnalyzer()
+        stems = self.cache.stem_many(["전시관", "주차장", "전시관"], analyze)
+        self.assertEqual(analyze.calls, [["전시관", "주차장"]])
+        self.assertEqual(stems["주차장"], ["주차", "장"])
+        self.cache.stem_many(["주차장"], analyze)
+        self.assertEqual(len(analyze.calls), 1)
+        self.assertEqual(self.cache.counts(), {"hits": 2, "disk_hits": 0, "misses": 2})
+
+    def test_flushed_entries_are_shared_through_the_file(self):
+        self.cache.stem("전시관", lambda token: ["전시", "관"])
+        other = StemCache(self.path)
+        self.assertIsNone(other.get("전시관"))
+        self.cache.flush()
+        self.assertEqual(other.get("전시관"), ["전시", "관"])
+        self.assertEqual(other.counts()["disk_hits"], 1)
+
+    def test_memory_is_bounded_and_falls_back_to_disk(self):
+        for token in ("가나", "다라", "마바"):
+            self.cache.put(token, [token])
+        self.cache.flush()
+        self.assertEqual(self.cache.stats()["memory_entries"], 2)
+        self.assertEqual(self.cache.get("가나"), ["가나"])
+        self.assertEqual(self.cache.counts()["disk_hits"], 1)
+
+    def test_clear_empties_memory_and_disk(self):
+        self.cache.put("가나", ["가나"])
+        self.cache.flush()
+        self.cache.clear()
+        self.assertIsNone(self.cache.get("가나"))
+        self.assertIsNone(self.cache.stats()["hit_rate"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,77 @@
+import re
+import unittest
+import numpy as np
+import pandas as pd
+
+from utils.token_ids import MAX_WORD_LENGTH, TokenArrays, TokenVocabulary
+
+
+class VocabTable:
+    # token_vocab in memory: AUTO_INCREMENT ids, INSERT IGNORE on the unique word
+    def __init__(self):
+        self.rows = {}
+        self.next_id = 1
+        self.manager = self
+
+    def send_query(self, query):
+        match = re.search(r"WHERE id >= (\d+)", query)
+        if match is None:
+            return pd.DataFrame()
+        rows = sorted((i, w) for w, i in self.rows.items() if i >= int(match.group(1)))
+        return pd.DataFrame(rows, columns=["id", "word"])
+
+    def write_list_to_db(self, query, data):
+        for (word,) in data:
+            if word not in self.rows:
+                self.rows[word] = self.next_id
+            # Ignored inserts still use up an id, as InnoDB does
+            self.next_id += 1
+
+
+class TokenVocabularyTest(unittest.TestCase):
+    def test_ids_are_shared_between_processes(self):
+        table = VocabTable()
+        first, second = TokenVocabulary(table), TokenVocabulary(table)
+        self.assertEqual(first.lookup(["전시", "주차", "전시"]).tolist(), [1, 2, 1])
+        self.assertEqual(second.lookup(["주차", "오전", "전시"]).tolist(), [2, 3, 1])
+        first.sync()
+        self.assertEqual(first.array().tolist(), ["", "전시", "주차", "오전"])
+
+    def test_skipped_ids_and_long_words(self):
+        table = VocabTable()
+        table.next_id = 3
+        vocabulary = TokenVocabulary(table)
+        ids = vocabulary.lookup(["전시", "가" * (MAX_WORD_LENGTH + 1)])
+        self.assertEqual(ids.tolist(), [3, 0])
+        self.assertEqual(vocabulary.array().tolist(), ["", "", "", "전시"])
+
+
+class TokenArraysTest(unittest.TestCase):
+    def setUp(self):
+        self.vocabulary = TokenVocabulary(VocabTable())
+        self.arrays = TokenArrays.from_texts(["전시 시간", None, "주차 전시 주차", ""], self.vocabulary)
+
+    def test_rows_keep_their_tokens_in_order(self):
+        words = self.vocabulary.array()
+        rows = [words[self.arrays.ids[a:b]].tolist() for a, b in zip(self.arrays.offsets[:-1], self.arrays.offsets[1:])]
+        self.assertEqual(rows, [["전시", "시간"], [], ["주차", "전시", "주차"], []])
+        self.assertEqual(self.arrays.row_ids().tolist(), [0, 0, 2, 2, 2])
+
+    def test_blob_round_trip(self):
+        blobs = self.arrays.blobs()
+        self.assertEqual(blobs[1], b"")
+        restored = TokenArrays.from_blobs(blobs[:3] + [None])
+        np.testing.assert_array_equal(restored.ids, self.arrays.ids)
+        np.testing.assert_array_equal(restored.offsets, self.arrays.offsets)
+        self.assertEqual(len(TokenArrays.from_blobs([np.nan])), 1)
+
+    def test_take_by_position_and_mask(self):
+        taken = self.arrays.take([2, 0])
+        self.assertEqual(taken.blobs(), [self.arrays.blobs()[2], self.arrays.blobs()[0]])
+        masked = self.arrays.take(np.array([False, True, True, False]))
+        self.assertEqual(masked.lengths().tolist(), [0, 3])
+        self.assertEqual(len(self.arrays.take([])), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,62 @@
+import unittest
+
+from utils.tokenizer import Tokenizer, SimpleAnalyzer
+
+
+TEXTS = [
+    "화장실은 어디에 있나요",
+    "",
+    "전시관으로 안내해줘",
+    None,
+    "공룡 전시는 2층입니다",
+    "Hello 로봇",
+    "몇 시에 닫아",
+]
+
+
+def expected(method, texts):
+    analyzer = SimpleAnalyzer()
+    return [getattr(analyzer, method)(text) if isinstance(text, str) and text else [] for text in texts]
+
+
+class SimpleAnalyzerTest(unittest.TestCase):
+    def test_nouns_strip_trailing_particles(self):
+        self.assertEqual(SimpleAnalyzer().nouns("화장실은 전시관으로 Hello"), ["화장실", "전시관"])
+
+    def test_morphs_split_words_and_numbers(self):
+        self.assertEqual(SimpleAnalyzer().morphs("공룡 전시는 2층"), ["공룡", "전시는", "2", "층"])
+
+
+class InProcessTokenizerTest(unittest.TestCase):
+    def setUp(self):
+        self.tokenizer = Tokenizer("simple", workers=0)
+
+    def test_one_token_list_per_text_in_order(self):
+        for method in ("morphs", "nouns"):
+            self.assertEqual(getattr(self.tokenizer, method)(TEXTS), expected(method, TEXTS))
+
+    def test_empty_batch(self):
+        self.assertEqual(self.tokenizer.nouns([]), [])
+
+
+class PooledTokenizerTest(unittest.TestCase):
+    # Batches smaller than the input spread over two workers, results come back in input order
+    @classmethod
+    def setUpClass(cls):
+        cls.tokenizer = Tokenizer("simple", workers=2, batch_size=2)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tokenizer.close()
+
+    def test_batches_keep_input_order(self):
+        texts = TEXTS * 5
+        for method in ("morphs", "nouns"):
+            self.assertEqual(getattr(self.tokenizer, method)(texts), expected(method, texts))
+
+    def test_matches_in_process(self):
+        self.assertEqual(self.tokenizer.nouns(TEXTS), Tokenizer("simple", workers=0).nouns(TEXTS))
+
+
+if __name__ == "__main__":
+    unittest.main()
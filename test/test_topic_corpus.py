@@ -0,0 +1,55 @@
+import importlib.util
+import unittest
+import numpy as np
+
+from utils.resources import resources
+from utils.tokenizer import Tokenizer
+from utils.token_ids import TokenArrays
+
+
+class StaticVocabulary:
+    # The TokenVocabulary surface topic_corpus uses, without a table behind it
+    def __init__(self, words):
+        self.words = [""] + list(words)
+        self.ids = {word: i for i, word in enumerate(self.words)}
+
+    def sync(self):
+        pass
+
+    def lookup(self, tokens):
+        return np.fromiter((self.ids.get(token, 0) for token in tokens), dtype=np.int64, count=len(tokens))
+
+    def array(self):
+        return np.asarray(self.words, dtype=object)
+
+
+# The evaluate page pulls in its chart and map widgets on import
+@unittest.skipUnless(
+    all(importlib.util.find_spec(name) for name in ("streamlit_elements", "gensim", "folium", "streamlit_folium")),
+    "evaluate page dependencies are not installed",
+)
+class TopicCorpusTest(unittest.TestCase):
+    def setUp(self):
+        self.factories = dict(resources._factories)
+        resources.reset()
+        # "관람을" is what a stem falls back to when the analyzer finds no noun in it
+        self.vocabulary = StaticVocabulary(["전시", "관람을", "museum", "관", "작품"])
+        resources.override("token_vocabulary", self.vocabulary)
+        resources.override("tokenizer", Tokenizer("simple", workers=0))
+
+    def tearDown(self):
+        resources.reset()
+        resources._factories.update(self.factories)
+
+    def test_keeps_nouns_only(self):
+        from utils.evaluate_utils import topic_corpus
+        texts = ["전시 관람을 전시", "museum 관 작품", "관람을"]
+        blobs = TokenArrays.from_texts(texts, self.vocabulary).blobs()
+        corpus, dictionary = topic_corpus(blobs)
+        self.assertEqual(sorted(dictionary.values()), ["작품", "전시"])
+        words = [{dictionary[word]: count for word, count in row} for row in corpus]
+        self.assertEqual(words, [{"전시": 2}, {"작품": 1}, {}])
+
+
+if __name__ == "__main__":
+    unittest.main()
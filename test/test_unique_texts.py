@@ -0,0 +1,57 @@
+import unittest
+from unittest import mock
+import numpy as np
+import pandas as pd
+from sklearn.cluster import KMeans
+
+from utils import queries_and_responses_utils
+from utils.queries_and_responses_utils import get_kmeans_clusters, unique_texts
+
+
+TEXTS = ["전시 시간", "주차", "전시 시간", None, "주차", "전시 시간", "무료 입장", "", "무료 입장"]
+VECTORS = {"전시 시간": [0, 0], "주차": [10, 0], "": [0, 10], "무료 입장": [10, 10]}
+
+
+def data():
+    return pd.DataFrame({
+        "timestamp": pd.date_range("2024-01-01", periods=len(TEXTS), freq="h"),
+        "user_query": TEXTS,
+    })
+
+
+class EmbeddingsByText:
+    # get_embeddings stand-in: one vector per text, records the rows it was asked for
+    def __init__(self):
+        self.requests = []
+
+    def __call__(self, rows, option):
+        self.requests.append(len(rows))
+        return np.array([VECTORS[text] for text in rows["user_query"].fillna("")], dtype=np.float32)
+
+
+class UniqueTextsTest(unittest.TestCase):
+    def test_distinct_texts_in_first_seen_order(self):
+        texts, first, codes, weights = unique_texts(data(), "q")
+        self.assertEqual(texts.tolist(), ["전시 시간", "주차", "", "무료 입장"])
+        self.assertEqual(first.tolist(), [0, 1, 3, 6])
+        self.assertEqual(weights.tolist(), [3, 2, 2, 2])
+        np.testing.assert_array_equal(texts[codes], pd.Series(TEXTS).fillna(""))
+
+    def test_kmeans_runs_on_distinct_texts_and_labels_every_row(self):
+        embeddings = EmbeddingsByText()
+        with mock.patch.object(queries_and_responses_utils, "get_embeddings", embeddings):
+            labels = get_kmeans_clusters("q", data(), 3)
+        self.assertEqual(embeddings.requests, [4])
+        self.assertEqual(len(labels), len(TEXTS))
+        # Repeated texts share their label
+        for text in set(VECTORS):
+            rows = [i for i, t in enumerate(TEXTS) if (t or "") == text]
+            self.assertEqual(len(set(labels[rows])), 1)
+        # Weighting the distinct texts gives the clustering of all rows
+        rows = np.array([VECTORS[text or ""] for text in TEXTS], dtype=np.float32)
+        expected = KMeans(n_clusters=3, n_init=10, random_state=42).fit_predict(rows)
+        self.assertEqual(len(set(zip(labels, expected))), 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
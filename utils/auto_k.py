@@ -0,0 +1,62 @@
+import numpy as np
+import pandas as pd
+from joblib import Parallel, delayed
+from sklearn.cluster import KMeans
+from sklearn.metrics import silhouette_score, davies_bouldin_score, pairwise_distances
+
+
+CANDIDATE_KS = range(2, 16)
+SAMPLE_ROWS = 5000
+# Silhouette is quadratic, it is scored on this many of the sampled rows
+SCORE_ROWS = 2000
+N_JOBS = -1
+
+
+def stratified_sample(strata, size, random_state=42):
+    """Row positions, about `size` of them, every stratum represented in proportion.
+
+    Each stratum gets its share of the sample (at least one row), so a busy day cannot
+    crowd out the quiet ones the way a uniform sample of a skewed range can.
+    """
+    strata = np.asarray(strata)
+    if len(strata) <= size:
+        return np.arange(len(strata))
+    rng = np.random.default_rng(random_state)
+    codes, counts = np.unique(strata, return_inverse=True, return_counts=True)[1:]
+    quotas = np.maximum(1, np.round(counts * size / len(strata)).astype(np.int64))
+    # Random order within each stratum, then the first `quota` rows of each
+    order = np.lexsort((rng.random(len(strata)), codes))
+    starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+    rank = np.arange(len(strata)) - np.repeat(starts, counts)
+    return np.sort(order[rank < np.repeat(quotas, counts)])
+
+def score_k(embeddings, k, scored, distances, random_state=42):
+    labels = KMeans(n_clusters=k, n_init=3, random_state=random_state).fit_predict(embeddings)
+    if len(np.unique(labels)) < 2 or len(np.unique(labels[scored])) < 2:
+        return {"k": k, "silhouette": np.nan, "davies_bouldin": np.nan}
+    return {
+        "k": k,
+        "silhouette": silhouette_score(distances, labels[scored], metric="precomputed"),
+        "davies_bouldin": davies_bouldin_score(embeddings, labels),
+    }
+
+def recommend_k(embeddings, strata, candidates=CANDIDATE_KS, sample_rows=SAMPLE_ROWS, score_rows=SCORE_ROWS, n_jobs=N_JOBS):
+    """(recommended k, score curve) over the candidate ks, one k per worker.
+
+    The highest silhouette wins, the lower Davies-Bouldin index breaks ties. Clusters are
+    fitted on a stratified sample and silhouette is scored on a subset of it, against one
+    distance matrix shared by every k.
+    """
+    strata = np.asarray(strata)
+    positions = stratified_sample(strata, sample_rows)
+    sample = np.asarray(embeddings, dtype=np.float32)[positions]
+    candidates = [k for k in candidates if k < len(sample)]
+    if not candidates:
+        return 1, pd.DataFrame(columns=["k", "silhouette", "davies_bouldin"])
+    scored = stratified_sample(strata[positions], score_rows)
+    distances = pairwise_distances(sample[scored])
+    scores = Parallel(n_jobs=n_jobs)(delayed(score_k)(sample, k, scored, distances) for k in candidates)
+    curve = pd.DataFrame(scores)
+    ranked = curve.dropna().sort_values(["silhouette", "davies_bouldin"], ascending=[False, True])
+    best = int(ranked.iloc[0]["k"]) if len(ranked) else candidates[0]
+    return best, curve
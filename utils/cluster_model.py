@@ -0,0 +1,181 @@
+import threading
+import numpy as np
+import pandas as pd
+import streamlit as st
+from sklearn.cluster import KMeans
+
+
+CLUSTER_TABLE = "twinnydb.cluster_models"
+CREATE_CLUSTER_TABLE = f"""
+CREATE TABLE IF NOT EXISTS {CLUSTER_TABLE} (
+    side CHAR(1) NOT NULL,
+    n_clusters INT NOT NULL,
+    centroids LONGBLOB NOT NULL,
+    baseline_distance DOUBLE NOT NULL,
+    assigned_count BIGINT NOT NULL DEFAULT 0,
+    assigned_distance_sum DOUBLE NOT NULL DEFAULT 0,
+    fitted_at DATETIME NOT NULL,
+    PRIMARY KEY (side)
+);
+"""
+# Stored label of every interaction, per side
+CLUSTER_COLUMNS = {"q": "query_cluster", "r": "response_cluster"}
+# Distance of a new row to its centroid, carried from encoding to the write for the drift
+# statistics and never stored
+DISTANCE_COLUMNS = {"q": "query_cluster_distance", "r": "response_cluster_distance"}
+
+N_CLUSTERS = 12
+FIT_SAMPLE_ROWS = 50000
+# Refit once rows assigned since the last fit sit this much further from their centroid
+DRIFT_THRESHOLD = 0.15
+# Drift is not judged on fewer assigned rows than this
+MIN_DRIFT_ROWS = 1000
+ASSIGN_BLOCK = 65536
+
+
+def nearest_centroids(embeddings, centroids, block=ASSIGN_BLOCK):
+    # (labels, euclidean distances) of the closest centroid, a block of rows at a time
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    centroid_norms = (centroids ** 2).sum(axis=1)
+    labels = np.empty(len(embeddings), dtype=np.int64)
+    distances = np.empty(len(embeddings), dtype=np.float64)
+    for start in range(0, len(embeddings), block):
+        rows = embeddings[start:start + block]
+        squared = (rows ** 2).sum(axis=1)[:, None] - 2 * rows @ centroids.T + centroid_norms[None, :]
+        labels[start:start + block] = squared.argmin(axis=1)
+        distances[start:start + block] = np.sqrt(np.maximum(squared.min(axis=1), 0))
+    return labels, distances
+
+
+class CentroidModel:
+    def __init__(self, centroids, baseline_distance, assigned_count=0, assigned_distance_sum=0.0, fitted_at=None):
+        self.centroids = np.asarray(centroids, dtype=np.float32)
+        self.baseline_distance = float(baseline_distance)
+        self.assigned_count = int(assigned_count)
+        self.assigned_distance_sum = float(assigned_distance_sum)
+        self.fitted_at = pd.Timestamp(fitted_at) if fitted_at is not None else pd.Timestamp.now()
+
+    @classmethod
+    def fit(cls, embeddings, n_clusters=N_CLUSTERS, sample_rows=FIT_SAMPLE_ROWS, random_state=42):
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        if len(embeddings) > sample_rows:
+            sample = np.sort(np.random.default_rng(random_state).choice(len(embeddings), sample_rows, replace=False))
+            embeddings = embeddings[sample]
+        kmeans = KMeans(n_clusters=min(n_clusters, len(embeddings)), n_init=10, random_state=random_state)
+        kmeans.fit(embeddings)
+        # How far rows sit from their centroid right after the fit, drift is measured against it
+        _, distances = nearest_centroids(embeddings, kmeans.cluster_centers_.astype(np.float32))
+        return cls(kmeans.cluster_centers_, distances.mean())
+
+    @property
+    def n_clusters(self):
+        return len(self.centroids)
+
+    @property
+    def drift(self):
+        # Relative growth of the mean distance to the centroid for rows assigned since the fit
+        if self.assigned_count < MIN_DRIFT_ROWS or self.baseline_distance <= 0:
+            return 0.0
+        return self.assigned_distance_sum / self.assigned_count / self.baseline_distance - 1
+
+    def assign(self, embeddings):
+        return nearest_centroids(embeddings, self.centroids)
+
+
+class ClusterModels:
+    """The stored query and response centroid models, shared by every process through the DB.
+
+    `label()` labels new rows without touching the DB, `record()` adds their distances to
+    the drift statistics once they are written and `save()` replaces a side's model after
+    a refit.
+    """
+
+    def __init__(self, db):
+        self.db = db
+        self.models = {}
+        self._lock = threading.RLock()
+        db.send_query(CREATE_CLUSTER_TABLE)
+        self.load()
+
+    def load(self):
+        rows = self.db.send_query(f"SELECT * FROM {CLUSTER_TABLE}")
+        models = {}
+        for _, row in rows.iterrows() if len(rows) else ():
+            centroids = np.frombuffer(bytes(row["centroids"]), dtype="<f4").reshape(int(row["n_clusters"]), -1)
+            models[row["side"]] = CentroidModel(
+                centroids, row["baseline_distance"], row["assigned_count"], row["assigned_distance_sum"], row["fitted_at"]
+            )
+        with self._lock:
+            self.models = models
+
+    def get(self, side):
+        return self.models.get(side)
+
+    def label(self, side, embeddings):
+        # (labels, distances) for new rows, None while the side has no model yet
+        model = self.get(side)
+        if model is None or len(embeddings) == 0:
+            return None
+        return model.assign(embeddings)
+
+    def record(self, side, distances):
+        model = self.get(side)
+        if model is None or len(distances) == 0:
+            return
+        with self._lock:
+            model.assigned_count += len(distances)
+            model.assigned_distance_sum += float(distances.sum())
+        self.db.send_query(f"""
+        UPDATE {CLUSTER_TABLE}
+        SET assigned_count = assigned_count + {len(distances)}, assigned_distance_sum = assigned_distance_sum + {float(distances.sum())}
+        WHERE side = '{side}';
+        """)
+
+    def drifted(self, side):
+        model = self.get(side)
+        return model is None or model.drift > DRIFT_THRESHOLD
+
+    def save(self, side, model):
+        self.db.manager.write_list_to_db(
+            query=f"""
+            REPLACE INTO {CLUSTER_TABLE}
+            (side, n_clusters, centroids, baseline_distance, assigned_count, assigned_distance_sum, fitted_at)
+            VALUES (%s, %s, %s, %s, %s, %s, %s)
+            """,
+            data=[[
+                side, model.n_clusters, model.centroids.astype("<f4").tobytes(), model.baseline_distance,
+                0, 0.0, model.fitted_at.strftime("%Y-%m-%d %H:%M:%S"),
+            ]],
+        )
+        with self._lock:
+            self.models[side] = model
+
+    def clear(self):
+        self.db.send_query(f"DELETE FROM {CLUSTER_TABLE};")
+        with self._lock:
+            self.models = {}
+
+    def status(self):
+        return pd.DataFrame([
+            {
+                "side": side,
+                "clusters": model.n_clusters,
+                "fitted_at": model.fitted_at,
+                "assigned_since_fit": model.assigned_count,
+                "drift": round(model.drift, 4),
+            }
+            for side, model in sorted(self.models.items())
+        ])
+
+
+@st.cache_resource
+def ensure_cluster_columns(_db):
+    existing = _db.send_query("SHOW COLUMNS FROM twinnydb.interactions_all")
+    names = set(existing["Field"]) if len(existing) else set()
+    missing = [column for column in CLUSTER_COLUMNS.values() if column not in names]
+    if missing:
+        _db.send_query(
+            "ALTER TABLE twinnydb.interactions_all "
+            + ", ".join(f"ADD COLUMN {column} INT NULL" for column in missing)
+        )
+    return missing
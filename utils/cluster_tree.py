@@ -0,0 +1,85 @@
+import numpy as np
+from sklearn.cluster import MiniBatchKMeans
+
+
+N_CENTROIDS = 256
+MAX_K = 15
+
+
+def weighted_ward(points, weights):
+    """Ward merges of weighted points, as (a, b) node pairs; merge i creates node m + i.
+
+    Lance-Williams updates on the merge costs, O(m^2) per merge, which is nothing for the
+    few hundred centroids it is run on. Weights count as that many identical rows.
+    """
+    m = len(points)
+    sizes = np.asarray(weights, dtype=np.float64).copy()
+    norms = (points ** 2).sum(axis=1)
+    squared = np.maximum(norms[:, None] + norms[None, :] - 2 * points @ points.T, 0)
+    cost = sizes[:, None] * sizes[None, :] / (sizes[:, None] + sizes[None, :]) * squared
+    np.fill_diagonal(cost, np.inf)
+    nodes = np.arange(m)
+    active = np.ones(m, dtype=bool)
+    merges = []
+    for step in range(m - 1):
+        i, j = np.unravel_index(np.argmin(cost), cost.shape)
+        i, j = min(i, j), max(i, j)
+        merges.append((nodes[i], nodes[j]))
+        n_i, n_j = sizes[i], sizes[j]
+        # Slot i holds the merged cluster, slot j is retired
+        updated = ((n_i + sizes) * cost[i] + (n_j + sizes) * cost[j] - sizes * cost[i, j]) / (n_i + n_j + sizes)
+        cost[i, :] = updated
+        cost[:, i] = updated
+        active[j] = False
+        cost[j, :] = np.inf
+        cost[:, j] = np.inf
+        cost[i, ~active] = np.inf
+        cost[~active, i] = np.inf
+        cost[i, i] = np.inf
+        sizes[i] = n_i + n_j
+        nodes[i] = m + step
+    return merges
+
+
+class ClusterTree:
+    """One cluster tree per dataset, cut at any k without refitting.
+
+    Rows are first reduced to at most `n_centroids` MiniBatchKMeans centroids, weighted by
+    the rows they hold, and a Ward tree is built over those. Going from k to k + 1 splits
+    one cluster in two: the larger half keeps its label and the other half gets label k,
+    so a cluster keeps its number across k and pie charts stay comparable.
+    """
+
+    def __init__(self, embeddings, sample_weight=None, n_centroids=N_CENTROIDS, max_k=MAX_K, random_state=42):
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        weights = np.ones(len(embeddings)) if sample_weight is None else np.asarray(sample_weight, dtype=np.float64)
+        n_centroids = min(n_centroids, len(embeddings))
+        # Only a fine over-clustering is needed here, random init skips the costly k-means++ pass
+        reducer = MiniBatchKMeans(n_clusters=n_centroids, batch_size=4096, init="random", n_init=1, max_iter=30, random_state=random_state)
+        self.row_centroids = reducer.fit_predict(embeddings, sample_weight=weights)
+        centroid_weights = np.bincount(self.row_centroids, weights=weights, minlength=n_centroids)
+        # Centroids no row ended up in carry no weight, leave them out of the tree
+        used = np.flatnonzero(centroid_weights > 0)
+        self.row_centroids = np.searchsorted(used, self.row_centroids)
+        merges = weighted_ward(reducer.cluster_centers_[used].astype(np.float64), centroid_weights[used])
+        self.max_k = min(max_k, len(used))
+        self.centroid_labels = self._cut(merges, len(used), centroid_weights[used])
+
+    def _cut(self, merges, m, weights):
+        # Row k - 1 holds every centroid's label at k clusters, undoing the last merges first
+        leaves = {i: [i] for i in range(m)}
+        size = dict(enumerate(weights))
+        for step, (a, b) in enumerate(merges):
+            leaves[m + step] = leaves[a] + leaves[b]
+            size[m + step] = size[a] + size[b]
+        labels = np.zeros((self.max_k, m), dtype=np.int64)
+        for k in range(2, self.max_k + 1):
+            labels[k - 1] = labels[k - 2]
+            a, b = merges[len(merges) - (k - 1)]
+            smaller = b if size[b] < size[a] or (size[b] == size[a] and b > a) else a
+            labels[k - 1, leaves[smaller]] = k - 1
+        return labels
+
+    def labels(self, k):
+        k = max(1, min(int(k), self.max_k))
+        return self.centroid_labels[k - 1][self.row_centroids]
@@ -1,9 +1,7 @@
 import streamlit as st
 import pandas as pd
 import json
-from utils.data import get_data
-from collections import Counter
-import re
+from utils.data import get_data, get_range_data, get_date_bounds, get_data_version, get_keyword_matrix, get_keyword_index, DATA_LOAD_MODE, ALL_GROUPS
 import time
 from streamlit_extras.mandatory_date_range import date_range_picker
 
@@ -47,32 +45,57 @@ custom_theme = {
     }
 }
 
-def load_data():
-    data = get_data()
+def load_data(groups=ALL_GROUPS):
+    if DATA_LOAD_MODE == "range":
+        return load_range_data(groups)
+    data = get_data(groups)
     data = date_range_selector(data)
     return data
 
-def date_range_selector(data, timestamp_column="timestamp"):
-    MIN_VALUE = data.iloc[0][timestamp_column]
-    MAX_VALUE = data.iloc[-1][timestamp_column]
-
+def load_range_data(groups=ALL_GROUPS):
+    # Only the rows of the selected dates are fetched, cached per range
+    date_range = load_date_range()
+    if date_range is None:
+        return pd.DataFrame()
+    return get_range_data(date_range[0], date_range[1], get_data_version(), groups)
+
+def load_date_range():
+    # The sidebar picker on its own, for pages that read aggregates instead of rows
+    min_value, max_value = get_date_bounds(get_data_version())
+    if min_value is None:
+        return None
+
+    date_range = select_date_range(min_value, max_value)
+    if len(date_range) != 2:
+        date_range = (min_value, max_value)
+    return pd.to_datetime(date_range[0]).date(), pd.to_datetime(date_range[1]).date()
+
+def select_date_range(min_value, max_value):
     if "date_range" in st.session_state and len(st.session_state["date_range"]) == 2:
         start_value, end_value = st.session_state["date_range"]
     else:
-        start_value, end_value = MIN_VALUE, MAX_VALUE
+        start_value, end_value = min_value, max_value
 
     with st.sidebar:
         date_range = date_range_picker(
             title="Select Dates",
             default_start=start_value,
             default_end=end_value,
-            min_date=MIN_VALUE,
-            max_date=MAX_VALUE,
+            min_date=min_value,
+            max_date=max_value,
             error_message="Please select start and end date.",
             key="date_key"
         )
     if len(date_range) == 2:
         st.session_state["date_range"] = date_range
+    return date_range
+
+def date_range_selector(data, timestamp_column="timestamp"):
+    MIN_VALUE = data.iloc[0][timestamp_column]
+    MAX_VALUE = data.iloc[-1][timestamp_column]
+
+    date_range = select_date_range(MIN_VALUE, MAX_VALUE)
+    if len(date_range) == 2:
         filtered_data = data[
             (data[timestamp_column] >= pd.to_datetime(date_range[0]))
             & (
@@ -88,47 +111,25 @@ def load_lottiefile(filepath: str):
     with open(filepath, "r") as f:
         return json.load(f)
 
-# Function to tokenize and clean text
-def tokenize(text):
-    # Remove special characters and split by whitespace
-    tokens = re.findall(r"\b\w+\b", text.lower())
-    return tokens
-
-
-# Create a mapping, sorted by total number of response words associated with each query word
-@st.cache_data
-def return_keyword_df(on, data):
-    keyword_mapping = {}
-    for idx, row in data.iterrows():
-        # If stemming is on, apply stemming
-        if on:
-            query_words = tokenize(row['query_stemmed_words'])
-            response_words = tokenize(row['response_stemmed_words'])
-        else:
-            query_words = tokenize(row["user_query"])
-            response_words = tokenize(row["response"])
-        for q_word in query_words:
-            if q_word not in keyword_mapping:
-                keyword_mapping[q_word] = Counter()
-            keyword_mapping[q_word].update(response_words)
-
-    # Convert the mapping to a DataFrame 
-    keyword_df = pd.DataFrame(keyword_mapping).fillna(0).astype(int)
-    row_sums = keyword_df.sum(axis=1)
-    col_sums = keyword_df.sum(axis=0)
-
-    # Sort rows and columns based on the sums
-    keyword_df = keyword_df.loc[
-        row_sums.sort_values(ascending=False).index,
-        col_sums.sort_values(ascending=False).index,
-    ]
-
-    # Filter out all zero rows and columns
-    keyword_df = keyword_df.loc[
-        (keyword_df != 0).any(axis=1), (keyword_df != 0).any(axis=0)
-    ]
-
-    return keyword_df
+def current_date_range():
+    # The range picked in the sidebar on this run, without drawing the picker a second time
+    if "date_range" in st.session_state and len(st.session_state["date_range"]) == 2:
+        start, end = st.session_state["date_range"]
+    else:
+        start, end = get_date_bounds(get_data_version())
+        if start is None:
+            return None
+    return pd.to_datetime(start).date(), pd.to_datetime(end).date()
+
+def load_keyword_matrix(on, date_range=None):
+    # Co-occurrence for the selected dates (rows: responses, columns: queries), summed from daily partials
+    date_range = date_range or current_date_range()
+    if date_range is None:
+        return None
+    return get_keyword_matrix(on, date_range[0], date_range[1], get_data_version())
+
+def load_keyword_index(on):
+    return get_keyword_index(on, get_data_version())
 
 
 def time_func(func):
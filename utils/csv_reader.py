@@ -0,0 +1,152 @@
+import time
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pv
+
+
+# Declared types for upload columns; anything else in the file is ignored
+UPLOAD_SCHEMA = {
+    "timestamp": pa.string(),
+    "user_query": pa.string(),
+    "response": pa.string(),
+    "query_stemmed_words": pa.string(),
+    "response_stemmed_words": pa.string(),
+    "status": pa.string(),
+    "latency": pa.float64(),
+}
+REQUIRED_COLUMNS = ["timestamp", "user_query", "response"]
+NULL_VALUES = ["", "NULL", "null", "NaN", "nan", "None"]
+# Bytes of CSV per chunk, rows per chunk follow from how long the texts are
+CHUNK_BYTES = 1 << 20
+
+
+class UploadReport:
+    def __init__(self):
+        self.rows = 0
+        self.chunks = 0
+        self.dropped_rows = 0
+        self.null_counts = {}
+        self.negative_latency = 0
+        self.first_timestamp = None
+        self.last_timestamp = None
+        self.ignored_columns = []
+        self.parse_seconds = 0.0
+        # int64 timestamp keys of each chunk, repeats are counted with one sort when asked for
+        self._keys = []
+        self._duplicates = 0
+
+    def add(self, chunk, dropped, timestamps):
+        self.chunks += 1
+        self.rows += len(chunk)
+        self.dropped_rows += dropped
+        for column in chunk.columns:
+            if column != "timestamp":
+                self.null_counts[column] = self.null_counts.get(column, 0) + int(chunk[column].isnull().sum())
+        if "latency" in chunk.columns:
+            self.negative_latency += int((chunk["latency"] < 0).sum())
+        if len(timestamps):
+            keys = timestamps.to_numpy(dtype="datetime64[ns]").view(np.int64)
+            self._keys.append(keys)
+            self._duplicates = None
+            first, last = pd.Timestamp(keys.min()), pd.Timestamp(keys.max())
+            self.first_timestamp = first if self.first_timestamp is None else min(self.first_timestamp, first)
+            self.last_timestamp = last if self.last_timestamp is None else max(self.last_timestamp, last)
+
+    @property
+    def duplicate_timestamps(self):
+        # Rows whose timestamp an earlier row of the upload already had, within or across chunks
+        if self._duplicates is None:
+            keys = np.sort(np.concatenate(self._keys))
+            self._duplicates = int((keys[1:] == keys[:-1]).sum())
+        return self._duplicates
+
+    def as_frame(self):
+        checks = {
+            "rows": self.rows,
+            "chunks": self.chunks,
+            "dropped (bad timestamp)": self.dropped_rows,
+            "duplicate timestamps": self.duplicate_timestamps,
+            "negative latency": self.negative_latency,
+            "first timestamp": self.first_timestamp,
+            "last timestamp": self.last_timestamp,
+            "ignored columns": ", ".join(self.ignored_columns) or None,
+            "parse seconds": round(self.parse_seconds, 2),
+        }
+        checks.update({f"null {column}": count for column, count in self.null_counts.items()})
+        return pd.DataFrame({"check": list(checks), "value": [str(v) for v in checks.values()]})
+
+
+def parse_timestamps(values):
+    # ISO strings take the vectorized path, only the leftovers are parsed one by one.
+    # Naive values are already UTC like the table, offsets are converted to it.
+    parsed = pd.to_datetime(values, errors="coerce", format="ISO8601", utc=True)
+    retry = parsed.isnull() & values.notnull()
+    if retry.any():
+        parsed[retry] = pd.to_datetime(values[retry], errors="coerce", format="mixed", utc=True)
+    return parsed.dt.tz_localize(None)
+
+
+def open_reader(source, chunk_bytes=CHUNK_BYTES):
+    return pv.open_csv(
+        source,
+        read_options=pv.ReadOptions(block_size=chunk_bytes),
+        convert_options=pv.ConvertOptions(
+            column_types=UPLOAD_SCHEMA,
+            null_values=NULL_VALUES,
+            strings_can_be_null=True,
+        ),
+    )
+
+def check_columns(names):
+    missing = [column for column in REQUIRED_COLUMNS if column not in names]
+    if missing:
+        raise ValueError(f"Upload is missing required columns: {', '.join(missing)}")
+
+def validate_header(source):
+    """Column names of an upload, ValueError if a required one is missing.
+
+    Only the first block is parsed and `source` is rewound, so this runs before anything
+    is cleared or the pipeline is built, and `read_upload` can read the file afterwards.
+    """
+    try:
+        names = open_reader(source).schema.names
+    finally:
+        source.seek(0)
+    check_columns(names)
+    return names
+
+
+def read_upload(source, chunk_bytes=CHUNK_BYTES, report=None):
+    """Stream an uploaded CSV as typed DataFrame chunks of about `chunk_bytes` each.
+
+    Parsing runs in Arrow's multithreaded reader. Text columns come out as strings with
+    nulls, latency as float64 and timestamps normalized to the DB's string format; rows
+    whose timestamp cannot be parsed are dropped and counted in `report`.
+    """
+    report = report if report is not None else UploadReport()
+    reader = open_reader(source, chunk_bytes)
+    names = reader.schema.names
+    check_columns(names)
+    columns = [column for column in names if column in UPLOAD_SCHEMA]
+    report.ignored_columns = [column for column in names if column not in UPLOAD_SCHEMA]
+
+    offset = 0
+    while True:
+        start_time = time.time()
+        try:
+            batch = reader.read_next_batch()
+        except StopIteration:
+            break
+        chunk = batch.select(columns).to_pandas()
+        # Keep the file's row numbers so errors point at the right lines
+        chunk.index = pd.RangeIndex(offset, offset + len(chunk))
+        offset += len(chunk)
+        timestamps = parse_timestamps(chunk["timestamp"])
+        valid = timestamps.notnull()
+        chunk = chunk[valid].copy()
+        chunk["timestamp"] = timestamps[valid].dt.strftime("%Y-%m-%d %H:%M:%S.%f")
+        report.add(chunk, int((~valid).sum()), timestamps[valid])
+        report.parse_seconds += time.time() - start_time
+        if len(chunk):
+            yield chunk
@@ -1,11 +1,28 @@
+import os
+import uuid
 import pandas as pd
-import json
 import numpy as np
 import time
 import streamlit as st
-from aidp_connector.db.mysql_manager import MysqlExecuteManager
-from konlpy.tag import Okt, Kkma, Hannanum
-from sentence_transformers import SentenceTransformer
+from utils.interaction_store import InteractionStore, format_timestamp, KEY_RESOLUTION
+from utils.embedding_store import EmbeddingStore
+from utils.embedding_codec import encode_embeddings, decode_embeddings, blob_format
+from utils.snapshot import Snapshot
+from utils.rollups import update_rollups, clear_rollups, get_rollups, ensure_rollup_table
+from utils.resources import resources
+from utils.stem_cache import StemCache
+from utils.tokenizer import Tokenizer
+from utils.keyword_matrix import KeywordMatrix
+from utils.keyword_partials import KeywordPartials
+from utils.keyword_index import KeywordIndexCache
+from utils.status_fields import STATUS_COLUMNS, extract_status_columns, ensure_status_columns
+from utils.token_ids import TOKEN_COLUMNS, TokenVocabulary, TokenArrays, ensure_token_columns
+from utils.cluster_model import CLUSTER_COLUMNS, DISTANCE_COLUMNS, CentroidModel, ClusterModels, ensure_cluster_columns
+from utils.similarity import rowwise_cosine
+from utils.similarity_histogram import (
+    SIMILARITY_COLUMN, ensure_similarity_column, ensure_histogram_table, update_similarity_histogram,
+    clear_similarity_histogram, get_similarity_histogram,
+)
 
 
 VR_DB_AUTH = {
@@ -16,9 +33,57 @@ VR_DB_AUTH = {
     "db_pw": "twinny123",
 }
 
+# Timestamps are stored in UTC, the dashboard shows them in KST
+TIMESTAMP_OFFSET = pd.Timedelta(hours=9)
+
+# "range" pushes the sidebar date range down into SQL, "full" keeps the whole table in memory
+DATA_LOAD_MODE = "range"
+TIMESTAMP_INDEX = "idx_interactions_all_timestamp"
+
+# Columns are fetched and cached per group, pages only ask for the groups they use
+COLUMN_GROUPS = {
+    "core": ["timestamp", "latency"],
+    "text": ["user_query", "response"],
+    "stems": ["query_stemmed_words", "response_stemmed_words"],
+    "status": ["status"],
+    # Numeric fields parsed out of status at ingest, see utils/status_fields.py
+    "robot": STATUS_COLUMNS,
+    # Token ids of the raw and stemmed texts written at ingest, see utils/token_ids.py
+    "tokens": list(TOKEN_COLUMNS),
+    # Labels from the stored centroid models, see utils/cluster_model.py
+    "clusters": list(CLUSTER_COLUMNS.values()),
+    # Query-response cosine similarity written at ingest, see utils/similarity_histogram.py
+    "similarity": [SIMILARITY_COLUMN],
+}
+ALL_GROUPS = tuple(COLUMN_GROUPS)
+
+# Embeddings are not part of any group, they are served from the shared embedding store
+EMBEDDING_COLUMNS = ["query_embedding", "response_embedding"]
+CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "twinny")
+EMBEDDING_STORE_DIR = os.path.join(CACHE_DIR, "embeddings")
+# Blob format for new rows: "float32", "float16" or "int8" (per-vector scale). Rows in any
+# format, including the untagged float32 ones from before, decode to float32 on load.
+EMBEDDING_FORMAT = "float16"
+MIGRATION_BATCH_ROWS = 5000
+
+# Serve reads from a local Arrow snapshot of interactions_all, kept in sync from the watermark
+USE_SNAPSHOT = True
+SNAPSHOT_DIR = os.path.join(CACHE_DIR, "snapshot")
+STEM_CACHE_PATH = os.path.join(CACHE_DIR, "stems.sqlite")
+# Per-day keyword co-occurrence partials (KST days) for the raw and stemmed texts
+KEYWORD_DIR = os.path.join(CACHE_DIR, "keywords")
+KEYWORD_VARIANTS = {
+    "raw": ("query_token_ids", "response_token_ids"),
+    "stemmed": ("query_stem_ids", "response_stem_ids"),
+}
+TOKEN_BATCH_ROWS = 5000
+RELABEL_BATCH_ROWS = 50000
+
 
 class ReportData:
     def __init__(self):
+        # Imported here like the model, so importing this module needs neither
+        from aidp_connector.db.mysql_manager import MysqlExecuteManager
         try:
             self.manager = MysqlExecuteManager(VR_DB_AUTH)
         except:
@@ -28,96 +93,143 @@ class ReportData:
         return pd.DataFrame(self.manager.fetch_to_df(query))
 
 
-vrd = ReportData()
-okt = Okt()
-kkma = Kkma()
-hannanum = Hannanum()
+MODEL_PATH = "/home/ubuntu/KR-SBERT-Medium-klueNLItriplet_PARpair-klueSTS"
+ENCODE_BATCH_SIZE = 256
+# "okt" (Hannanum fallback for stems), "hannanum" or "simple" (pure Python, no JVM)
+TOKENIZER_BACKEND = "okt"
 
-@st.cache_resource
-def get_model(filepath):
-    return SentenceTransformer(filepath)
 
-model = get_model("/home/ubuntu/KR-SBERT-Medium-klueNLItriplet_PARpair-klueSTS")
+def create_model():
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(MODEL_PATH)
 
-def stem_word(word):
-    # Try Okt first
-    stemmed = okt.nouns(word)
-    
-    # If Kkma returns empty, try Hannanum
-    if not stemmed:
-        stemmed = hannanum.nouns(word)
-    
-    # If all stemmers return empty, use the original word
-    return stemmed if stemmed else [word]
+# Nothing here is built at import time, the read-only pages never start a JVM or load the model
+resources.register("db", ReportData)
+resources.register("tokenizer", lambda: Tokenizer(TOKENIZER_BACKEND))
+resources.register("model", create_model)
+resources.register("stem_cache", lambda: StemCache(STEM_CACHE_PATH))
+resources.register("token_vocabulary", lambda: TokenVocabulary(get_db()))
+resources.register("cluster_models", lambda: ClusterModels(get_db()))
+
+def get_db():
+    return resources.get("db")
 
+def get_model():
+    return resources.get("model")
+
+def get_tokenizer():
+    return resources.get("tokenizer")
+
+def get_token_vocabulary():
+    return resources.get("token_vocabulary")
+
+def get_cluster_models():
+    return resources.get("cluster_models")
 
 def stem_words(text):
-    if not isinstance(text, str):
-        return ''
-    words = text.split()
-    stemmed = []
-    for word in words:
-        stemmed.extend(stem_word(word))
-    return ' '.join(stemmed)
-
-def clean_json_string(json_str):
-    if not isinstance(json_str, str):
-        return json_str
-    
-    try:
-        # Parse the JSON string
-        data = json.loads(json_str)
-        
-        # Function to recursively replace NaN with None
-        def replace_nan(item):
-            if isinstance(item, dict):
-                return {k: replace_nan(v) for k, v in item.items()}
-            elif isinstance(item, list):
-                return [replace_nan(i) for i in item]
-            elif isinstance(item, float) and np.isnan(item):
-                return None
-            else:
-                return item
-        
-        # Clean the data
-        cleaned_data = replace_nan(data)
-        
-        # Convert back to JSON string
-        return json.dumps(cleaned_data)
-    except json.JSONDecodeError:
-        # If it's not valid JSON, return it as is
-        return json_str
+    return stem_texts([text])[0]
 
-def process_chunk(chunk, vrd):
-    start_time = time.time()
+def clean_chunk(chunk):
     # Clean and preprocess the chunk
     if 'status' in chunk.columns:
-        chunk['status'] = chunk['status'].apply(clean_json_string)
+        chunk = extract_status_columns(chunk)
     chunk['user_query'] = chunk['user_query'].fillna('')
     chunk['response'] = chunk['response'].fillna('')
-    
-    # Stem words if 'stemmed_words' column doesn't exist or is empty
-    if 'query_stemmed_words' not in chunk.columns:
-        chunk['query_stemmed_words'] = ''
-    chunk.loc[chunk['query_stemmed_words'].isnull() | (chunk['query_stemmed_words'] == ''), 'query_stemmed_words'] = \
-        chunk.loc[chunk['query_stemmed_words'].isnull() | (chunk['query_stemmed_words'] == ''), 'user_query'].apply(stem_words)
-    
-    if 'response_stemmed_words' not in chunk.columns:
-        chunk['response_stemmed_words'] = ''
-    chunk.loc[chunk['response_stemmed_words'].isnull() | (chunk['response_stemmed_words'] == ''), 'response_stemmed_words'] = \
-        chunk.loc[chunk['response_stemmed_words'].isnull() | (chunk['response_stemmed_words'] == ''), 'response'].apply(stem_words)
-    
-    # Calculate embeddings
-    query_embeddings = model.encode(chunk['user_query'].tolist())
-    response_embeddings = model.encode(chunk['response'].tolist())
-    
+    for col in ['query_stemmed_words', 'response_stemmed_words']:
+        if col not in chunk.columns:
+            chunk[col] = ''
+    return chunk
+
+def unstemmed_rows(chunk, col):
+    return chunk[col].isnull() | (chunk[col] == '')
+
+def stem_texts(texts):
+    # Museum queries repeat the same few thousand tokens, only unseen ones go to the tokenizer, in one batch
+    words = [text.split() if isinstance(text, str) else [] for text in texts]
+    cache = resources.get("stem_cache")
+    stems = cache.stem_many([word for text_words in words for word in text_words], get_tokenizer().stems)
+    cache.flush()
+    return [' '.join(stem for word in text_words for stem in stems[word]) for text_words in words]
+
+def stem_texts_counted(texts):
+    # stem_texts plus the stem cache hits/misses it caused, for the ingest report
+    cache = resources.get("stem_cache")
+    before = cache.counts()
+    stemmed = stem_texts(texts)
+    return stemmed, {key: value - before[key] for key, value in cache.counts().items()}
+
+def stem_chunk(chunk):
+    # Stem words if 'stemmed_words' column is empty
+    for col, source in [('query_stemmed_words', 'user_query'), ('response_stemmed_words', 'response')]:
+        mask = unstemmed_rows(chunk, col)
+        if mask.any():
+            chunk.loc[mask, col] = stem_texts(chunk.loc[mask, source].tolist())
+    return chunk
+
+def display_text(texts):
+    return texts.str.replace('sp', '네')
+
+def token_id_columns(chunk):
+    # Raw texts are tokenized as the pages show them, stems as stored
+    vocabulary = get_token_vocabulary()
+    columns = {}
+    for column, source in TOKEN_COLUMNS.items():
+        texts = chunk[source].fillna('').astype(str)
+        if source in ('user_query', 'response'):
+            texts = display_text(texts)
+        columns[column] = TokenArrays.from_texts(texts, vocabulary).blobs()
+    return columns
+
+def tokenize_chunk(chunk):
+    for column, blobs in token_id_columns(chunk).items():
+        chunk[column] = blobs
+    return chunk
+
+def token_arrays(data, column):
+    # Flat ids plus offsets for one token-id column of a loaded frame
+    return TokenArrays.from_blobs(data[column].tolist())
+
+def encode_chunk(chunk, batch_size=ENCODE_BATCH_SIZE):
+    # Queries and responses go through the model in one call
+    queries = chunk['user_query'].tolist()
+    embeddings = get_model().encode(queries + chunk['response'].tolist(), batch_size=batch_size)
+    query_embeddings, response_embeddings = embeddings[:len(queries)], embeddings[len(queries):]
+
+    chunk = label_chunk(chunk, query_embeddings, response_embeddings)
+    chunk[SIMILARITY_COLUMN] = rowwise_cosine(query_embeddings, response_embeddings).astype(np.float64)
+
     # Convert embeddings to binary for storage
-    chunk['query_embedding'] = [embedding.tobytes() for embedding in query_embeddings]
-    chunk['response_embedding'] = [embedding.tobytes() for embedding in response_embeddings]
-    
+    chunk['query_embedding'] = encode_embeddings(query_embeddings, EMBEDDING_FORMAT)
+    chunk['response_embedding'] = encode_embeddings(response_embeddings, EMBEDDING_FORMAT)
+    return chunk
+
+def label_chunk(chunk, query_embeddings, response_embeddings):
+    # Nearest stored centroid, NULL until the first model is fitted. No DB access here,
+    # the drift statistics are recorded by write_chunk on the thread that owns the connection
+    models = get_cluster_models()
+    for side, embeddings in (("q", query_embeddings), ("r", response_embeddings)):
+        labelled = models.label(side, embeddings)
+        chunk[CLUSTER_COLUMNS[side]] = labelled[0] if labelled is not None else None
+        chunk[DISTANCE_COLUMNS[side]] = labelled[1] if labelled is not None else None
+    return chunk
+
+def record_cluster_drift(chunk):
+    models = get_cluster_models()
+    for side, column in DISTANCE_COLUMNS.items():
+        if column in chunk.columns:
+            models.record(side, pd.to_numeric(chunk[column], errors="coerce").dropna().to_numpy())
+
+def write_chunk(chunk, vrd):
     columns = ['timestamp', 'user_query', 'response', 'query_stemmed_words', 'response_stemmed_words', 'query_embedding', 'response_embedding']
+    if 'query_token_ids' in chunk.columns:
+        columns.extend(TOKEN_COLUMNS)
+    if 'query_cluster' in chunk.columns:
+        columns.extend(CLUSTER_COLUMNS.values())
+    if SIMILARITY_COLUMN in chunk.columns:
+        columns.append(SIMILARITY_COLUMN)
     if 'status' in chunk.columns:
         columns.append('status')
+        columns.extend(STATUS_COLUMNS)
     if 'latency' in chunk.columns:
         columns.append('latency')
     
@@ -129,10 +241,45 @@ def process_chunk(chunk, vrd):
     {', '.join([f"{col} = VALUES({col})" for col in columns if col not in ['timestamp']])};
     """
     
-    data_to_insert = chunk[columns].values.tolist()
+    # Missing status fields are NaN in the chunk and NULL in the table
+    rows = chunk[columns].astype(object)
+    data_to_insert = rows.where(rows.notnull(), None).values.tolist()
+    vrd.manager.write_list_to_db(query=insert_query, data=data_to_insert)
+    record_cluster_drift(chunk)
+    mark_touched(chunk['timestamp'])
+    update_rollups(vrd, chunk['timestamp'])
+    update_similarity_histogram(vrd, chunk['timestamp'])
+
+def warm_ingest(vrd):
+    # Build the cached stores here, write_chunk also runs on the pipeline's writer thread
+    get_store()
+    get_embedding_store()
+    if USE_SNAPSHOT:
+        get_snapshot()
+    ensure_rollup_table(vrd)
+    ensure_status_columns(vrd)
+    ensure_cluster_columns(vrd)
+    # Schema migrations run here and from the upload page, never on a read
+    ensure_token_ids()
+    ensure_similarity_scores()
+    ensure_histogram_table(vrd)
+    get_token_vocabulary()
+    get_cluster_models()
+    # mark_touched reaches the keyword partials and indexes from the writer thread too
+    for variant in KEYWORD_VARIANTS:
+        get_keyword_partials(variant)
+        get_keyword_index_cache(variant)
+    get_model()
+
+def process_chunk(chunk, vrd):
+    start_time = time.time()
+    chunk = clean_chunk(chunk)
+    chunk = stem_chunk(chunk)
+    chunk = tokenize_chunk(chunk)
+    chunk = encode_chunk(chunk)
 
     try:
-        vrd.manager.write_list_to_db(query=insert_query, data=data_to_insert)
+        write_chunk(chunk, vrd)
         st.write(f"Inserted/Updated {len(chunk)} rows successfully.")
     except Exception as e:
         st.write(f"An error occurred during insertion: {e}")
@@ -141,31 +288,436 @@ def process_chunk(chunk, vrd):
     st.session_state.chunk_counter += 1
     st.write(f"Function process_chunk (chunk {st.session_state.chunk_counter}) {end_time - start_time:.4f} seconds to execute.")
     
+def migrate_embeddings(fmt=EMBEDDING_FORMAT, batch_rows=MIGRATION_BATCH_ROWS, on_batch=None):
+    # Re-encode stored rows batch by batch in timestamp order, rows already in `fmt` are skipped
+    vrd = get_db()
+    last = None
+    migrated = 0
+    while True:
+        where = f"WHERE timestamp > '{format_timestamp(last)}'" if last is not None else ""
+        batch = vrd.send_query(f"""
+        SELECT timestamp, query_embedding, response_embedding FROM twinnydb.interactions_all
+        {where} ORDER BY timestamp LIMIT {batch_rows};
+        """)
+        if len(batch) == 0:
+            break
+        last = pd.to_datetime(batch["timestamp"]).max()
+        stale = batch[[
+            blob_format(q) != fmt or blob_format(r) != fmt
+            for q, r in zip(batch["query_embedding"], batch["response_embedding"])
+        ]]
+        if len(stale) > 0:
+            rows = zip(
+                encode_embeddings(decode_embeddings(stale["query_embedding"]), fmt),
+                encode_embeddings(decode_embeddings(stale["response_embedding"]), fmt),
+                stale["timestamp"].astype(str),
+            )
+            vrd.manager.write_list_to_db(
+                query="UPDATE twinnydb.interactions_all SET query_embedding = %s, response_embedding = %s WHERE timestamp = %s",
+                data=[list(row) for row in rows],
+            )
+            # Decoded values change slightly, the local copies pick up the rewritten rows
+            mark_touched(stale["timestamp"])
+            migrated += len(stale)
+        if on_batch is not None:
+            on_batch(migrated)
+    return migrated
+
+def migrate_token_ids(batch_rows=TOKEN_BATCH_ROWS, on_batch=None):
+    # Tokenize rows stored without token ids, batch by batch in timestamp order
+    vrd = get_db()
+    ensure_token_columns(vrd)
+    sources = list(dict.fromkeys(TOKEN_COLUMNS.values()))
+    missing = " OR ".join(f"{column} IS NULL" for column in TOKEN_COLUMNS)
+    last = None
+    migrated = 0
+    while True:
+        after = f"AND timestamp > '{format_timestamp(last)}'" if last is not None else ""
+        batch = vrd.send_query(f"""
+        SELECT timestamp, {', '.join(sources)} FROM twinnydb.interactions_all
+        WHERE ({missing}) {after} ORDER BY timestamp LIMIT {batch_rows};
+        """)
+        if len(batch) == 0:
+            break
+        last = pd.to_datetime(batch["timestamp"]).max()
+        columns = token_id_columns(batch)
+        vrd.manager.write_list_to_db(
+            query=f"UPDATE twinnydb.interactions_all SET {', '.join(f'{column} = %s' for column in columns)} WHERE timestamp = %s",
+            data=[list(row) for row in zip(*columns.values(), batch["timestamp"].astype(str))],
+        )
+        # Local copies read NULL ids for these rows until they are refetched
+        mark_touched(batch["timestamp"])
+        migrated += len(batch)
+        if on_batch is not None:
+            on_batch(migrated)
+    return migrated
+
+@st.cache_resource
+def ensure_token_ids():
+    # Once per process, from warm_ingest before the first upload: rows from before the
+    # token-id columns existed are tokenized here. Readers only read the stored ids
+    start_time = time.time()
+    migrated = migrate_token_ids()
+    if migrated:
+        print(f"Token ids written for {migrated} rows in {time.time() - start_time:.4f} seconds.")
+    return migrated
+
+def migrate_similarity_scores(batch_rows=MIGRATION_BATCH_ROWS, on_batch=None):
+    # Score rows stored before the similarity column existed, batch by batch in timestamp order
+    vrd = get_db()
+    ensure_similarity_column(vrd)
+    last = None
+    migrated = 0
+    while True:
+        after = f"AND timestamp > '{format_timestamp(last)}'" if last is not None else ""
+        batch = vrd.send_query(f"""
+        SELECT timestamp, query_embedding, response_embedding FROM twinnydb.interactions_all
+        WHERE {SIMILARITY_COLUMN} IS NULL {after} ORDER BY timestamp LIMIT {batch_rows};
+        """)
+        if len(batch) == 0:
+            break
+        last = pd.to_datetime(batch["timestamp"]).max()
+        scores = rowwise_cosine(decode_embeddings(batch["query_embedding"]), decode_embeddings(batch["response_embedding"]))
+        vrd.manager.write_list_to_db(
+            query=f"UPDATE twinnydb.interactions_all SET {SIMILARITY_COLUMN} = %s WHERE timestamp = %s",
+            data=[list(row) for row in zip(scores.astype(np.float64).tolist(), batch["timestamp"].astype(str))],
+        )
+        update_similarity_histogram(vrd, batch["timestamp"])
+        mark_touched(batch["timestamp"])
+        migrated += len(batch)
+        if on_batch is not None:
+            on_batch(migrated)
+    return migrated
+
+@st.cache_resource
+def ensure_similarity_scores():
+    # Once per process, like ensure_token_ids: pages read the stored scores and never migrate
+    start_time = time.time()
+    migrated = migrate_similarity_scores()
+    if migrated:
+        print(f"Similarity scores written for {migrated} rows in {time.time() - start_time:.4f} seconds.")
+    return migrated
+
+def refit_clusters(force=False, on_batch=None):
+    # Refit the sides whose model drifted (every side with force) and relabel all stored rows
+    models = get_cluster_models()
+    # Another process may have refit since this one loaded the models
+    models.load()
+    sides = [side for side in CLUSTER_COLUMNS if force or models.drifted(side)]
+    if not sides:
+        return []
+    store = get_embedding_store()
+    refresh_embeddings(store)
+    if len(store) == 0:
+        return []
+    labels = {}
+    for side in sides:
+        model = CentroidModel.fit(store.matrices[side])
+        labels[side] = model.assign(store.matrices[side])[0]
+        models.save(side, model)
+
+    keys = pd.to_datetime(np.asarray(store.keys))
+    columns = {CLUSTER_COLUMNS[side]: labels[side] for side in sides}
+    write_labels(keys - TIMESTAMP_OFFSET, columns, on_batch)
+    # Only the label columns changed: the local copies are patched, embeddings and keyword partials stay
+    if USE_SNAPSHOT:
+        get_snapshot().patch(keys - TIMESTAMP_OFFSET, columns)
+    get_store().patch(keys, columns)
+    return sides
+
+def write_labels(timestamps, columns, on_batch=None):
+    # Labels go to a staging table in multi-row inserts, one joined UPDATE applies them all
+    vrd = get_db()
+    staging = f"twinnydb.relabel_{uuid.uuid4().hex[:12]}"
+    names = list(columns)
+    vrd.send_query(f"CREATE TABLE {staging} AS SELECT timestamp, {', '.join(names)} FROM twinnydb.interactions_all LIMIT 0;")
+    try:
+        vrd.send_query(f"ALTER TABLE {staging} ADD PRIMARY KEY (timestamp);")
+        formatted = timestamps.strftime("%Y-%m-%d %H:%M:%S.%f")
+        query = f"INSERT INTO {staging} (timestamp, {', '.join(names)}) VALUES ({', '.join(['%s'] * (len(names) + 1))})"
+        for start in range(0, len(formatted), RELABEL_BATCH_ROWS):
+            stop = start + RELABEL_BATCH_ROWS
+            rows = zip(formatted[start:stop], *(columns[name][start:stop].tolist() for name in names))
+            vrd.manager.write_list_to_db(query=query, data=[list(row) for row in rows])
+            if on_batch is not None:
+                on_batch(min(stop, len(formatted)))
+        vrd.send_query(f"""
+        UPDATE twinnydb.interactions_all AS a JOIN {staging} AS s ON a.timestamp = s.timestamp
+        SET {', '.join(f'a.{name} = s.{name}' for name in names)};
+        """)
+    finally:
+        vrd.send_query(f"DROP TABLE IF EXISTS {staging};")
+
 def clear_table():
     insert_query = """
     TRUNCATE TABLE twinnydb.interactions_all;
     """
-    vrd.send_query(insert_query)
+    get_db().send_query(insert_query)
+    clear_rollups(get_db())
+    clear_similarity_histogram(get_db())
+    get_store().reset()
+    get_embedding_store().reset()
+    if USE_SNAPSHOT:
+        get_snapshot().invalidate()
+    for variant in KEYWORD_VARIANTS:
+        get_keyword_partials(variant).clear()
+        get_keyword_index_cache(variant).reset()
+    # The next upload fits new models on the new data
+    get_cluster_models().clear()
 
-@st.cache_data
-def get_data():
-    print('called in get_data')
-    a = vrd.send_query("select * from twinnydb.interactions_all")
-    data = pd.DataFrame(a)
-    data["timestamp"] = data["timestamp"] + pd.Timedelta(hours=9)
-    data["timestamp"] = pd.to_datetime(data["timestamp"])
+def ranges_predicate(ranges):
+    # Inclusive (low, high) timestamp ranges, either bound may be None
+    conditions = []
+    for low, high in ranges:
+        if low is None and high is None:
+            return None
+        elif low is None:
+            conditions.append(f"timestamp <= '{format_timestamp(high)}'")
+        elif high is None:
+            conditions.append(f"timestamp >= '{format_timestamp(low)}'")
+        else:
+            conditions.append(f"timestamp BETWEEN '{format_timestamp(low)}' AND '{format_timestamp(high)}'")
+    return " OR ".join(f"({c})" for c in conditions)
+
+def fetch_from_db(ranges=None, columns=None):
+    ensure_status_columns(get_db())
+    ensure_cluster_columns(get_db())
+    query = f"select {', '.join(columns) if columns else '*'} from twinnydb.interactions_all"
+    where = ranges_predicate(ranges) if ranges is not None else None
+    if where:
+        query += f" where {where}"
+    return get_db().send_query(query)
+
+def fetch_interactions(ranges=None, columns=None):
+    if USE_SNAPSHOT:
+        return get_snapshot().read(columns, ranges)
+    return fetch_from_db(ranges, columns)
+
+def fetch_embeddings(ranges=None):
+    if USE_SNAPSHOT:
+        embeddings = get_snapshot().read_embeddings(ranges)
+        if embeddings is None:
+            return None
+        timestamps, query_embeddings, response_embeddings = embeddings
+        return timestamps + TIMESTAMP_OFFSET, query_embeddings, response_embeddings
+    a = fetch_from_db(ranges, ["timestamp"] + EMBEDDING_COLUMNS)
+    if len(a) == 0:
+        return None
+    data = prepare_interactions(a)
+    return (
+        data["timestamp"],
+        np.stack(data["query_embedding"].to_numpy()),
+        np.stack(data["response_embedding"].to_numpy()),
+    )
+
+def sync_snapshot(snapshot):
+    # The only full transfer happens when no snapshot exists yet, later syncs fetch the delta
+    if not snapshot.exists():
+        snapshot.pop_touched()
+        snapshot.write(fetch_from_db())
+        return
+    watermark = snapshot.watermark
+    ranges = [(watermark + KEY_RESOLUTION, None)] if watermark is not None else [(None, None)]
+    ranges += snapshot.pop_touched()
+    snapshot.upsert(fetch_from_db(ranges))
+
+@st.cache_resource
+def get_snapshot():
+    start_time = time.time()
+    snapshot = Snapshot(SNAPSHOT_DIR)
+    # Snapshots written before a status field, the token ids or the cluster labels existed are rebuilt with them
+    if snapshot.exists() and not set(STATUS_COLUMNS) | set(TOKEN_COLUMNS) | set(CLUSTER_COLUMNS.values()) | {SIMILARITY_COLUMN} <= set(snapshot.columns()):
+        snapshot.invalidate()
+    sync_snapshot(snapshot)
+    print(f"Snapshot ready in {time.time() - start_time:.4f} seconds.")
+    return snapshot
+
+def prepare_interactions(data):
+    data = pd.DataFrame(data)
+    data["timestamp"] = pd.to_datetime(data["timestamp"]) + TIMESTAMP_OFFSET
     data = data.sort_values(by="timestamp")
 
-    data['user_query'] = data['user_query'].str.replace('sp', '네')
-    data['response'] = data['response'].str.replace('sp', '네')
+    for col in ['user_query', 'response']:
+        if col in data.columns:
+            data[col] = display_text(data[col])
+
+    for col in ['query_embedding', 'response_embedding']:
+        if col in data.columns:
+            data[col] = list(decode_embeddings(data[col])) if len(data) else data[col]
 
-    data['query_embedding'] = data['query_embedding'].apply(lambda x: np.frombuffer(x, dtype=np.float32))
-    data['response_embedding'] = data['response_embedding'].apply(lambda x: np.frombuffer(x, dtype=np.float32))
+    for col in STATUS_COLUMNS:
+        if col in data.columns:
+            data[col] = pd.to_numeric(data[col], errors="coerce").astype(np.float64)
 
     return data
 
+def group_columns(groups):
+    columns = ["timestamp"]
+    for group in groups:
+        columns.extend(c for c in COLUMN_GROUPS[group] if c not in columns)
+    return columns
+
+@st.cache_resource
+def get_store():
+    return InteractionStore(fetch_interactions, prepare_interactions, COLUMN_GROUPS)
+
+def get_data(groups=ALL_GROUPS):
+    # Shallow copy so pages can add columns without touching the shared frame
+    return get_store().load(groups).copy(deep=False)
+
+def mark_touched(timestamps):
+    if USE_SNAPSHOT:
+        get_snapshot().mark_touched(timestamps)
+    get_store().mark_touched(timestamps)
+    get_embedding_store().mark_touched(timestamps)
+    local = pd.to_datetime(pd.Series(timestamps), errors="coerce", format="mixed") + TIMESTAMP_OFFSET
+    for variant in KEYWORD_VARIANTS:
+        get_keyword_partials(variant).mark_touched(local)
+        get_keyword_index_cache(variant).mark_touched(local)
+
+def refresh_data():
+    # Fetch only rows past the watermark and rows rewritten by the last uploads
+    if USE_SNAPSHOT:
+        sync_snapshot(get_snapshot())
+    get_store().refresh()
+    refresh_embeddings(get_embedding_store())
+    # Only now do rebuilt partials see the new rows
+    for variant in KEYWORD_VARIANTS:
+        partials = get_keyword_partials(variant)
+        partials.invalidate(partials.pop_touched())
+
+def refresh_embeddings(store):
+    store.sync()
+    ranges = None
+    if store.watermark is not None:
+        ranges = [(store.watermark - TIMESTAMP_OFFSET + KEY_RESOLUTION, None)] + store.pop_touched()
+    else:
+        store.pop_touched()
+    embeddings = fetch_embeddings(ranges)
+    if embeddings is not None:
+        store.upsert(*embeddings)
+
+@st.cache_resource
+def get_embedding_store():
+    store = EmbeddingStore(EMBEDDING_STORE_DIR)
+    # Files survive restarts, only rows written since then are fetched
+    refresh_embeddings(store)
+    return store
+
+def get_embeddings(data, option):
+    # (n, d) float32 rows aligned with `data`, a view into the shared store for date ranges
+    store = get_embedding_store()
+    store.sync()
+    try:
+        return store.take(option, data["timestamp"])
+    except KeyError:
+        refresh_embeddings(store)
+        return store.take(option, data["timestamp"])
+
+def get_data_version():
+    return get_store().version
+
+def load_rollups(start, end):
+    return get_rollups(get_db(), start, end, get_data_version())
+
+def load_similarity_histogram(start, end):
+    return get_similarity_histogram(get_db(), start, end, get_data_version())
 
+@st.cache_resource
+def ensure_timestamp_index():
+    # Reuse any index that leads with timestamp (the primary key counts), otherwise add one
+    existing = get_db().send_query("""
+    SELECT COUNT(*) AS n FROM information_schema.statistics
+    WHERE table_schema = 'twinnydb' AND table_name = 'interactions_all'
+    AND column_name = 'timestamp' AND seq_in_index = 1;
+    """)
+    if len(existing) == 0 or int(existing.iloc[0]["n"]) == 0:
+        get_db().send_query(f"CREATE INDEX {TIMESTAMP_INDEX} ON twinnydb.interactions_all (timestamp);")
+    return True
+
+@st.cache_data
+def get_date_bounds(version):
+    ensure_timestamp_index()
+    bounds = get_db().send_query(
+        "select min(timestamp) as min_ts, max(timestamp) as max_ts from twinnydb.interactions_all"
+    )
+    if len(bounds) == 0 or pd.isnull(bounds.iloc[0]["min_ts"]):
+        return None, None
+    return (
+        pd.to_datetime(bounds.iloc[0]["min_ts"]) + TIMESTAMP_OFFSET,
+        pd.to_datetime(bounds.iloc[0]["max_ts"]) + TIMESTAMP_OFFSET,
+    )
+
+def date_range_bounds(start, end):
+    # start/end are sidebar dates in KST, end is inclusive of the whole day but not of the
+    # next midnight, both bounds are inclusive in SQL
+    low = pd.to_datetime(start) - TIMESTAMP_OFFSET
+    high = pd.to_datetime(end) + pd.Timedelta(hours=24) - TIMESTAMP_OFFSET - KEY_RESOLUTION
+    return low, high
+
+@st.cache_data(max_entries=64)
+def get_range_group(group, start, end, version):
+    if not USE_SNAPSHOT:
+        ensure_timestamp_index()
+    a = fetch_interactions([date_range_bounds(start, end)], group_columns([group]))
+    if len(a) == 0:
+        return pd.DataFrame(columns=group_columns([group])).set_index("timestamp")
+    return prepare_interactions(a).set_index("timestamp")
+
+def get_range_data(start, end, version, groups=ALL_GROUPS):
+    # Every group is cached on its own, so a page asking for fewer groups never pays for the rest
+    groups = ["core"] + [g for g in groups if g != "core"]
+    frames = [get_range_group(group, start, end, version) for group in groups]
+    if len(frames[0]) == 0:
+        return pd.DataFrame(columns=group_columns(groups))
+    data = pd.concat(frames, axis=1, join="inner") if len(frames) > 1 else frames[0]
+    return data.reset_index()
+
+@st.cache_resource
+def get_keyword_partials(variant):
+    return KeywordPartials(os.path.join(KEYWORD_DIR, variant), get_token_vocabulary())
+
+@st.cache_data(max_entries=32)
+def get_keyword_matrix(stemmed, start, end, version):
+    # Sum of the daily partials, days seen for the first time are built from their rows
+    variant = "stemmed" if stemmed else "raw"
+    partials = get_keyword_partials(variant)
+    days = pd.date_range(start, end, freq="D")
+    missing = partials.missing(days)
+    if missing:
+        data = get_range_data(missing[0], missing[-1], version, groups=("core", "tokens"))
+        query_col, response_col = KEYWORD_VARIANTS[variant]
+        partials.add_days(missing, data["timestamp"], token_arrays(data, query_col), token_arrays(data, response_col))
+    return KeywordMatrix(*partials.total(days))
+
+@st.cache_resource
+def get_keyword_index_cache(variant):
+    query_col, response_col = KEYWORD_VARIANTS[variant]
 
+    def load(ranges):
+        # The index is keyed by display time like the pages, the DB by UTC
+        if ranges is not None:
+            ranges = [tuple(bound - TIMESTAMP_OFFSET if bound is not None else None for bound in r) for r in ranges]
+        a = fetch_interactions(ranges, ["timestamp", query_col, response_col])
+        if len(a) == 0:
+            empty = TokenArrays.from_blobs([])
+            return [], empty, empty
+        a = prepare_interactions(a)
+        return a["timestamp"], token_arrays(a, query_col), token_arrays(a, response_col)
 
+    return KeywordIndexCache(load, get_token_vocabulary())
 
+def get_keyword_index(stemmed, version):
+    # Extended from the rows past its watermark and the rewritten ones on a version change
+    return get_keyword_index_cache("stemmed" if stemmed else "raw").get(version)
 
+def get_interactions(timestamps, groups=("core", "text")):
+    # A handful of rows by display timestamp, e.g. one page of a drill-down
+    columns = group_columns(groups)
+    if len(timestamps) == 0:
+        return pd.DataFrame(columns=columns)
+    ranges = [(t - TIMESTAMP_OFFSET, t - TIMESTAMP_OFFSET) for t in pd.to_datetime(timestamps)]
+    a = fetch_interactions(ranges, columns)
+    if len(a) == 0:
+        return pd.DataFrame(columns=columns)
+    return prepare_interactions(a)
@@ -0,0 +1,68 @@
+import numpy as np
+
+
+# Tagged blobs start with MAGIC and a format byte. Untagged blobs are the original raw
+# float32 rows; a float32 row starting with these bytes would be a ~1e-38 component.
+MAGIC = b"EMB"
+FORMATS = {"float32": 1, "float16": 2, "int8": 3}
+FORMAT_NAMES = {tag: name for name, tag in FORMATS.items()}
+HEADER_SIZE = len(MAGIC) + 1
+SCALE_SIZE = 4
+
+
+def blob_format(blob):
+    blob = bytes(blob[:HEADER_SIZE])
+    if len(blob) == HEADER_SIZE and blob[:len(MAGIC)] == MAGIC and blob[-1] in FORMAT_NAMES:
+        return FORMAT_NAMES[blob[-1]]
+    return "legacy"
+
+def encode_embeddings(matrix, fmt="float32"):
+    # One blob per row; int8 keeps a float32 scale per vector (max |x| maps to 127)
+    matrix = np.asarray(matrix, dtype=np.float32)
+    header = MAGIC + bytes([FORMATS[fmt]])
+    if fmt == "float32":
+        body = matrix
+    elif fmt == "float16":
+        body = matrix.astype(np.float16)
+    else:
+        scale = np.abs(matrix).max(axis=1, keepdims=True) / 127
+        scale[scale == 0] = 1
+        values = np.clip(np.rint(matrix / scale), -127, 127).astype(np.int8)
+        scale = scale.astype(np.float32)
+        return [header + s.tobytes() + row.tobytes() for s, row in zip(scale, values)]
+    return [header + row.tobytes() for row in body]
+
+def _decode_uniform(buffer, n, fmt):
+    # n blobs of the same format and length, joined in `buffer`
+    if fmt == "legacy":
+        return np.frombuffer(buffer, dtype=np.float32).reshape(n, -1)
+    rows = np.frombuffer(buffer, dtype=np.uint8).reshape(n, -1)[:, HEADER_SIZE:]
+    if fmt == "float32":
+        return np.ascontiguousarray(rows).view(np.float32)
+    if fmt == "float16":
+        return np.ascontiguousarray(rows).view(np.float16).astype(np.float32)
+    scale = np.ascontiguousarray(rows[:, :SCALE_SIZE]).view(np.float32)
+    return np.ascontiguousarray(rows[:, SCALE_SIZE:]).view(np.int8).astype(np.float32) * scale
+
+def decode_embeddings(blobs):
+    """Decode any mix of tagged and legacy blobs into one float32 (n, d) matrix."""
+    blobs = [bytes(blob) for blob in blobs]
+    if not blobs:
+        return np.empty((0, 0), dtype=np.float32)
+    formats = [blob_format(blob) for blob in blobs]
+    if len(set(formats)) == 1 and len({len(blob) for blob in blobs}) == 1:
+        return _decode_uniform(b"".join(blobs), len(blobs), formats[0])
+    # Mixed rows, e.g. halfway through a migration: decode each group in one go
+    groups = {}
+    for i, (fmt, blob) in enumerate(zip(formats, blobs)):
+        groups.setdefault((fmt, len(blob)), []).append(i)
+    matrix = None
+    for (fmt, _), rows in groups.items():
+        decoded = _decode_uniform(b"".join(blobs[i] for i in rows), len(rows), fmt)
+        if matrix is None:
+            matrix = np.empty((len(blobs), decoded.shape[1]), dtype=np.float32)
+        matrix[rows] = decoded
+    return matrix
+
+def decode_embedding(blob):
+    return decode_embeddings([blob])[0]
@@ -0,0 +1,193 @@
+import os
+import json
+import fcntl
+import threading
+from contextlib import contextmanager
+import numpy as np
+import pandas as pd
+
+
+KINDS = ("q", "r")
+BLOCK_ROWS = 65536
+
+
+def as_keys(timestamps):
+    return pd.to_datetime(pd.Series(timestamps)).to_numpy(dtype="datetime64[ns]").view(np.int64)
+
+
+class EmbeddingStore:
+    """Query and response embeddings as two contiguous float32 (n, d) matrices.
+
+    Rows are ordered by timestamp and live in memory-mapped files, so every session and
+    worker process on the host maps the same pages. `take()` returns a zero-copy view
+    whenever the requested rows are contiguous, which is the case for any date range.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.meta = None
+        self.keys = np.empty(0, dtype=np.int64)
+        self.matrices = {kind: np.empty((0, 0), dtype=np.float32) for kind in KINDS}
+        self._touched = []
+        self._lock = threading.RLock()
+        self.sync()
+
+    def _path(self, name, generation):
+        return os.path.join(self.directory, f"{name}.{generation}.bin")
+
+    def _read_meta(self):
+        try:
+            with open(os.path.join(self.directory, "meta.json")) as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def _write_meta(self, meta):
+        path = os.path.join(self.directory, "meta.json")
+        with open(path + ".tmp", "w") as f:
+            json.dump(meta, f)
+        os.replace(path + ".tmp", path)
+
+    @contextmanager
+    def _file_lock(self):
+        # Several Streamlit processes can share the directory, only one writes at a time
+        with open(os.path.join(self.directory, "lock"), "w") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def __len__(self):
+        return len(self.keys)
+
+    @property
+    def watermark(self):
+        return pd.Timestamp(self.keys[-1]) if len(self.keys) else None
+
+    def sync(self):
+        # Pick up files written by another process
+        meta = self._read_meta()
+        with self._lock:
+            if meta == self.meta:
+                return
+            self.meta = meta
+            if meta is None or meta["n"] == 0:
+                self.keys = np.empty(0, dtype=np.int64)
+                self.matrices = {kind: np.empty((0, 0), dtype=np.float32) for kind in KINDS}
+                return
+            n, dim, generation = meta["n"], meta["dim"], meta["generation"]
+            self.keys = np.memmap(self._path("keys", generation), dtype=np.int64, mode="r", shape=(n,))
+            self.matrices = {
+                kind: np.memmap(self._path(kind, generation), dtype=np.float32, mode="r", shape=(n, dim))
+                for kind in KINDS
+            }
+
+    def mark_touched(self, keys):
+        keys = pd.to_datetime(pd.Series(keys), errors="coerce", format="mixed").dropna()
+        if len(keys) > 0:
+            with self._lock:
+                self._touched.append((keys.min(), keys.max()))
+
+    def pop_touched(self):
+        with self._lock:
+            touched, self._touched = self._touched, []
+        return touched
+
+    def positions(self, timestamps):
+        keys = as_keys(timestamps)
+        positions = np.searchsorted(self.keys, keys)
+        found = positions < len(self.keys)
+        found[found] = self.keys[positions[found]] == keys[found]
+        if not found.all():
+            raise KeyError(f"{int((~found).sum())} rows are missing from the embedding store")
+        return positions
+
+    def take(self, kind, timestamps):
+        positions = self.positions(timestamps)
+        matrix = self.matrices[kind]
+        if len(positions) == 0:
+            return matrix[:0]
+        start, stop = positions[0], positions[-1] + 1
+        if stop - start == len(positions) and np.all(np.diff(positions) == 1):
+            return matrix[start:stop]
+        return matrix[positions]
+
+    def reset(self):
+        with self._lock, self._file_lock():
+            self._write_meta({"n": 0, "dim": 0, "generation": self._next_generation()})
+            self._remove_stale(None)
+        self.sync()
+
+    def upsert(self, timestamps, query_embeddings, response_embeddings):
+        keys = as_keys(timestamps)
+        new = {"q": np.asarray(query_embeddings, dtype=np.float32), "r": np.asarray(response_embeddings, dtype=np.float32)}
+        if len(keys) == 0:
+            return
+        # Sort the incoming rows and keep the last copy of a repeated key
+        order = np.argsort(keys, kind="stable")
+        keys = keys[order]
+        last = np.append(keys[1:] != keys[:-1], True)
+        keys = keys[last]
+        new = {kind: matrix[order][last] for kind, matrix in new.items()}
+
+        with self._lock, self._file_lock():
+            self.sync()
+            if len(self.keys) and keys[0] > self.keys[-1] and self.meta["dim"] == new["q"].shape[1]:
+                self._append(keys, new)
+            else:
+                self._rewrite(keys, new)
+        self.sync()
+
+    def _next_generation(self):
+        return (self.meta or {}).get("generation", 0) + 1
+
+    def _append(self, keys, new):
+        generation = self.meta["generation"]
+        n, dim = self.meta["n"], self.meta["dim"]
+        self._append_file(self._path("keys", generation), n * keys.itemsize, keys)
+        for kind in KINDS:
+            self._append_file(self._path(kind, generation), n * dim * new[kind].itemsize, new[kind])
+        self._write_meta({"n": self.meta["n"] + len(keys), "dim": self.meta["dim"], "generation": generation})
+
+    @staticmethod
+    def _append_file(path, size, array):
+        # Bytes past `size` are left by an append that died before meta.json was written
+        with open(path, "r+b") as f:
+            f.truncate(size)
+            f.seek(size)
+            f.write(array.tobytes())
+
+    def _rewrite(self, keys, new):
+        # Out of order or rewritten rows: merge into a new generation block by block
+        old_keys = np.asarray(self.keys)
+        kept = np.flatnonzero(~np.isin(old_keys, keys))
+        merged_keys = np.concatenate([old_keys[kept], keys])
+        order = np.argsort(merged_keys, kind="stable")
+        dim = new["q"].shape[1]
+        generation = self._next_generation()
+
+        with open(self._path("keys", generation), "wb") as f:
+            f.write(merged_keys[order].tobytes())
+        for kind in KINDS:
+            old = self.matrices[kind]
+            with open(self._path(kind, generation), "wb") as f:
+                for start in range(0, len(order), BLOCK_ROWS):
+                    block = order[start:start + BLOCK_ROWS]
+                    from_old = block < len(kept)
+                    rows = np.empty((len(block), dim), dtype=np.float32)
+                    if from_old.any():
+                        rows[from_old] = old[kept[block[from_old]]]
+                    rows[~from_old] = new[kind][block[~from_old] - len(kept)]
+                    f.write(rows.tobytes())
+
+        self._write_meta({"n": len(merged_keys), "dim": dim, "generation": generation})
+        self._remove_stale(generation)
+
+    def _remove_stale(self, generation):
+        # Open maps in other processes stay valid after the unlink
+        for name in os.listdir(self.directory):
+            parts = name.split(".")
+            if len(parts) == 3 and parts[2] == "bin" and parts[1] != str(generation):
+                os.remove(os.path.join(self.directory, name))
@@ -1,38 +1,27 @@
-from sklearn.metrics.pairwise import cosine_similarity
 import numpy as np
 import streamlit as st
 import pandas as pd
 from streamlit_elements import elements, mui, nivo
 from utils.common_utils import custom_colors, custom_theme, time_func
-from konlpy.tag import Okt
-from gensim import corpora
+from utils.data import get_embeddings, get_tokenizer, get_token_vocabulary, get_range_data
+from utils.token_ids import TokenArrays
+from utils.similarity import upper_triangle
+from utils.similarity_histogram import coarsen_histogram
 from gensim.models.ldamodel import LdaModel
 import folium
 from folium.plugins import HeatMap
 from streamlit_folium import folium_static
-import json
 
 @time_func
-def get_similarity_score_list(data, bin_width):
-    min_score = data['similarity_score'].min()
-    max_score = data['similarity_score'].max()
-    bins = np.arange(min_score, max_score + bin_width, bin_width)
-    data['binned_similarity'] = pd.cut(data['similarity_score'], bins=bins, include_lowest=True)
-    binned_counts = data['binned_similarity'].value_counts().sort_index()
-    result = [{'similarity_score': f"{round(interval.left, 2)} ~ {round(interval.right, 2)}", 'count': count} 
-            for interval, count in binned_counts.items()]
-    return result
-
-@time_func
-def compute_similarities(data):
-    # Convert embeddings to numpy arrays if they're not already
-    query_embeddings = np.array(data["query_embedding"].tolist())
-    response_embeddings = np.array(data["response_embedding"].tolist())
-
-    # Compute cosine similarity
-    similarities = np.diag(cosine_similarity(query_embeddings, response_embeddings))
-
-    return similarities
+def get_similarity_score_list(histogram, bin_width):
+    # Bars from the summed day histograms, trimmed to the bins that hold scores
+    coarse = coarsen_histogram(histogram, bin_width)
+    filled = np.flatnonzero(coarse["count"].to_numpy() > 0)
+    if len(filled) == 0:
+        return []
+    coarse = coarse.iloc[filled[0]:filled[-1] + 1]
+    return [{'similarity_score': f"{low:.2f} ~ {high:.2f}", 'count': int(count)}
+            for low, high, count in zip(coarse["low"], coarse["high"], coarse["count"])]
 
 def display_similarity_histogram(similarity_score_list):
     with elements("simlarity_histogram"):
@@ -90,27 +79,43 @@ def display_samples(category_data, category_name):
         st.write("--")
 
 @st.cache_data
-def unique_word_ratio(text):
-    okt = Okt()
-    words = okt.morphs(text)
-    return len(set(words)) / len(words) if words else 0
+def unique_word_ratio(texts):
+    # One batch through the tokenizer pool instead of a JVM call per text
+    return [len(set(words)) / len(words) if words else 0 for words in get_tokenizer().morphs(list(texts))]
 
 @st.cache_data
-def preprocess(text):
-    okt = Okt()
-    return [word for word in okt.nouns(text) if len(word) > 1]
+def noun_words(words):
+    # Whether each word is a noun on its own, one batch for the distinct words instead of every text
+    return np.array([word in nouns for word, nouns in zip(words, get_tokenizer().nouns(list(words)))], dtype=bool)
 
 @st.cache_data
-def preprocess_data(data):
-    return [preprocess(text) for text in data["response"]]
-
-@st.cache_resource
-def create_dictionary(corpus):
-    return corpora.Dictionary(corpus)
-
-@st.cache_resource
-def create_bow_corpus(corpus, _dictionary):
-    return [_dictionary.doc2bow(text) for text in corpus]
+def topic_corpus(blobs, min_length=2):
+    # Bag-of-words of the nouns among the stored stem ids, words shorter than min_length dropped
+    arrays = TokenArrays.from_blobs(blobs)
+    vocabulary = get_token_vocabulary()
+    vocabulary.sync()
+    words = vocabulary.array()
+    lengths = np.fromiter((len(word) for word in words), dtype=np.int64, count=len(words))
+    rows, ids = arrays.row_ids(), arrays.ids
+    keep = lengths[ids] >= min_length
+    rows, ids = rows[keep], ids[keep]
+    # A word with no noun is stemmed to itself, so verbs and particles sit among the stems
+    candidates = np.unique(ids)
+    nouns = candidates[noun_words(tuple(words[candidates].tolist()))]
+    keep = np.isin(ids, nouns)
+    rows, ids = rows[keep], ids[keep]
+    if len(ids) == 0:
+        return [[] for _ in range(len(arrays))], {}
+    # Dense ids for the words in use, then one count over (row, word) pairs
+    used, dense = np.unique(ids, return_inverse=True)
+    pairs, counts = np.unique(rows * len(used) + dense, return_counts=True)
+    pair_rows, pair_words = np.divmod(pairs, len(used))
+    bounds = np.searchsorted(pair_rows, np.arange(len(arrays) + 1))
+    corpus = [
+        list(zip(pair_words[start:stop].tolist(), counts[start:stop].tolist()))
+        for start, stop in zip(bounds[:-1], bounds[1:])
+    ]
+    return corpus, dict(enumerate(words[used].tolist()))
 
 @st.cache_resource
 def create_lda_model(bow_corpus, _dictionary, num_topics, passes):
@@ -119,9 +124,7 @@ def create_lda_model(bow_corpus, _dictionary, num_topics, passes):
 
 @time_func
 def get_lda_model(data, num_topics, passes):
-    corpus = preprocess_data(data)
-    dictionary = create_dictionary(corpus)
-    bow_corpus = create_bow_corpus(corpus, _dictionary=dictionary)
+    bow_corpus, dictionary = topic_corpus(data["response_stem_ids"].tolist())
     lda_model = create_lda_model(bow_corpus, _dictionary=dictionary, num_topics=num_topics, passes=passes)
     return lda_model
 
@@ -166,20 +169,26 @@ def make_topic_pie(topic_data, i):
                 theme=custom_theme,
             )
 
+@st.cache_data
+def get_response_consistency(start, end, version):
+    # Cached per range and data version, widgets on the page do not redo the pairwise similarities
+    return check_response_consistency(get_range_data(start, end, version, groups=("core", "text")))
+
 @time_func
 def check_response_consistency(df):
     results = []
+    df = df.reset_index(drop=True)
+    response_embeddings = get_embeddings(df, "r")
     for query, group in df.groupby("user_query"):
         # Get unique responses and their embeddings
         unique_responses = group.drop_duplicates(subset=["response"])
         if (
             len(unique_responses) >= 2
         ):  # Only process groups with at least 2 unique responses
-            embeddings = np.stack(unique_responses["response_embedding"].values)
+            embeddings = response_embeddings[unique_responses.index.to_numpy()]
             
-            similarities = cosine_similarity(embeddings)
-            # Get upper triangle of similarity matrix (excluding diagonal)
-            upper_tri = similarities[np.triu_indices(similarities.shape[0], k=1)]
+            # Upper triangle of the similarity matrix (excluding diagonal), built in bounded blocks
+            upper_tri = upper_triangle(embeddings)
             results.append(
                 {
                     "user_query": query,
@@ -209,14 +218,6 @@ def highlight_inconsistent(row):
         styles[row.index.get_loc("min_similarity")] = "background-color: steelblue"
     return styles
 
-def extract_coordinates(status_str):
-    try:
-        status_dict = json.loads(status_str.replace("'", '"'))
-        location = status_dict.get("location", {})
-        return location.get("lat"), location.get("lon")
-    except:
-        return None, None
-
 @time_func
 def draw_heatmap(data, padding):
     x_min, x_max = data["x"].min() - padding, data["x"].max() + padding
@@ -271,13 +272,10 @@ def draw_heatmap(data, padding):
         ).add_to(m)
 
     # Create the heatmap layer
-    heat_data = [
-        [
-            max(y_min + padding, min(y_max - padding, row["y"])),
-            max(x_min + padding, min(x_max - padding, row["x"])),
-        ]
-        for _, row in data.iterrows()
-    ]
+    heat_data = np.column_stack([
+        np.clip(data["y"].to_numpy(), y_min + padding, y_max - padding),
+        np.clip(data["x"].to_numpy(), x_min + padding, x_max - padding),
+    ]).tolist()
     HeatMap(heat_data, min_opacity=0.5, max_opacity=0.8, radius=15).add_to(m)
 
     # Fit the map to the data bounds
@@ -1,35 +1,11 @@
 import streamlit as st
+import pandas as pd
 
 
-@st.cache_data
-def calculate_counts(data):
-    hourly_counts = data["hour"].value_counts().sort_index().reset_index()
-    hourly_counts.columns = ["hour", "user_query_count"]
-
-    weekday_counts = (
-        data["day_name"]
-        .value_counts()
-        .reindex(["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"])
-        .reset_index()
-    )
-    weekday_counts.columns = ["day_name", "user_query_count"]
-    weekday_counts.fillna(0, inplace=True)
-
-    data.set_index("timestamp", inplace=True)
-    daily_queries = data["user_query"].resample("D").count().reset_index()
-    daily_queries.columns = ["date", "user_query_count"]
-    daily_queries["date"] = daily_queries["date"].dt.strftime("%Y-%m-%d")
+DAY_ORDER = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
 
-    return hourly_counts, weekday_counts, daily_queries
 
-@st.cache_data
-def convert_dataframe_to_listof_dic(df):
-    grouped_df = (
-        df.groupby(["day_name", "hour", "day_of_week"])
-        .size()
-        .reset_index(name="user_query_count")
-        .sort_values(["day_of_week", "hour"])
-    )
+def pivot_by_interval(grouped_df):
     time_intervals = [
         ("09:00", "11:00"),
         ("11:00", "13:00"),
@@ -56,14 +32,54 @@ def convert_dataframe_to_listof_dic(df):
         .reset_index()
     )
     result = pivot_df.to_dict("records")
-    day_order = [
-        "Monday",
-        "Tuesday",
-        "Wednesday",
-        "Thursday",
-        "Friday",
-        "Saturday",
-        "Sunday",
-    ]
-    sorted_data = sorted(result, key=lambda x: day_order.index(x["day_name"]))
-    return sorted_data
\ No newline at end of file
+    sorted_data = sorted(result, key=lambda x: DAY_ORDER.index(x["day_name"]))
+    return sorted_data
+
+
+def prepare_rollups(rollups):
+    rollups = rollups[rollups["query_count"] > 0].copy()
+    rollups["hour"] = rollups["hour"].apply(lambda x: f"{x:02d}:00")
+    rollups["day_of_week"] = rollups["date"].dt.dayofweek
+    rollups["day_name"] = rollups["date"].dt.day_name()
+    return rollups
+
+
+@st.cache_data
+def calculate_rollup_counts(rollups):
+    # Hourly, weekday and daily query counts, built from the (date, hour) rollups
+    rollups = prepare_rollups(rollups)
+
+    hourly_counts = rollups.groupby("hour")["query_count"].sum().sort_index().reset_index()
+    hourly_counts.columns = ["hour", "user_query_count"]
+
+    weekday_counts = (
+        rollups.groupby("day_name")["query_count"].sum()
+        .reindex(DAY_ORDER)
+        .reset_index()
+    )
+    weekday_counts.columns = ["day_name", "user_query_count"]
+    weekday_counts.fillna(0, inplace=True)
+
+    daily = rollups.groupby("date")["query_count"].sum()
+    daily = daily.reindex(pd.date_range(daily.index.min(), daily.index.max(), freq="D"), fill_value=0)
+    daily_queries = daily.reset_index()
+    daily_queries.columns = ["date", "user_query_count"]
+    daily_queries["date"] = daily_queries["date"].dt.strftime("%Y-%m-%d")
+
+    return hourly_counts, weekday_counts, daily_queries
+
+
+@st.cache_data
+def convert_rollups_to_listof_dic(rollups):
+    rollups = prepare_rollups(rollups)
+    grouped_df = (
+        rollups.groupby(["day_name", "hour", "day_of_week"])["query_count"]
+        .sum()
+        .reset_index(name="user_query_count")
+        .sort_values(["day_of_week", "hour"])
+    )
+    return pivot_by_interval(grouped_df)
+
+
+def average_latency(rollups):
+    return rollups["latency_sum"].sum() / rollups["latency_count"].sum()
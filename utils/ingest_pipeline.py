@@ -0,0 +1,164 @@
+import os
+import time
+import queue
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from collections import Counter
+import pandas as pd
+
+from utils.resources import resources
+from utils.tokenizer import Tokenizer
+from utils.data import TOKENIZER_BACKEND, clean_chunk, stem_texts, stem_texts_counted, tokenize_chunk, encode_chunk, write_chunk, unstemmed_rows, warm_ingest
+
+
+STEM_WORKERS = max(1, (os.cpu_count() or 2) - 1)
+QUEUE_SIZE = 4
+_DONE = object()
+
+
+class StageStats:
+    def __init__(self, name):
+        self.name = name
+        self.chunks = 0
+        self.rows = 0
+        self.busy = 0.0
+
+    def add(self, rows, seconds):
+        self.chunks += 1
+        self.rows += rows
+        self.busy += seconds
+
+    def as_dict(self, wall_time):
+        return {
+            "stage": self.name,
+            "chunks": self.chunks,
+            "rows": self.rows,
+            "busy_seconds": round(self.busy, 2),
+            "rows_per_second": round(self.rows / self.busy, 1) if self.busy else None,
+            "utilization": round(self.busy / wall_time, 2) if wall_time else None,
+        }
+
+
+def warm_worker():
+    # These processes are already the stemming pool, tokenize in-process with a warm analyzer
+    resources.override("tokenizer", Tokenizer(TOKENIZER_BACKEND, workers=0))
+    stem_texts(["준비"])
+
+
+class IngestPipeline:
+    """Staged upload: stemming in a process pool, batched encoding, a DB writer thread.
+
+    Only the writer thread uses the connection: the encoder computes embeddings, labels
+    and centroid distances, the writer assigns token ids and records the drift statistics.
+
+    Bounded queues between the stages keep memory flat: the reader blocks when stemming
+    falls behind, stemming blocks when encoding does, and so on. `run()` returns the
+    per-stage throughput, `errors` lists the chunks the writer could not insert and
+    `stem_cache_stats()` the token cache hit rate across the workers.
+    """
+
+    def __init__(self, db, stem_workers=STEM_WORKERS, queue_size=QUEUE_SIZE, on_written=None):
+        self.db = db
+        self.stem_workers = stem_workers
+        self.queue_size = queue_size
+        self.on_written = on_written
+        self.stats = {name: StageStats(name) for name in ["read", "stem", "encode", "write"]}
+        self.errors = []
+        self.stem_cache = Counter()
+
+    def _stem(self, pool, chunk):
+        # Ship only the texts that still need stemming to the pool
+        texts = {}
+        for col, source in [("query_stemmed_words", "user_query"), ("response_stemmed_words", "response")]:
+            mask = unstemmed_rows(chunk, col)
+            texts[col] = (mask, pool.submit(stem_texts_counted, chunk.loc[mask, source].tolist()) if mask.any() else None)
+        return texts
+
+    def _encode_stage(self, stem_queue, write_queue, failure):
+        try:
+            while True:
+                item = stem_queue.get()
+                if item is _DONE:
+                    break
+                chunk, futures, submitted = item
+                for col, (mask, future) in futures.items():
+                    if future is not None:
+                        stemmed, counts = future.result()
+                        chunk.loc[mask, col] = stemmed
+                        for key, value in counts.items():
+                            self.stem_cache[key] += value
+                self.stats["stem"].add(len(chunk), time.time() - submitted)
+
+                start_time = time.time()
+                chunk = encode_chunk(chunk)
+                self.stats["encode"].add(len(chunk), time.time() - start_time)
+                write_queue.put(chunk)
+        except Exception as e:
+            failure.append(e)
+            # Keep draining so the reader never blocks on a full queue
+            while stem_queue.get() is not _DONE:
+                pass
+        finally:
+            write_queue.put(_DONE)
+
+    def _write_stage(self, write_queue):
+        while True:
+            chunk = write_queue.get()
+            if chunk is _DONE:
+                break
+            start_time = time.time()
+            try:
+                # Token ids need the vocabulary table, so they are assigned on the thread that owns the DB
+                chunk = tokenize_chunk(chunk)
+                write_chunk(chunk, self.db)
+            except Exception as e:
+                self.errors.append(f"rows {chunk.index.min()}-{chunk.index.max()}: {e}")
+            self.stats["write"].add(len(chunk), time.time() - start_time)
+            if self.on_written is not None:
+                self.on_written(len(chunk))
+
+    def run(self, chunks):
+        start_time = time.time()
+        warm_ingest(self.db)
+        # Enough chunks in flight to keep every stemming worker busy
+        stem_queue = queue.Queue(maxsize=max(self.queue_size, self.stem_workers))
+        write_queue = queue.Queue(maxsize=self.queue_size)
+        failure = []
+
+        encoder = threading.Thread(target=self._encode_stage, args=(stem_queue, write_queue, failure), daemon=True)
+        writer = threading.Thread(target=self._write_stage, args=(write_queue,), daemon=True)
+        encoder.start()
+        writer.start()
+
+        # Spawned workers never inherit a JVM from this process
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(self.stem_workers, mp_context=context, initializer=warm_worker) as pool:
+            try:
+                iterator = iter(chunks)
+                while not failure:
+                    read_start = time.time()
+                    chunk = next(iterator, None)
+                    if chunk is None:
+                        break
+                    chunk = clean_chunk(chunk)
+                    self.stats["read"].add(len(chunk), time.time() - read_start)
+                    stem_queue.put((chunk, self._stem(pool, chunk), time.time()))
+            finally:
+                stem_queue.put(_DONE)
+                encoder.join()
+                writer.join()
+
+        if failure:
+            raise failure[0]
+        return self.report(time.time() - start_time)
+
+    def stem_cache_stats(self):
+        lookups = sum(self.stem_cache.values())
+        hit_rate = (self.stem_cache["hits"] + self.stem_cache["disk_hits"]) / lookups if lookups else None
+        return {**self.stem_cache, "hit_rate": hit_rate}
+
+    def report(self, wall_time):
+        # "stem" counts the time a chunk waited on the pool, so it includes queueing
+        return pd.DataFrame([stats.as_dict(wall_time) for stats in self.stats.values()])
+
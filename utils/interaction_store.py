@@ -0,0 +1,155 @@
+import threading
+import numpy as np
+import pandas as pd
+
+
+# Timestamps carry at most microsecond precision, so "after the watermark" is an inclusive bound
+KEY_RESOLUTION = pd.Timedelta(microseconds=1)
+
+
+def format_timestamp(value):
+    return pd.Timestamp(value).strftime("%Y-%m-%d %H:%M:%S.%f")
+
+
+class InteractionStore:
+    """In-memory copy of interactions_all that is refreshed from a watermark.
+
+    `fetch(ranges, columns)` returns the raw rows whose key falls in any of the inclusive
+    (low, high) ranges, either bound may be None, or every row when `ranges` is None.
+    `prepare(raw)` turns them into the frame the pages use.
+    Column groups are fetched the first time a caller asks for them.
+    """
+
+    def __init__(self, fetch, prepare, groups, key="timestamp"):
+        self.fetch = fetch
+        self.prepare = prepare
+        self.groups = groups
+        self.key = key
+        self.data = None
+        self.loaded_groups = []
+        self.watermark = None
+        self.version = 0
+        self._touched = []
+        self._lock = threading.RLock()
+
+    def columns_for(self, groups):
+        columns = [self.key]
+        for group in groups:
+            columns.extend(c for c in self.groups[group] if c not in columns)
+        return columns
+
+    def mark_touched(self, keys):
+        # Rows rewritten through ON DUPLICATE KEY UPDATE keep their old key and can sit
+        # behind the watermark, so remember the key range for the next refresh
+        keys = pd.to_datetime(pd.Series(keys), errors="coerce", format="mixed").dropna()
+        if len(keys) == 0:
+            return
+        with self._lock:
+            self._touched.append((keys.min(), keys.max()))
+
+    def patch(self, keys, values):
+        # Set numeric columns of rows already held (e.g. relabelled clusters) without fetching them again
+        with self._lock:
+            self.version += 1
+            if self.data is None or len(self.data) == 0:
+                return
+            present = {name: column for name, column in values.items() if name in self.data.columns}
+            if not present:
+                return
+            keys = pd.to_datetime(keys).to_numpy(dtype="datetime64[ns]")
+            order = np.argsort(keys, kind="stable")
+            keys = keys[order]
+            held = self.data[self.key].to_numpy(dtype="datetime64[ns]")
+            positions = np.searchsorted(keys, held).clip(max=len(keys) - 1)
+            found = keys[positions] == held
+            columns = {}
+            for name, column in present.items():
+                current = pd.to_numeric(self.data[name], errors="coerce").to_numpy(dtype=np.float64, copy=True)
+                current[found] = np.asarray(column, dtype=np.float64)[order][positions[found]]
+                columns[name] = current
+            # A new frame, readers holding the old one are not affected
+            self.data = self.data.assign(**columns)
+
+    def reset(self):
+        with self._lock:
+            self.data = None
+            self.loaded_groups = []
+            self.watermark = None
+            self._touched = []
+            self.version += 1
+
+    def load(self, groups):
+        with self._lock:
+            if self.data is None:
+                self._full_load(groups)
+            else:
+                missing = [g for g in groups if g not in self.loaded_groups]
+                if missing:
+                    self._load_groups(missing)
+            columns = self.columns_for(groups)
+            return self.data[[c for c in self.data.columns if c in columns]]
+
+    def refresh(self):
+        with self._lock:
+            if self.data is None:
+                # Nothing is held in memory yet, the next load() reads the table anyway
+                self._touched = []
+                self.version += 1
+                return
+            if self.watermark is None:
+                self._full_load(self.loaded_groups)
+                return
+
+            ranges = [(self.watermark + KEY_RESOLUTION, None)]
+            for low, high in self._touched:
+                high = min(high, self.watermark)
+                if low <= high:
+                    ranges.append((low, high))
+            self._touched = []
+
+            delta = self.fetch(ranges, self.columns_for(self.loaded_groups))
+            if len(delta) > 0:
+                self._merge(delta)
+
+    def _full_load(self, groups):
+        raw = self.fetch(None, self.columns_for(groups))
+        self._touched = []
+        self.loaded_groups = list(groups)
+        self.version += 1
+        if len(raw) == 0:
+            self.data = pd.DataFrame(columns=self.columns_for(groups))
+            self.watermark = None
+            return
+        self.watermark = pd.to_datetime(raw[self.key]).max()
+        self.data = self.prepare(raw).reset_index(drop=True)
+
+    def _load_groups(self, groups):
+        if self.watermark is None:
+            self._full_load(self.loaded_groups + groups)
+            return
+        # Stop at the watermark so the new columns line up with the rows already held
+        columns = self.columns_for(groups)
+        raw = self.fetch([(None, self.watermark)], columns)
+        if len(raw) > 0:
+            self.data = self.data.merge(self.prepare(raw), on=self.key, how="left")
+        else:
+            self.data = self.data.assign(**{c: None for c in columns if c != self.key})
+        self.loaded_groups.extend(groups)
+
+    def _merge(self, raw):
+        self.watermark = max(self.watermark, pd.to_datetime(raw[self.key]).max())
+        delta = self.prepare(raw)
+
+        data = self.data
+        if len(data) > 0:
+            # Rows that came back through the update path replace their old version
+            data = data[~data[self.key].isin(delta[self.key])]
+            appended_in_order = len(data) == 0 or delta[self.key].min() > data[self.key].iloc[-1]
+        else:
+            appended_in_order = True
+
+        data = pd.concat([data, delta], ignore_index=True)
+        if not appended_in_order:
+            data = data.sort_values(by=self.key, kind="mergesort").reset_index(drop=True)
+        self.data = data
+        self.version += 1
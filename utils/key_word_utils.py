@@ -1,99 +1,39 @@
 from streamlit_agraph import agraph, Node, Edge, Config
-import math
+import pandas as pd
+import streamlit as st
+from utils.data import get_interactions
+from utils.keyword_graph import EgoGraph
 
-def draw_graph(option, select_word, keyword_df):
-    nodes = []
-    edges = []
+PAGE_SIZE = 20
 
-    if option == "Query":
-        num_nodes = sum(
-            1 for word, count in keyword_df[select_word].items() if count > 0
-        )
-        angle_step = 2 * math.pi / num_nodes # Calculate the distance between each outer nodes
-        radius = 300 # Change this to change the radius of the graph
-
-        center_node_id = f"q_{select_word}"
-        nodes.append(
-            Node(
-                id=center_node_id,
-                label=select_word,
-                size=25,
-                color="#5db89d",
-                font={"color": "#EEEEEE"},
-            )
-        )
+# Node colors by side, query words green and response words blue
+COLORS = {"q": "#5db89d", "r": "#2c4857"}
 
-        i = 0
-        for word, count in keyword_df[select_word].items():
-            if count > 0:
-                angle = i * angle_step
-                # Position of each new nodes calculated
-                x = radius * math.cos(angle)
-                y = radius * math.sin(angle)
-                nodes.append(
-                    Node(
-                        id=word,
-                        label=word,
-                        size=25,
-                        font={"color": "#EEEEEE"},
-                        color="#2c4857",
-                        x=x,
-                        y=y,
-                    )
-                )
-                edges.append(
-                    Edge(
-                        source=center_node_id,
-                        label=str(count),
-                        target=word,
-                        color="#5db89d",
-                    )
-                )
-                i += 1
-    elif option == "Response":
-        center_node_id = f"r_{select_word}"
-        nodes.append(
-            Node(
-                id=center_node_id,
-                label=select_word,
-                size=25,
-                font={"color": "#EEEEEE"},
-                color="#2c4857",
-            )
+def draw_graph(option, select_word, keyword_matrix, hops=1, top_k=10, min_weight=1):
+    side = "q" if option == "Query" else "r"
+    # Expansion, pruning and layout happen here, the frontend only draws fixed positions
+    graph = EgoGraph(keyword_matrix, side, select_word, hops=hops, top_k=top_k, min_weight=min_weight)
+    nodes = [
+        Node(
+            id=node,
+            label=attributes["word"],
+            size=25 if attributes["hop"] == 0 else max(10, 20 - 4 * attributes["hop"]),
+            color=COLORS[attributes["side"]],
+            font={"color": "#EEEEEE"},
+            x=attributes["x"],
+            y=attributes["y"],
         )
-
-        num_nodes = sum(
-            1 for word, count in keyword_df.loc[select_word].items() if count > 0
+        for node, attributes in graph.nodes.items()
+    ]
+    edges = [
+        Edge(
+            source=edge["source"],
+            target=edge["target"],
+            label=str(edge["weight"]),
+            color=COLORS[graph.nodes[edge["source"]]["side"]],
         )
-        angle_step = 2 * math.pi / num_nodes
-        radius = 300
-
-        i = 0
-        for word, count in keyword_df.loc[select_word].items():
-            if count > 0:
-                angle = i * angle_step
-                x = radius * math.cos(angle)
-                y = radius * math.sin(angle)
-                nodes.append(
-                    Node(
-                        id=word,
-                        label=word,
-                        size=25,
-                        font={"color": "#EEEEEE"},
-                        color="#5db89d",
-                        x=x,
-                        y=y,
-                    )
-                )
-                edges.append(
-                    Edge(
-                        source=center_node_id,
-                        label=str(count),
-                        target=word,
-                        color="#2c4857",
-                    )
-                )
-                i += 1
+        for edge in graph.edges
+    ]
 
     # Node graph configuration
     config = Config(
@@ -104,4 +44,24 @@ def draw_graph(option, select_word, keyword_df):
         hierarchical=False,
         # **kwargs
     )
-    agraph(nodes=nodes, edges=edges, config=config)
+    # The graph plus the id of the clicked node, if any
+    return graph, agraph(nodes=nodes, edges=edges, config=config)
+
+
+def show_matching_interactions(index, terms, mode, date_range, key="matches"):
+    # Posting list lookups for the count, only the rows of the shown page are fetched
+    low = pd.Timestamp(date_range[0])
+    high = pd.Timestamp(date_range[1]) + pd.Timedelta(days=1) - pd.Timedelta(microseconds=1)
+    rows = index.search(terms, mode=mode, low=low, high=high)
+    st.write(f"{len(rows)} matching interactions")
+    if len(rows) == 0:
+        return
+    pages = (len(rows) - 1) // PAGE_SIZE + 1
+    page = st.number_input("Page", min_value=1, max_value=pages, value=1, step=1, key=key)
+    # Newest first
+    shown = rows[::-1][(page - 1) * PAGE_SIZE:page * PAGE_SIZE]
+    matches = get_interactions(index.keys(shown))
+    st.dataframe(
+        matches.sort_values("timestamp", ascending=False)[["timestamp", "user_query", "response", "latency"]],
+        hide_index=True,
+    )
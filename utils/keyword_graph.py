@@ -0,0 +1,81 @@
+import heapq
+import math
+
+
+RADIUS = 300
+MAX_NODES = 60
+
+
+def node_id(side, word):
+    return f"{side}_{word}"
+
+def parse_node_id(value):
+    # "q_전시" -> ("q", "전시")
+    side, _, word = str(value).partition("_")
+    return (side, word) if side in ("q", "r") and word else (None, None)
+
+def other(side):
+    return "r" if side == "q" else "q"
+
+def strongest(keyword_matrix, side, word, top_k, min_weight, exclude):
+    # Heap-based top-k over one word's non-zero neighbours, O(n log k)
+    positions, weights = keyword_matrix.neighbours(side, word)
+    words = keyword_matrix.words(other(side))
+    candidates = (
+        (int(weight), words[position]) for position, weight in zip(positions, weights)
+        if weight >= min_weight and node_id(other(side), words[position]) not in exclude
+    )
+    return heapq.nlargest(top_k, candidates)
+
+
+class EgoGraph:
+    """k-hop neighbourhood of one word in the query/response co-occurrence graph.
+
+    Every hop keeps the `top_k` strongest new neighbours of each frontier node whose
+    weight reaches `min_weight`, at most `max_nodes` in total. Nodes are laid out on one
+    ring per hop, each node inside the arc of the node it was reached from, so hub
+    words stay readable. Node ids are prefixed with their side ("q_"/"r_").
+    """
+
+    def __init__(self, keyword_matrix, side, word, hops=1, top_k=10, min_weight=1, max_nodes=MAX_NODES):
+        center = node_id(side, word)
+        self.center = center
+        self.nodes = {center: {"side": side, "word": word, "hop": 0, "weight": None, "x": 0.0, "y": 0.0}}
+        self.edges = []
+        # Arc (start, width) each node's children are spread over
+        arcs = {center: (0.0, 2 * math.pi)}
+        frontier = [center]
+        for hop in range(1, hops + 1):
+            reached = []
+            for parent in frontier:
+                parent_side, parent_word = self.nodes[parent]["side"], self.nodes[parent]["word"]
+                for weight, neighbour in strongest(keyword_matrix, parent_side, parent_word, top_k, min_weight, self.nodes):
+                    if len(self.nodes) >= max_nodes:
+                        break
+                    child = node_id(other(parent_side), neighbour)
+                    if child in self.nodes:
+                        continue
+                    self.nodes[child] = {"side": other(parent_side), "word": neighbour, "hop": hop, "weight": weight}
+                    self.edges.append({"source": parent, "target": child, "weight": weight})
+                    reached.append((parent, child))
+            self._place(hop, reached, arcs)
+            frontier = [child for _, child in reached]
+            if not frontier:
+                break
+
+    def parent(self, node):
+        # The node `node` was reached from, every node but the centre has exactly one incoming edge
+        return next((edge["source"] for edge in self.edges if edge["target"] == node), self.center)
+
+    def _place(self, hop, reached, arcs):
+        children = {}
+        for parent, child in reached:
+            children.setdefault(parent, []).append(child)
+        for parent, group in children.items():
+            start, width = arcs[parent]
+            step = width / len(group)
+            for i, child in enumerate(group):
+                angle = start + (i + 0.5) * step if hop > 1 else i * step
+                self.nodes[child]["x"] = hop * RADIUS * math.cos(angle)
+                self.nodes[child]["y"] = hop * RADIUS * math.sin(angle)
+                arcs[child] = (angle - step / 2, step)
@@ -0,0 +1,197 @@
+import threading
+import numpy as np
+import pandas as pd
+from utils.interaction_store import KEY_RESOLUTION
+
+
+SIDES = ("q", "r")
+
+
+class Postings:
+    """word -> sorted row positions, stored as one flat int32 array plus offsets."""
+
+    def __init__(self, token_ids, vocabulary):
+        rows, ids = token_ids.row_ids(), token_ids.ids
+        # Sort by (word, row) and keep one entry per row a word appears in
+        order = np.lexsort((rows, ids))
+        ids, rows = ids[order], rows[order]
+        first = np.append(True, (ids[1:] != ids[:-1]) | (rows[1:] != rows[:-1])) if len(ids) else np.empty(0, dtype=bool)
+        ids, rows = ids[first], rows[first]
+        self.vocabulary = vocabulary
+        self.offsets = np.searchsorted(ids, np.arange(max(len(vocabulary), int(ids.max(initial=0)) + 1) + 1))
+        self.rows = rows.astype(np.int32)
+
+    def entries(self):
+        # (word id, row) of every posting, sorted by word then row
+        return np.repeat(np.arange(len(self.offsets) - 1), np.diff(self.offsets)), self.rows
+
+    def merged(self, row_map, other):
+        """These postings plus `other`, whose rows are already numbered in the merged order.
+
+        `row_map` renumbers the old rows (-1 drops one). Both sides stay sorted by (word,
+        row), so the new entries are inserted into the old ones at binary-searched
+        positions instead of sorting everything again. None means the old rows keep their
+        numbers and the new ones all come after them: each word's new list then goes at
+        the end of its old one.
+        """
+        n_words = max(len(self.offsets), len(other.offsets)) - 1
+        postings = Postings.__new__(Postings)
+        postings.vocabulary = other.vocabulary
+        other_ids, other_rows = other.entries()
+        if row_map is None:
+            offsets = np.concatenate([self.offsets, np.full(n_words + 1 - len(self.offsets), self.offsets[-1])])
+            postings.rows = np.insert(self.rows, offsets[other_ids + 1], other_rows)
+            postings.offsets = offsets + np.searchsorted(other_ids, np.arange(n_words + 1))
+            return postings
+        ids, rows = self.entries()
+        rows = row_map[rows]
+        kept = rows >= 0
+        ids, rows = ids[kept], rows[kept]
+        n_rows = int(max(rows.max(initial=-1), other_rows.max(initial=-1))) + 1
+        positions = np.searchsorted(
+            ids.astype(np.int64) * n_rows + rows,
+            other_ids.astype(np.int64) * n_rows + other_rows,
+        )
+        postings.rows = np.insert(rows.astype(np.int32), positions, other_rows)
+        counts = np.bincount(ids, minlength=n_words) + np.bincount(other_ids, minlength=n_words)
+        postings.offsets = np.concatenate([[0], np.cumsum(counts)])
+        return postings
+
+    def get(self, word):
+        i = self.vocabulary.ids.get(word)
+        if i is None or i + 1 >= len(self.offsets):
+            return np.empty(0, dtype=np.int32)
+        return self.rows[self.offsets[i]:self.offsets[i + 1]]
+
+    def __contains__(self, word):
+        return len(self.get(word)) > 0
+
+
+class KeywordIndex:
+    """Inverted index from query/response words to the interactions containing them.
+
+    Rows are numbered in timestamp order, so a posting list is also sorted by time and a
+    date range is a slice found by binary search. `search()` returns row positions,
+    `keys(rows)` the timestamps to fetch the rows by. Lookups and set operations only
+    touch the posting lists involved, whatever the size of the table.
+    """
+
+    def __init__(self, timestamps, query_ids, response_ids, vocabulary):
+        timestamps = pd.to_datetime(pd.Series(timestamps)).to_numpy(dtype="datetime64[ns]")
+        order = np.argsort(timestamps, kind="stable")
+        self.timestamps = timestamps[order]
+        self.postings = {
+            "q": Postings(query_ids.take(order), vocabulary),
+            "r": Postings(response_ids.take(order), vocabulary),
+        }
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    @property
+    def watermark(self):
+        return pd.Timestamp(self.timestamps[-1]) if len(self.timestamps) else None
+
+    def merge(self, timestamps, query_ids, response_ids, vocabulary):
+        """A new index with the given rows added, rows with a timestamp already indexed
+        replacing the old ones. Only the new rows are tokenized into postings, the old
+        posting lists are renumbered and merged."""
+        if len(timestamps) == 0:
+            return self
+        delta = KeywordIndex(timestamps, query_ids, response_ids, vocabulary)
+        kept = ~np.isin(self.timestamps, delta.timestamps)
+        merged = np.sort(np.concatenate([self.timestamps[kept], delta.timestamps]), kind="stable")
+        if kept.all() and (len(self.timestamps) == 0 or self.timestamps[-1] < delta.timestamps[0]):
+            # Only new rows past the end: old row numbers stand
+            row_map = None
+        else:
+            row_map = np.full(len(self.timestamps), -1, dtype=np.int64)
+            row_map[kept] = np.searchsorted(merged, self.timestamps[kept])
+        delta_rows = np.searchsorted(merged, delta.timestamps)
+
+        index = KeywordIndex.__new__(KeywordIndex)
+        index.timestamps = merged
+        index.postings = {}
+        for side in SIDES:
+            new = delta.postings[side]
+            new.rows = delta_rows[new.rows].astype(np.int32)
+            index.postings[side] = self.postings[side].merged(row_map, new)
+        return index
+
+    def rows(self, word, side="any"):
+        # side "q", "r" or "any" (either text contains the word)
+        word = str(word).lower()
+        if side == "any":
+            return np.union1d(self.postings["q"].get(word), self.postings["r"].get(word))
+        return self.postings[side].get(word)
+
+    def row_range(self, low=None, high=None):
+        # Inclusive timestamp bounds as a [start, stop) slice of row positions
+        start = np.searchsorted(self.timestamps, np.datetime64(pd.Timestamp(low), "ns"), "left") if low is not None else 0
+        stop = np.searchsorted(self.timestamps, np.datetime64(pd.Timestamp(high), "ns"), "right") if high is not None else len(self)
+        return start, stop
+
+    def search(self, terms, mode="and", low=None, high=None):
+        """Rows matching every (mode "and") or any (mode "or") of the (word, side) terms."""
+        if not terms:
+            return np.empty(0, dtype=np.int32)
+        # Smallest lists first keeps every intersection as short as possible
+        lists = sorted((self.rows(word, side) for word, side in terms), key=len)
+        result = lists[0]
+        for rows in lists[1:]:
+            if mode == "and":
+                if len(result) == 0:
+                    break
+                result = np.intersect1d(result, rows, assume_unique=True)
+            else:
+                result = np.union1d(result, rows)
+        start, stop = self.row_range(low, high)
+        return result[np.searchsorted(result, start):np.searchsorted(result, stop)]
+
+    def keys(self, rows):
+        return pd.to_datetime(self.timestamps[rows])
+
+
+class KeywordIndexCache:
+    """The latest KeywordIndex of one variant, kept up to date like InteractionStore.
+
+    `load(ranges)` returns (timestamps, query ids, response ids) of the rows in the
+    inclusive display-time ranges, every row when `ranges` is None. A new data version
+    only loads the rows past the index's watermark and the ranges marked touched since.
+    """
+
+    def __init__(self, load, vocabulary):
+        self.load = load
+        self.vocabulary = vocabulary
+        self.index = None
+        self.version = None
+        self._touched = []
+        self._lock = threading.RLock()
+
+    def mark_touched(self, keys):
+        keys = pd.to_datetime(pd.Series(keys), errors="coerce", format="mixed").dropna()
+        if len(keys) > 0:
+            with self._lock:
+                self._touched.append((keys.min(), keys.max()))
+
+    def reset(self):
+        with self._lock:
+            self.index = None
+            self.version = None
+            self._touched = []
+
+    def get(self, version):
+        with self._lock:
+            if self.index is not None and self.version == version:
+                return self.index
+            self.vocabulary.sync()
+            watermark = self.index.watermark if self.index is not None else None
+            if watermark is None:
+                self.index = KeywordIndex(*self.load(None), self.vocabulary)
+            else:
+                ranges = [(watermark + KEY_RESOLUTION, None)]
+                ranges += [(low, min(high, watermark)) for low, high in self._touched if low <= watermark]
+                self.index = self.index.merge(*self.load(ranges), self.vocabulary)
+            self._touched = []
+            self.version = version
+            return self.index
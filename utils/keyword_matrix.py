@@ -0,0 +1,138 @@
+import re
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+
+TOKEN_PATTERN = r"\b\w+\b"
+# Texts are joined with a non-word separator and scanned in one regex pass
+SEPARATOR = "\x1f"
+TOKEN_OR_SEPARATOR = re.compile(rf"\w+|{SEPARATOR}")
+
+
+def explode_tokens(texts):
+    # (row, token) for every token of every text, the same tokens as common_utils.tokenize
+    texts = pd.Series(np.asarray(texts, dtype=object)).fillna("").astype(str)
+    if len(texts) == 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=object)
+    joined = SEPARATOR.join(texts.tolist())
+    if joined.count(SEPARATOR) != len(texts) - 1:
+        joined = SEPARATOR.join(texts.str.replace(SEPARATOR, " ", regex=False).tolist())
+    tokens = np.array(TOKEN_OR_SEPARATOR.findall(joined.lower()), dtype=object)
+    separators = tokens == SEPARATOR
+    rows = np.cumsum(separators)[~separators]
+    return rows.astype(np.int64), tokens[~separators]
+
+def incidence(rows, ids, n_rows, n_words):
+    # Row x word counts, repeated words in a text add up
+    return sparse.csr_matrix(
+        (np.ones(len(rows), dtype=np.int64), (rows, ids)), shape=(n_rows, n_words)
+    )
+
+
+class Vocabulary:
+    """Word <-> integer id, ids are handed out in first-seen order and never change."""
+
+    def __init__(self, words=()):
+        self.words = list(words)
+        self.ids = {word: i for i, word in enumerate(self.words)}
+
+    def __len__(self):
+        return len(self.words)
+
+    def lookup(self, tokens):
+        # Ids for a token array, new words are appended
+        codes, uniques = pd.factorize(tokens)
+        unique_ids = np.empty(len(uniques), dtype=np.int64)
+        for i, word in enumerate(uniques):
+            word_id = self.ids.get(word)
+            if word_id is None:
+                word_id = self.ids[word] = len(self.words)
+                self.words.append(word)
+            unique_ids[i] = word_id
+        return unique_ids[codes]
+
+    def array(self):
+        return np.asarray(self.words, dtype=object)
+
+
+def cooccurrence(query_texts, response_texts, vocabulary=None):
+    """Response-word x query-word counts over one shared vocabulary, as R^T Q.
+
+    Entry (r, q) is the sum over rows of count(q in query) * count(r in response),
+    the same numbers the old Counter loop produced. Pass a `vocabulary` to keep ids
+    stable across calls.
+    """
+    vocabulary = vocabulary if vocabulary is not None else Vocabulary()
+    n_rows = len(query_texts)
+    q_rows, q_tokens = explode_tokens(query_texts)
+    r_rows, r_tokens = explode_tokens(response_texts)
+    ids = vocabulary.lookup(np.concatenate([q_tokens, r_tokens]))
+    Q = incidence(q_rows, ids[:len(q_rows)], n_rows, len(vocabulary))
+    R = incidence(r_rows, ids[len(q_rows):], n_rows, len(vocabulary))
+    return (R.T @ Q).tocsr(), vocabulary.array()
+
+def cooccurrence_ids(query_ids, response_ids, n_words):
+    # cooccurrence() over token ids stored at ingest (token_ids.TokenArrays), no text is read
+    n_rows = len(query_ids)
+    Q = incidence(query_ids.row_ids(), query_ids.ids, n_rows, n_words)
+    R = incidence(response_ids.row_ids(), response_ids.ids, n_rows, n_words)
+    return (R.T @ Q).tocsr()
+
+
+class KeywordMatrix:
+    """Sparse co-occurrence counts with rows (response words) and columns (query words)
+    sorted by their totals, all-zero rows and columns dropped.
+
+    Only the slices the pages show are ever made dense: `frame(n_rows, n_cols)` for the
+    table, `top_query_words(k)`/`top_response_words(k)` for the bars. `neighbours()`
+    reads one word's row or column for the node graph.
+    """
+
+    def __init__(self, matrix, vocab):
+        matrix = sparse.csr_matrix(matrix)
+        row_totals = np.asarray(matrix.sum(axis=1)).ravel()
+        col_totals = np.asarray(matrix.sum(axis=0)).ravel()
+        # Stable sort keeps first-seen order between words with equal totals
+        rows = np.flatnonzero(row_totals)[np.argsort(-row_totals[row_totals > 0], kind="stable")]
+        cols = np.flatnonzero(col_totals)[np.argsort(-col_totals[col_totals > 0], kind="stable")]
+        self.matrix = matrix[rows][:, cols].tocsr()
+        self.response_words = vocab[rows]
+        self.query_words = vocab[cols]
+        self.response_totals = row_totals[rows]
+        self.query_totals = col_totals[cols]
+        # Column-major copy so a query word's neighbours are one slice as well
+        self.by_column = self.matrix.tocsc()
+        self.positions = {
+            "q": {word: i for i, word in enumerate(self.query_words)},
+            "r": {word: i for i, word in enumerate(self.response_words)},
+        }
+
+    @property
+    def shape(self):
+        return self.matrix.shape
+
+    def frame(self, n_rows=None, n_cols=None):
+        return pd.DataFrame(
+            self.matrix[:n_rows, :n_cols].toarray(),
+            index=self.response_words[:n_rows],
+            columns=self.query_words[:n_cols],
+        )
+
+    def top_query_words(self, k):
+        return pd.Series(self.query_totals[:k], index=self.query_words[:k])
+
+    def top_response_words(self, k):
+        return pd.Series(self.response_totals[:k], index=self.response_words[:k])
+
+    def words(self, side):
+        return self.query_words if side == "q" else self.response_words
+
+    def neighbours(self, side, word):
+        # (positions on the other side, counts) of the words co-occurring with `word`
+        position = self.positions[side].get(word)
+        if position is None:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+        matrix = self.by_column if side == "q" else self.matrix
+        start, stop = matrix.indptr[position], matrix.indptr[position + 1]
+        return matrix.indices[start:stop], matrix.data[start:stop]
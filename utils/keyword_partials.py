@@ -0,0 +1,112 @@
+import os
+import fcntl
+import threading
+from contextlib import contextmanager
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from utils.keyword_matrix import cooccurrence_ids
+
+
+def day_key(day):
+    return pd.Timestamp(day).strftime("%Y-%m-%d")
+
+
+class KeywordPartials:
+    """Per-day keyword co-occurrence matrices, one sparse .npz file per day.
+
+    Word ids are the token ids stored with every row (the token_vocab table). They never
+    change, so partials written on different days line up and any date range is the sum
+    of its days. Days whose rows changed are collected by `mark_touched()`, dropped by
+    `invalidate()` once the new rows are readable and rebuilt by the next `add_days()`.
+    """
+
+    def __init__(self, directory, vocabulary):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.vocabulary = vocabulary
+        self._loaded = {}
+        self._touched = set()
+        self._lock = threading.RLock()
+
+    def _path(self, day):
+        return os.path.join(self.directory, f"{day_key(day)}.npz")
+
+    @contextmanager
+    def _file_lock(self):
+        # Another process may be adding days to the same directory
+        with open(os.path.join(self.directory, "lock"), "w") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def missing(self, days):
+        return [day for day in days if not os.path.exists(self._path(day))]
+
+    def add_days(self, days, timestamps, query_ids, response_ids):
+        # Every listed day gets a partial, an empty one if it has no rows
+        day_of_row = pd.Series(pd.to_datetime(timestamps)).dt.strftime("%Y-%m-%d").to_numpy()
+        with self._lock, self._file_lock():
+            n_words = max(len(self.vocabulary), int(query_ids.ids.max(initial=0)) + 1, int(response_ids.ids.max(initial=0)) + 1)
+            for day in days:
+                rows = day_of_row == day_key(day)
+                matrix = cooccurrence_ids(query_ids.take(rows), response_ids.take(rows), n_words)
+                sparse.save_npz(self._path(day) + ".tmp.npz", matrix)
+                os.replace(self._path(day) + ".tmp.npz", self._path(day))
+
+    def _read(self, day):
+        path = self._path(day)
+        try:
+            mtime = os.path.getmtime(path)
+        except FileNotFoundError:
+            return None
+        loaded = self._loaded.get(path)
+        if loaded is None or loaded[0] != mtime:
+            loaded = self._loaded[path] = (mtime, sparse.load_npz(path).tocoo())
+        return loaded[1]
+
+    def total(self, days):
+        """(matrix, words) summed over `days`, response words x query words."""
+        with self._lock:
+            self.vocabulary.sync()
+            parts = [part for part in (self._read(day) for day in days) if part is not None and part.nnz]
+            size = max([len(self.vocabulary)] + [part.shape[0] for part in parts])
+            if parts:
+                matrix = sparse.coo_matrix(
+                    (
+                        np.concatenate([part.data for part in parts]),
+                        (np.concatenate([part.row for part in parts]), np.concatenate([part.col for part in parts])),
+                    ),
+                    shape=(size, size),
+                ).tocsr()
+            else:
+                matrix = sparse.csr_matrix((size, size), dtype=np.int64)
+            words = self.vocabulary.array()
+            return matrix, np.concatenate([words, np.full(size - len(words), "", dtype=object)])
+
+    def mark_touched(self, timestamps):
+        days = pd.to_datetime(pd.Series(timestamps), errors="coerce", format="mixed").dropna().dt.floor("D")
+        with self._lock:
+            self._touched.update(day_key(day) for day in days.unique())
+
+    def pop_touched(self):
+        with self._lock:
+            touched, self._touched = sorted(self._touched), set()
+        return touched
+
+    def invalidate(self, days):
+        with self._lock:
+            for day in days:
+                path = self._path(day)
+                if os.path.exists(path):
+                    os.remove(path)
+                self._loaded.pop(path, None)
+
+    def clear(self):
+        with self._lock, self._file_lock():
+            for name in os.listdir(self.directory):
+                if name != "lock":
+                    os.remove(os.path.join(self.directory, name))
+            self._loaded = {}
@@ -1,126 +1,97 @@
 import numpy as np
+import pandas as pd
 import streamlit as st
 import time
-from collections import Counter
 from sklearn.cluster import KMeans
-from sklearn.metrics.pairwise import cosine_similarity
-from utils.common_utils import  return_keyword_df, time_func
-
-
-def most_central_sentences(data, clusters, embeddings, option):
-    representatives = {}
-    for cluster in set(clusters):
-        cluster_mask = clusters == cluster
-        cluster_embeddings = embeddings[cluster_mask]
-        if option == 'q':
-            cluster_sentences = data.loc[cluster_mask, 'user_query'].tolist()
-        elif option =='r':
-            cluster_sentences = data.loc[cluster_mask, 'response'].tolist()
-        
-        # Calculate centroid
-        centroid = np.mean(cluster_embeddings, axis=0)
-        
-        # Find the sentence closest to the centroid
-        similarities = cosine_similarity([centroid], cluster_embeddings)[0]
-        representative_idx = np.argmax(similarities)
-        
-        representatives[cluster] = cluster_sentences[representative_idx]
-    
-    return representatives
-
-def most_frequent_sentences(data, clusters, option):
-    representatives = {}
-    for cluster in set(clusters):
-        if option == 'q':
-            cluster_sentences = data.loc[clusters == cluster, 'user_query'].tolist()
-        elif option == 'r':
-            cluster_sentences = data.loc[clusters == cluster, 'response'].tolist()
-        most_common = Counter(cluster_sentences).most_common(1)
-        representatives[cluster] = most_common[0][0] if most_common else None
-    
-    return representatives
-
-
-def shortest_sentences(data, clusters, option):
-    representatives = {}
-    for cluster in set(clusters):
-        if option == 'q':
-            cluster_sentences = data.loc[clusters == cluster, 'user_query'].tolist()
-        elif option == 'r':
-            cluster_sentences = data.loc[clusters == cluster, 'response'].tolist()
-        shortest = min(cluster_sentences, key=len)
-        representatives[cluster] = shortest
-    
-    return representatives
-
-
-def medoid_sentences(data, clusters, embeddings, option):
-    representatives = {}
-    for cluster in set(clusters):
-        cluster_mask = clusters == cluster
-        cluster_embeddings = embeddings[cluster_mask]
-        if option == 'q':
-            cluster_sentences = data.loc[cluster_mask, 'user_query'].tolist()
-        elif option == 'r':
-            cluster_sentences = data.loc[cluster_mask, 'response'].tolist()
-        
-        # Calculate pairwise similarities
-        similarities = cosine_similarity(cluster_embeddings)
-        
-        # Find the sentence with highest average similarity to others
-        medoid_idx = np.argmax(np.mean(similarities, axis=1))
-        
-        representatives[cluster] = cluster_sentences[medoid_idx]
-    
-    return representatives
+from utils.common_utils import  load_keyword_matrix, current_date_range, time_func
+from utils.data import get_embeddings, get_data_version
+from utils.cluster_model import CLUSTER_COLUMNS
+from utils.cluster_tree import ClusterTree
+from utils.representatives import representatives, REPRESENTATIVE_KINDS
+from utils.auto_k import recommend_k
+
+
+CLUSTERING_METHODS = ("K-means", "Cluster Tree", "Stored Model")
+
+
+def text_column(option):
+    return 'user_query' if option == 'q' else 'response'
+
+def unique_texts(data, option):
+    # Distinct texts in first-seen order: (texts, first row of each, row -> text, occurrences)
+    codes, texts = pd.factorize(data[text_column(option)].fillna(''))
+    first = np.unique(codes, return_index=True)[1]
+    return np.asarray(texts, dtype=object), first, codes, np.bincount(codes)
 
 
 @st.cache_data
-def get_representative_sentences(data, clusters, embeddings, option, representative_type):
-    if representative_type == "Most Central Sentence":
-        return most_central_sentences(data, clusters, embeddings, option)
-    elif representative_type == "Most Frequent Sentence":
-        return most_frequent_sentences(data, clusters, option)
-    elif representative_type == "Shortest Sentence":
-        return shortest_sentences(data, clusters, option)
-    elif representative_type == "Medoid Sentence":
-        return medoid_sentences(data, clusters, embeddings, option)
+def get_representative_sentences(texts, weights, clusters, embeddings, representative_type):
+    # Every cluster's representative in one pass over the rows sorted by label
+    return representatives(texts, weights, clusters, embeddings, REPRESENTATIVE_KINDS[representative_type])
     
 
 @time_func
 @st.cache_data
 def get_kmeans_clusters(option, data, n_clusters):
-    if option == "q":
-        embeddings = np.stack(data["query_embedding"].to_numpy())
-    elif option == "r":
-        embeddings = np.stack(data["response_embedding"].to_numpy())
-    
-    kmeans = KMeans(n_clusters=n_clusters, n_init=10, random_state=42)
-    clusters = kmeans.fit_predict(embeddings)
-    return clusters
-
-def calculate_keyword_data(data):
-    keyword_df = return_keyword_df(False, data)
-    top_5_q_words = keyword_df.sum(axis=0).sort_values(ascending=False).head(5)
-    top_5_r_words = keyword_df.sum(axis=1).sort_values(ascending=False).head(5)
-    return top_5_q_words, top_5_r_words
+    # Distinct texts weighted by their count, labels mapped back to every row
+    texts, first, codes, weights = unique_texts(data, option)
+    embeddings = get_embeddings(data.iloc[first], option)
 
-def calculate_kmeans_clustering(data, num_clusters, representative_type):
-    if len(data) < 12:
-        num_clusters = len(data)
-    data["q_k_cluster_label"] = get_kmeans_clusters("q", data, num_clusters)
-    data["r_k_cluster_label"] = get_kmeans_clusters("r", data, num_clusters)
+    kmeans = KMeans(n_clusters=min(n_clusters, len(first)), n_init=10, random_state=42)
+    clusters = kmeans.fit_predict(embeddings, sample_weight=weights)
+    return clusters[codes]
+
+@time_func
+@st.cache_resource(max_entries=8)
+def get_cluster_tree(option, _data, version, date_range, n_rows):
+    # Built once per (data version, range), every k is a cut of the same tree
+    texts, first, codes, weights = unique_texts(_data, option)
+    return ClusterTree(get_embeddings(_data.iloc[first], option), sample_weight=weights), codes
+
+def get_clusters(option, data, n_clusters, method):
+    if method == "Stored Model":
+        # Labels assigned at ingest, rows uploaded before the first fit are -1
+        return data[CLUSTER_COLUMNS[option]].fillna(-1).astype(int).to_numpy()
+    if method == "Cluster Tree":
+        tree, codes = get_cluster_tree(option, data, get_data_version(), current_date_range(), len(data))
+        return tree.labels(n_clusters)[codes]
+    return get_kmeans_clusters(option, data, n_clusters)
 
-    q_embeddings = np.stack(data["query_embedding"].to_numpy())
-    r_embeddings = np.stack(data["response_embedding"].to_numpy())
+@time_func
+@st.cache_data(max_entries=16)
+def get_auto_k(option, _data, version, date_range, n_rows):
+    # Per (data version, range); days are the strata so every day of the range is sampled
+    days = _data["timestamp"].dt.floor("D").to_numpy()
+    return recommend_k(get_embeddings(_data, option), days)
+
+def auto_k(data):
+    # {side: (recommended k, score curve)}
+    key = (get_data_version(), current_date_range(), len(data))
+    return {option: get_auto_k(option, data, *key) for option in ("q", "r")}
+
+def cluster_representatives(data, option, clusters, representative_type):
+    texts, first, codes, weights = unique_texts(data, option)
+    # Rows with the same text share a label, so the first row's label is the text's
+    embeddings = get_embeddings(data.iloc[first], option) if REPRESENTATIVE_KINDS[representative_type] in ("central", "medoid") else None
+    return get_representative_sentences(texts, weights, np.asarray(clusters)[first], embeddings, representative_type)
+
+def calculate_keyword_data():
+    keyword_matrix = load_keyword_matrix(False)
+    top_5_q_words = keyword_matrix.top_query_words(5)
+    top_5_r_words = keyword_matrix.top_response_words(5)
+    return top_5_q_words, top_5_r_words
 
-    q_representative_sentences = get_representative_sentences(
-        data, data["q_k_cluster_label"], q_embeddings, "q", representative_type
-    )
+def calculate_kmeans_clustering(data, num_clusters, representative_type, method=CLUSTERING_METHODS[0]):
+    # num_clusters is one k for both sides or a {side: k} dict, e.g. from auto_k
+    if not isinstance(num_clusters, dict):
+        num_clusters = {"q": num_clusters, "r": num_clusters}
+    if len(data) < 12:
+        num_clusters = {option: min(k, len(data)) for option, k in num_clusters.items()}
+    data["q_k_cluster_label"] = get_clusters("q", data, num_clusters["q"], method)
+    data["r_k_cluster_label"] = get_clusters("r", data, num_clusters["r"], method)
 
-    r_representative_sentences = get_representative_sentences(
-        data, data["r_k_cluster_label"], r_embeddings, "r", representative_type
-    )
+    q_representative_sentences = cluster_representatives(data, "q", data["q_k_cluster_label"], representative_type)
+    r_representative_sentences = cluster_representatives(data, "r", data["r_k_cluster_label"], representative_type)
 
     return q_representative_sentences, r_representative_sentences
 
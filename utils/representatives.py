@@ -0,0 +1,90 @@
+import numpy as np
+from scipy import sparse
+from utils.similarity import normalize, rowwise_dot, pairwise_blocks
+
+
+# "closed_form" scores every medoid candidate against its normalized cluster sum, "blocked"
+# computes the pairwise similarities cluster by cluster in blocks of at most the budget
+MEDOID_METHOD = "closed_form"
+MEDOID_MEMORY_BYTES = 256 << 20
+
+REPRESENTATIVE_KINDS = {
+    "Most Central Sentence": "central",
+    "Most Frequent Sentence": "frequent",
+    "Shortest Sentence": "shortest",
+    "Medoid Sentence": "medoid",
+}
+
+
+class Segments:
+    """Rows grouped by cluster label with one stable sort, row order kept inside a cluster."""
+
+    def __init__(self, labels):
+        self.clusters, self.dense = np.unique(np.asarray(labels), return_inverse=True)
+        self.order = np.argsort(self.dense, kind="stable")
+        self.starts = np.searchsorted(self.dense[self.order], np.arange(len(self.clusters)))
+        self.sizes = np.diff(np.append(self.starts, len(self.order)))
+
+    def indicator(self, weights):
+        # (clusters x rows) sparse matrix of row weights, `indicator @ X` sums X per cluster
+        return sparse.csr_matrix(
+            (np.asarray(weights, dtype=np.float64), (self.dense, np.arange(len(self.dense)))),
+            shape=(len(self.clusters), len(self.dense)),
+        )
+
+    def argmax(self, scores):
+        # Row with the highest score in every cluster, the first one on ties like np.argmax
+        scores = np.nan_to_num(np.asarray(scores, dtype=np.float64)[self.order], nan=-np.inf)
+        best = np.maximum.reduceat(scores, self.starts)
+        hits = np.flatnonzero(scores == np.repeat(best, self.sizes))
+        segment = np.searchsorted(self.starts, hits, side="right") - 1
+        first = np.unique(segment, return_index=True)[1]
+        return self.order[hits[first]]
+
+
+def central_scores(segments, embeddings, weights):
+    # Cosine to the weighted cluster centroid
+    centroids = np.asarray(segments.indicator(weights) @ np.asarray(embeddings, dtype=np.float64))
+    return rowwise_dot(normalize(embeddings), normalize(centroids), segments.dense)
+
+def medoid_scores(segments, embeddings, weights, method=MEDOID_METHOD, memory_bytes=MEDOID_MEMORY_BYTES):
+    """Weighted sum of cosine similarities to every row of the same cluster.
+
+    The sum over j of w_j * (u_i . u_j) is u_i . (sum over j of w_j * u_j), so the closed
+    form needs one cluster sum per cluster and one dot product per row, O(n d). The
+    blocked form computes the same sums from explicit similarity blocks of at most
+    `memory_bytes`, for checking the closed form or when exact pairwise values are wanted.
+    """
+    normalized = normalize(embeddings)
+    weights = np.asarray(weights, dtype=np.float64)
+    if method == "closed_form":
+        sums = np.asarray(segments.indicator(weights) @ normalized.astype(np.float64))
+        return rowwise_dot(normalized, sums, segments.dense)
+    scores = np.empty(len(normalized), dtype=np.float64)
+    for start, size in zip(segments.starts, segments.sizes):
+        members = segments.order[start:start + size]
+        vectors = normalized[members]
+        for offset, block in pairwise_blocks(vectors, memory_bytes=memory_bytes, normalized=True):
+            scores[members[offset:offset + len(block)]] = block @ weights[members]
+    return scores
+
+def representatives(texts, weights, labels, embeddings, kind, method=MEDOID_METHOD, memory_bytes=MEDOID_MEMORY_BYTES):
+    """{cluster label: representative text} for one representative kind, in one segmented pass.
+
+    `texts` are distinct texts and `weights` how often each occurs, see
+    queries_and_responses_utils.unique_texts.
+    """
+    texts = np.asarray(texts, dtype=object)
+    weights = np.asarray(weights, dtype=np.float64)
+    segments = Segments(labels)
+    if kind == "central":
+        scores = central_scores(segments, embeddings, weights)
+    elif kind == "frequent":
+        scores = weights
+    elif kind == "shortest":
+        scores = -np.fromiter((len(text) for text in texts), dtype=np.int64, count=len(texts))
+    elif kind == "medoid":
+        scores = medoid_scores(segments, embeddings, weights, method, memory_bytes)
+    else:
+        raise ValueError(f"Unknown representative kind: {kind}")
+    return dict(zip(segments.clusters.tolist(), texts[segments.argmax(scores)]))
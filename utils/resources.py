@@ -0,0 +1,53 @@
+import time
+import threading
+
+
+class ResourceRegistry:
+    """Heavy process-wide resources (DB connection, JVM analyzers, models) built on first use.
+
+    `override()` swaps in a ready-made object, e.g. a lightweight fake in tests, and
+    `timings()` reports how long each resource took to initialize.
+    """
+
+    def __init__(self):
+        self._factories = {}
+        self._instances = {}
+        self._timings = {}
+        self._lock = threading.RLock()
+
+    def register(self, name, factory):
+        self._factories[name] = factory
+
+    def get(self, name):
+        instance = self._instances.get(name)
+        if instance is not None:
+            return instance
+        with self._lock:
+            if name not in self._instances:
+                start_time = time.time()
+                self._instances[name] = self._factories[name]()
+                self._timings[name] = time.time() - start_time
+                print(f"Resource '{name}' took {self._timings[name]:.4f} seconds to initialize.")
+            return self._instances[name]
+
+    def override(self, name, instance):
+        with self._lock:
+            self._instances[name] = instance
+
+    def reset(self, name=None):
+        with self._lock:
+            if name is None:
+                self._instances.clear()
+                self._timings.clear()
+            else:
+                self._instances.pop(name, None)
+                self._timings.pop(name, None)
+
+    def is_loaded(self, name):
+        return name in self._instances
+
+    def timings(self):
+        return dict(self._timings)
+
+
+resources = ResourceRegistry()
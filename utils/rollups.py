@@ -0,0 +1,81 @@
+import pandas as pd
+import streamlit as st
+from utils.interaction_store import format_timestamp
+
+
+# Hourly buckets in KST (the dashboard's time zone), maintained by process_chunk
+ROLLUP_TABLE = "twinnydb.interactions_hourly"
+ROLLUP_OFFSET_HOURS = 9
+
+CREATE_ROLLUP_TABLE = f"""
+CREATE TABLE IF NOT EXISTS {ROLLUP_TABLE} (
+    date DATE NOT NULL,
+    hour TINYINT NOT NULL,
+    query_count INT NOT NULL,
+    latency_sum DOUBLE,
+    latency_count INT NOT NULL,
+    latency_min DOUBLE,
+    latency_max DOUBLE,
+    PRIMARY KEY (date, hour)
+);
+"""
+
+
+def rollup_upsert_query(where=None):
+    # Recomputing whole buckets from interactions_all keeps re-uploaded rows from being counted twice
+    local_ts = f"timestamp + INTERVAL {ROLLUP_OFFSET_HOURS} HOUR"
+    return f"""
+    INSERT INTO {ROLLUP_TABLE}
+    (date, hour, query_count, latency_sum, latency_count, latency_min, latency_max)
+    SELECT DATE({local_ts}), HOUR({local_ts}), COUNT(*), SUM(latency), COUNT(latency), MIN(latency), MAX(latency)
+    FROM twinnydb.interactions_all
+    {f"WHERE {where}" if where else ""}
+    GROUP BY DATE({local_ts}), HOUR({local_ts})
+    ON DUPLICATE KEY UPDATE
+    query_count = VALUES(query_count), latency_sum = VALUES(latency_sum), latency_count = VALUES(latency_count),
+    latency_min = VALUES(latency_min), latency_max = VALUES(latency_max);
+    """
+
+
+@st.cache_resource
+def ensure_rollup_table(_db):
+    _db.send_query(CREATE_ROLLUP_TABLE)
+    # Backfill once for data uploaded before the rollups existed
+    existing = _db.send_query(f"SELECT COUNT(*) AS n FROM {ROLLUP_TABLE}")
+    if len(existing) == 0 or int(existing.iloc[0]["n"]) == 0:
+        _db.send_query(rollup_upsert_query())
+    return True
+
+
+def update_rollups(db, timestamps):
+    timestamps = pd.to_datetime(pd.Series(timestamps), errors="coerce", format="mixed").dropna()
+    if len(timestamps) == 0:
+        return
+    ensure_rollup_table(db)
+    low = timestamps.min().floor("h")
+    high = timestamps.max().floor("h") + pd.Timedelta(hours=1)
+    db.send_query(rollup_upsert_query(
+        f"timestamp >= '{format_timestamp(low)}' AND timestamp < '{format_timestamp(high)}'"
+    ))
+
+
+def clear_rollups(db):
+    ensure_rollup_table(db)
+    db.send_query(f"TRUNCATE TABLE {ROLLUP_TABLE};")
+
+
+@st.cache_data
+def get_rollups(_db, start, end, version):
+    # At most 24 rows per day, whatever the number of interactions
+    ensure_rollup_table(_db)
+    rollups = _db.send_query(f"""
+    SELECT date, hour, query_count, latency_sum, latency_count, latency_min, latency_max
+    FROM {ROLLUP_TABLE}
+    WHERE date BETWEEN '{pd.Timestamp(start):%Y-%m-%d}' AND '{pd.Timestamp(end):%Y-%m-%d}'
+    ORDER BY date, hour;
+    """)
+    if len(rollups) == 0:
+        return pd.DataFrame(columns=["date", "hour", "query_count", "latency_sum", "latency_count", "latency_min", "latency_max"])
+    rollups["date"] = pd.to_datetime(rollups["date"])
+    rollups["hour"] = rollups["hour"].astype(int)
+    return rollups
@@ -0,0 +1,63 @@
+import numpy as np
+
+
+ROW_BLOCK = 65536
+# Largest similarity block a pairwise kernel materializes at once
+MEMORY_BYTES = 256 << 20
+
+
+def normalize(embeddings):
+    # L2-normalized float32 rows, all-zero rows stay zero like in sklearn's cosine_similarity
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+    return embeddings / np.where(norms > 0, norms, 1)
+
+def rowwise_dot(rows, vectors, index=None, block=ROW_BLOCK):
+    # rows[i] . vectors[index[i]] (vectors[i] without an index), a block of rows at a time
+    out = np.empty(len(rows), dtype=np.float64)
+    for start in range(0, len(rows), block):
+        stop = start + block
+        other = vectors[start:stop] if index is None else vectors[index[start:stop]]
+        out[start:stop] = np.einsum("ij,ij->i", rows[start:stop], other)
+    return out
+
+def rowwise_cosine(a, b, block=ROW_BLOCK):
+    """cos(a[i], b[i]) for every row, O(n d) time and one block of temporaries.
+
+    The diagonal of cosine_similarity(a, b) without the n x n matrix around it. Works on
+    memory-mapped matrices (e.g. the embedding store), only one block is read at a time.
+    """
+    out = np.empty(len(a), dtype=np.float32)
+    for start in range(0, len(a), block):
+        x = normalize(a[start:start + block])
+        y = normalize(b[start:start + block])
+        out[start:start + block] = np.einsum("ij,ij->i", x, y)
+    return out
+
+def block_rows(n_columns, memory_bytes=MEMORY_BYTES, itemsize=4):
+    return max(1, int(memory_bytes // max(1, n_columns * itemsize)))
+
+def pairwise_blocks(a, b=None, memory_bytes=MEMORY_BYTES, normalized=False):
+    # (start, cosine block of a[start:stop] against b), no block larger than memory_bytes
+    a = a if normalized else normalize(a)
+    b = a if b is None else (b if normalized else normalize(b))
+    step = block_rows(len(b), memory_bytes)
+    for start in range(0, len(a), step):
+        yield start, a[start:start + step] @ b.T
+
+def pairwise_cosine(a, b=None, memory_bytes=MEMORY_BYTES):
+    # Full cosine matrix, for small sets; temporaries stay within the block budget
+    a = normalize(a)
+    b = a if b is None else normalize(b)
+    out = np.empty((len(a), len(b)), dtype=np.float32)
+    for start, block in pairwise_blocks(a, b, memory_bytes, normalized=True):
+        out[start:start + len(block)] = block
+    return out
+
+def upper_triangle(a, memory_bytes=MEMORY_BYTES):
+    # Pairwise cosines above the diagonal, in np.triu_indices(len(a), k=1) order
+    parts = []
+    for start, block in pairwise_blocks(a, memory_bytes=memory_bytes):
+        rows, cols = np.triu_indices(len(block), k=start + 1, m=block.shape[1])
+        parts.append(block[rows, cols])
+    return np.concatenate(parts) if parts else np.empty(0, dtype=np.float32)
@@ -0,0 +1,125 @@
+import numpy as np
+import pandas as pd
+import streamlit as st
+from utils.interaction_store import format_timestamp
+
+
+# Query-response cosine similarity of every interaction, written at ingest
+SIMILARITY_COLUMN = "similarity_score"
+
+# Fixed bins of 0.01 over [-1, 1] per KST day, maintained by write_chunk. Every coherence
+# threshold is a bin edge, so category counts are exact sums of bins.
+HISTOGRAM_TABLE = "twinnydb.similarity_daily"
+HISTOGRAM_OFFSET_HOURS = 9
+BIN_WIDTH = 0.01
+BIN_LOW = -1.0
+N_BINS = 200
+
+CREATE_HISTOGRAM_TABLE = f"""
+CREATE TABLE IF NOT EXISTS {HISTOGRAM_TABLE} (
+    date DATE NOT NULL,
+    bin SMALLINT NOT NULL,
+    count INT NOT NULL,
+    score_sum DOUBLE NOT NULL,
+    PRIMARY KEY (date, bin)
+);
+"""
+
+
+def bin_sql(column=SIMILARITY_COLUMN):
+    # Rounded before the floor so a score sitting on an edge is not pushed into the bin below
+    raw = f"FLOOR(ROUND(({column} - ({BIN_LOW})) / {BIN_WIDTH}, 6))"
+    return f"LEAST({N_BINS - 1}, GREATEST(0, {raw}))"
+
+def histogram_insert_query(where=None):
+    local_ts = f"timestamp + INTERVAL {HISTOGRAM_OFFSET_HOURS} HOUR"
+    conditions = " AND ".join(c for c in [f"{SIMILARITY_COLUMN} IS NOT NULL", where] if c)
+    return f"""
+    INSERT INTO {HISTOGRAM_TABLE} (date, bin, count, score_sum)
+    SELECT DATE({local_ts}), {bin_sql()}, COUNT(*), SUM({SIMILARITY_COLUMN})
+    FROM twinnydb.interactions_all
+    WHERE {conditions}
+    GROUP BY DATE({local_ts}), {bin_sql()}
+    ON DUPLICATE KEY UPDATE count = VALUES(count), score_sum = VALUES(score_sum);
+    """
+
+
+@st.cache_resource
+def ensure_similarity_column(_db):
+    existing = _db.send_query("SHOW COLUMNS FROM twinnydb.interactions_all")
+    names = set(existing["Field"]) if len(existing) else set()
+    if SIMILARITY_COLUMN in names:
+        return False
+    _db.send_query(f"ALTER TABLE twinnydb.interactions_all ADD COLUMN {SIMILARITY_COLUMN} DOUBLE NULL")
+    return True
+
+@st.cache_resource
+def ensure_histogram_table(_db):
+    _db.send_query(CREATE_HISTOGRAM_TABLE)
+    # Backfill once for rows scored before the histogram existed
+    existing = _db.send_query(f"SELECT COUNT(*) AS n FROM {HISTOGRAM_TABLE}")
+    if len(existing) == 0 or int(existing.iloc[0]["n"]) == 0:
+        _db.send_query(histogram_insert_query())
+    return True
+
+
+def update_similarity_histogram(db, timestamps):
+    # Whole KST days are rebuilt, a re-uploaded row whose score moved bins leaves nothing stale behind
+    timestamps = pd.to_datetime(pd.Series(timestamps), errors="coerce", format="mixed").dropna()
+    if len(timestamps) == 0:
+        return
+    ensure_histogram_table(db)
+    offset = pd.Timedelta(hours=HISTOGRAM_OFFSET_HOURS)
+    first = (timestamps.min() + offset).normalize()
+    last = (timestamps.max() + offset).normalize()
+    low = first - offset
+    high = last + pd.Timedelta(days=1) - offset
+    db.send_query(f"DELETE FROM {HISTOGRAM_TABLE} WHERE date BETWEEN '{first:%Y-%m-%d}' AND '{last:%Y-%m-%d}';")
+    db.send_query(histogram_insert_query(
+        f"timestamp >= '{format_timestamp(low)}' AND timestamp < '{format_timestamp(high)}'"
+    ))
+
+def clear_similarity_histogram(db):
+    ensure_histogram_table(db)
+    db.send_query(f"TRUNCATE TABLE {HISTOGRAM_TABLE};")
+
+
+@st.cache_data
+def get_similarity_histogram(_db, start, end, version):
+    # The day histograms of the range summed per bin, N_BINS rows whatever the number of interactions
+    ensure_histogram_table(_db)
+    summed = _db.send_query(f"""
+    SELECT bin, SUM(count) AS count, SUM(score_sum) AS score_sum
+    FROM {HISTOGRAM_TABLE}
+    WHERE date BETWEEN '{pd.Timestamp(start):%Y-%m-%d}' AND '{pd.Timestamp(end):%Y-%m-%d}'
+    GROUP BY bin;
+    """)
+    histogram = pd.DataFrame({"bin": np.arange(N_BINS), "count": 0, "score_sum": 0.0})
+    if len(summed) > 0:
+        bins = summed["bin"].astype(int).to_numpy()
+        histogram.loc[bins, "count"] = summed["count"].astype(np.int64).to_numpy()
+        histogram.loc[bins, "score_sum"] = summed["score_sum"].astype(float).to_numpy()
+    histogram["low"] = np.round(BIN_LOW + histogram["bin"] * BIN_WIDTH, 2)
+    histogram["high"] = np.round(histogram["low"] + BIN_WIDTH, 2)
+    return histogram
+
+
+def histogram_mean(histogram):
+    total = histogram["count"].sum()
+    return histogram["score_sum"].sum() / total if total else float("nan")
+
+def histogram_count(histogram, low=None, high=None):
+    # Rows scoring in [low, high), both ends must be bin edges
+    mask = np.ones(len(histogram), dtype=bool)
+    if low is not None:
+        mask &= histogram["low"].to_numpy() >= low - BIN_WIDTH / 2
+    if high is not None:
+        mask &= histogram["high"].to_numpy() <= high + BIN_WIDTH / 2
+    return int(histogram.loc[mask, "count"].sum())
+
+def coarsen_histogram(histogram, bin_width):
+    # Merge neighbouring fixed bins for display, bin_width a multiple of BIN_WIDTH
+    factor = max(1, int(round(bin_width / BIN_WIDTH)))
+    group = histogram["bin"].to_numpy() // factor
+    coarse = histogram.groupby(group).agg(count=("count", "sum"), score_sum=("score_sum", "sum"), low=("low", "min"), high=("high", "max"))
+    return coarse.reset_index(drop=True)
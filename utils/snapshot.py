@@ -0,0 +1,371 @@
+import os
+import json
+import fcntl
+import threading
+from contextlib import contextmanager
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.ipc as ipc
+from utils.embedding_codec import decode_embeddings, decode_embedding
+
+
+EMBEDDING_COLUMNS = ("query_embedding", "response_embedding")
+TEXT_COLUMNS = ("user_query", "response", "query_stemmed_words", "response_stemmed_words", "status")
+# Parts beyond the full-size ones allowed before the small ones are merged
+MAX_PARTS = 16
+BATCH_ROWS = 65536
+# A rewrite only touches the parts it overlaps, so parts are capped at this many rows
+PART_ROWS = BATCH_ROWS
+
+
+def embedding_matrix(values):
+    # Raw DB blobs, per-row arrays or an (n, d) matrix all end up as one float32 matrix
+    if isinstance(values, np.ndarray) and values.ndim == 2:
+        return values.astype(np.float32, copy=False)
+    values = list(values)
+    blobs = (bytes, bytearray, memoryview)
+    if len(values) and all(isinstance(v, blobs) for v in values):
+        return decode_embeddings(values)
+    return np.stack([
+        decode_embedding(v) if isinstance(v, blobs) else np.asarray(v, dtype=np.float32)
+        for v in values
+    ])
+
+
+def overlaps(low, high, bounds):
+    start, end = bounds
+    return (end is None or pd.Timestamp(low) <= end) and (start is None or pd.Timestamp(high) >= start)
+
+
+def range_mask(timestamps, ranges):
+    mask = None
+    for start, end in ranges:
+        condition = pa.scalar(True)
+        if start is not None:
+            condition = pc.and_(condition, pc.greater_equal(timestamps, pa.scalar(pd.Timestamp(start), type=timestamps.type)))
+        if end is not None:
+            condition = pc.and_(condition, pc.less_equal(timestamps, pa.scalar(pd.Timestamp(end), type=timestamps.type)))
+        mask = condition if mask is None else pc.or_(mask, condition)
+    return mask
+
+
+def plain_strings(table):
+    # Dictionary columns back to strings, so tables with different dictionaries can be merged
+    for i, name in enumerate(table.column_names):
+        if pa.types.is_dictionary(table.schema.field(name).type):
+            table = table.set_column(i, name, pc.cast(table.column(name), pa.string()))
+    return table
+
+def encode_dictionaries(table):
+    # One dictionary per text column and part, as the IPC file format requires
+    for i, name in enumerate(table.column_names):
+        if name in TEXT_COLUMNS:
+            column = table.column(name)
+            if pa.types.is_dictionary(column.type):
+                column = pc.cast(column, pa.string())
+            table = table.set_column(i, name, pc.dictionary_encode(column.combine_chunks()))
+    return table
+
+
+class Snapshot:
+    """Local copy of interactions_all kept as compressed Arrow IPC parts.
+
+    Rows are stored as they come out of the DB (UTC timestamps, raw text). Text columns
+    are dictionary encoded and embeddings are fixed size float32 lists, so `read()` only
+    has to memory map the parts. Parts hold disjoint, ordered timestamp ranges of at most
+    PART_ROWS rows, and the manifest keeps the bounds of every record batch: a range read
+    only decompresses the batches it overlaps, and rows rewritten behind the watermark
+    only rewrite the parts they fall in. Writers in any process hold an exclusive file
+    lock, readers a shared one, so no reader sees a manifest whose parts are being removed.
+    """
+
+    def __init__(self, directory, compression="zstd"):
+        self.directory = directory
+        self.compression = compression
+        os.makedirs(directory, exist_ok=True)
+        self._touched = []
+        self._lock = threading.RLock()
+
+    def _manifest_path(self):
+        return os.path.join(self.directory, "manifest.json")
+
+    def manifest(self):
+        try:
+            with open(self._manifest_path()) as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def _write_manifest(self, manifest):
+        path = self._manifest_path()
+        with open(path + ".tmp", "w") as f:
+            json.dump(manifest, f)
+        os.replace(path + ".tmp", path)
+
+    @contextmanager
+    def _file_lock(self, shared=False):
+        # Several Streamlit processes can share the directory, like the embedding store
+        with open(os.path.join(self.directory, "lock"), "a") as f:
+            fcntl.flock(f, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    @property
+    def watermark(self):
+        manifest = self.manifest()
+        if manifest is None or manifest["watermark"] is None:
+            return None
+        return pd.Timestamp(manifest["watermark"])
+
+    def exists(self):
+        return self.manifest() is not None
+
+    def columns(self):
+        with self._file_lock(shared=True):
+            manifest = self.manifest()
+            if manifest is None or not manifest["parts"]:
+                return []
+            with pa.memory_map(os.path.join(self.directory, manifest["parts"][0]["name"]), "r") as source:
+                return ipc.open_file(source).schema.names
+
+    def mark_touched(self, keys):
+        keys = pd.to_datetime(pd.Series(keys), errors="coerce", format="mixed").dropna()
+        if len(keys) > 0:
+            with self._lock:
+                self._touched.append((keys.min(), keys.max()))
+
+    def pop_touched(self):
+        with self._lock:
+            touched, self._touched = self._touched, []
+        return touched
+
+    def invalidate(self):
+        with self._lock, self._file_lock():
+            for name in os.listdir(self.directory):
+                if name != "lock":
+                    os.remove(os.path.join(self.directory, name))
+            self._touched = []
+
+    def _read_table(self, columns=None, ranges=None):
+        with self._file_lock(shared=True):
+            manifest = self.manifest()
+            if manifest is None or not manifest["parts"]:
+                return None
+            return self._read_parts(manifest["parts"], columns, ranges)
+
+    def _read_parts(self, parts, columns=None, ranges=None):
+        batches = []
+        for part in parts:
+            wanted = [
+                i for i, (low, high) in enumerate(part["batches"])
+                if ranges is None or any(overlaps(low, high, r) for r in ranges)
+            ]
+            if not wanted:
+                continue
+            with pa.memory_map(os.path.join(self.directory, part["name"]), "r") as source:
+                reader = ipc.open_file(source)
+                if columns is not None:
+                    # Only the selected columns are decompressed, the embeddings stay on disk
+                    names = reader.schema.names
+                    fields = [names.index(c) for c in columns if c in names]
+                    reader = ipc.open_file(source, options=ipc.IpcReadOptions(included_fields=fields))
+                for i in wanted:
+                    batches.append(pa.Table.from_batches([reader.get_batch(i)]))
+        if not batches:
+            return None
+        table = pa.concat_tables(batches, promote_options="permissive")
+        if ranges is not None:
+            table = table.filter(range_mask(table.column("timestamp"), ranges))
+        return table
+
+    def read(self, columns=None, ranges=None):
+        # Everything but the embeddings, decoded back to plain strings
+        table = self._read_table(columns, ranges)
+        if table is None:
+            return pd.DataFrame(columns=columns)
+        table = table.select([c for c in table.column_names if c not in EMBEDDING_COLUMNS])
+        return plain_strings(table).to_pandas()
+
+    def read_embeddings(self, ranges=None):
+        table = self._read_table(["timestamp", *EMBEDDING_COLUMNS], ranges)
+        if table is None or table.num_rows == 0:
+            return None
+        matrices = []
+        for name in EMBEDDING_COLUMNS:
+            column = table.column(name).combine_chunks()
+            dim = column.type.list_size
+            matrices.append(column.flatten().to_numpy(zero_copy_only=False).reshape(-1, dim))
+        return table.column("timestamp").to_pandas(), matrices[0], matrices[1]
+
+    def _to_table(self, data):
+        arrays, names = [], []
+        for name in data.columns:
+            values = data[name]
+            if name in EMBEDDING_COLUMNS:
+                matrix = embedding_matrix(values.to_numpy())
+                array = pa.FixedSizeListArray.from_arrays(pa.array(matrix.reshape(-1)), matrix.shape[1])
+            elif name in TEXT_COLUMNS:
+                array = pa.array(values.astype(object).where(values.notnull(), None), type=pa.string())
+            elif name == "timestamp":
+                array = pa.array(pd.to_datetime(values).astype("datetime64[us]"))
+            else:
+                array = pa.array(values.to_numpy() if values.dtype != object else values.tolist())
+            arrays.append(array)
+            names.append(name)
+        return pa.Table.from_arrays(arrays, names=names).sort_by("timestamp")
+
+    def _write_part(self, table, index):
+        name = f"part-{index:05d}.arrow"
+        path = os.path.join(self.directory, name)
+        table = encode_dictionaries(table)
+        options = ipc.IpcWriteOptions(compression=self.compression)
+        with pa.OSFile(path + ".tmp", "wb") as sink:
+            with ipc.new_file(sink, table.schema, options=options) as writer:
+                writer.write_table(table, max_chunksize=BATCH_ROWS)
+        os.replace(path + ".tmp", path)
+
+        timestamps = pd.Series(table.column("timestamp").to_pandas())
+        batches = [
+            [str(timestamps.iloc[start]), str(timestamps.iloc[min(start + BATCH_ROWS, len(timestamps)) - 1])]
+            for start in range(0, len(timestamps), BATCH_ROWS)
+        ]
+        return {"name": name, "rows": table.num_rows, "batches": batches}
+
+    def _write_parts(self, table, manifest):
+        # `table` sorted by timestamp, cut into parts of at most PART_ROWS rows
+        parts = []
+        for start in range(0, table.num_rows, PART_ROWS):
+            parts.append(self._write_part(table.slice(start, PART_ROWS), manifest["next_part"]))
+            manifest["next_part"] += 1
+        return parts
+
+    def _replace_parts(self, manifest, removed, added, watermark):
+        # The new manifest goes in before the old files go, readers hold the shared lock meanwhile
+        names = {part["name"] for part in removed}
+        parts = [part for part in manifest["parts"] if part["name"] not in names] + added
+        parts.sort(key=lambda part: pd.Timestamp(part["batches"][0][0]))
+        self._write_manifest({"parts": parts, "next_part": manifest["next_part"], "watermark": watermark})
+        for name in names:
+            os.remove(os.path.join(self.directory, name))
+
+    def write(self, data):
+        # Replace the snapshot with `data` (raw rows with every column)
+        with self._lock, self._file_lock():
+            manifest = self.manifest() or {"parts": [], "next_part": 0}
+            added = self._write_parts(self._to_table(data), manifest) if len(data) > 0 else []
+            watermark = str(pd.to_datetime(data["timestamp"]).max()) if len(data) else None
+            self._replace_parts(manifest, manifest["parts"], added, watermark)
+
+    def upsert(self, data):
+        if len(data) == 0:
+            return
+        with self._lock, self._file_lock():
+            manifest = self.manifest()
+            keys = pd.to_datetime(data["timestamp"])
+            if manifest is None or not manifest["parts"]:
+                manifest = manifest or {"parts": [], "next_part": 0}
+                self._replace_parts(manifest, manifest["parts"], self._write_parts(self._to_table(data), manifest), str(keys.max()))
+            elif manifest["watermark"] is None or keys.min() > pd.Timestamp(manifest["watermark"]):
+                added = self._write_parts(self._to_table(data), manifest)
+                self._replace_parts(manifest, [], added, str(keys.max()))
+                self._compact_if_needed()
+            else:
+                self._rewrite(manifest, data)
+
+    def patch(self, keys, values):
+        """Set columns of existing rows in place, e.g. cluster labels after a refit.
+
+        `values` maps column names to arrays aligned with `keys` (UTC timestamps). Only
+        the parts holding some of the keys are rewritten, nothing is fetched again.
+        """
+        order = np.argsort(pd.to_datetime(keys).to_numpy(dtype="datetime64[us]"), kind="stable")
+        keys = pd.to_datetime(keys).to_numpy(dtype="datetime64[us]")[order]
+        values = {name: np.asarray(column)[order] for name, column in values.items()}
+        if len(keys) == 0:
+            return
+        with self._lock, self._file_lock():
+            manifest = self.manifest()
+            if manifest is None or not manifest["parts"]:
+                return
+            removed, added = [], []
+            for part in manifest["parts"]:
+                low = np.datetime64(pd.Timestamp(part["batches"][0][0]), "us")
+                high = np.datetime64(pd.Timestamp(part["batches"][-1][1]), "us")
+                if np.searchsorted(keys, low) == np.searchsorted(keys, high, side="right"):
+                    continue
+                table = self._read_parts([part])
+                timestamps = table.column("timestamp").to_numpy()
+                positions = np.searchsorted(keys, timestamps).clip(max=len(keys) - 1)
+                found = keys[positions] == timestamps
+                if not found.any():
+                    continue
+                for name, column in values.items():
+                    new = pa.array(column[positions])
+                    if name in table.column_names:
+                        current = table.column(name).combine_chunks()
+                        if pa.types.is_null(current.type):
+                            current = current.cast(new.type)
+                        else:
+                            new = new.cast(current.type)
+                    else:
+                        current = pa.nulls(table.num_rows, new.type)
+                    merged = pc.if_else(pa.array(found), new, current)
+                    if name in table.column_names:
+                        table = table.set_column(table.column_names.index(name), name, merged)
+                    else:
+                        table = table.append_column(name, merged)
+                added += self._write_parts(table, manifest)
+                removed.append(part)
+            if removed:
+                self._replace_parts(manifest, removed, added, manifest["watermark"])
+
+    def _rewrite(self, manifest, data):
+        # Only the parts that overlap the incoming rows are read and written again
+        keys = pd.to_datetime(data["timestamp"])
+        low, high = keys.min(), keys.max()
+        affected = [
+            part for part in manifest["parts"]
+            if overlaps(part["batches"][0][0], part["batches"][-1][1], (low, high))
+        ]
+        incoming = plain_strings(self._to_table(data))
+        if affected:
+            old = plain_strings(self._read_parts(affected))
+            keep = pc.invert(pc.is_in(old.column("timestamp"), value_set=incoming.column("timestamp")))
+            incoming = incoming.select([c for c in old.column_names if c in incoming.column_names])
+            incoming = pa.concat_tables([old.filter(keep), incoming], promote_options="permissive").sort_by("timestamp")
+        watermark = max(pd.Timestamp(manifest["watermark"]), high) if manifest["watermark"] else high
+        self._replace_parts(manifest, affected, self._write_parts(incoming, manifest), str(watermark))
+
+    def _compact_if_needed(self):
+        manifest = self.manifest()
+        rows = sum(part["rows"] for part in manifest["parts"])
+        if len(manifest["parts"]) > MAX_PARTS + rows // PART_ROWS:
+            self._compact(manifest)
+
+    def compact(self):
+        with self._lock, self._file_lock():
+            manifest = self.manifest()
+            if manifest is not None and manifest["parts"]:
+                self._compact(manifest)
+
+    def _compact(self, manifest):
+        # Merge runs of neighbouring small parts into parts of at most PART_ROWS rows
+        groups, current, size = [], [], 0
+        for part in manifest["parts"]:
+            if current and size + part["rows"] > PART_ROWS:
+                groups.append(current)
+                current, size = [], 0
+            current.append(part)
+            size += part["rows"]
+        groups.append(current)
+        removed, added = [], []
+        for group in groups:
+            if len(group) > 1:
+                added += self._write_parts(plain_strings(self._read_parts(group)), manifest)
+                removed += group
+        if removed:
+            self._replace_parts(manifest, removed, added, manifest["watermark"])
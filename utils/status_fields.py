@@ -0,0 +1,93 @@
+import json
+import numpy as np
+import streamlit as st
+
+
+# Typed columns extracted from the status JSON at ingest, each tried path in order.
+# A new entry gets its own DOUBLE column, a backfill of the existing rows and a snapshot rebuild.
+STATUS_FIELDS = {
+    "location_x": [("location", "lat")],
+    "location_y": [("location", "lon")],
+    "battery": [("battery", "percentage"), ("battery", "level"), ("battery",)],
+}
+STATUS_COLUMNS = list(STATUS_FIELDS)
+
+
+def replace_nan(item):
+    if isinstance(item, dict):
+        return {k: replace_nan(v) for k, v in item.items()}
+    elif isinstance(item, list):
+        return [replace_nan(i) for i in item]
+    elif isinstance(item, float) and np.isnan(item):
+        return None
+    else:
+        return item
+
+def parse_status(status_str):
+    # Some robots log Python reprs with single quotes
+    if not isinstance(status_str, str):
+        return None
+    for text in (status_str, status_str.replace("'", '"')):
+        try:
+            status = json.loads(text)
+        except json.JSONDecodeError:
+            continue
+        return replace_nan(status) if isinstance(status, dict) else None
+    return None
+
+def clean_json_string(json_str):
+    # NaN is not valid JSON for MySQL, store it as null
+    if not isinstance(json_str, str):
+        return json_str
+    try:
+        return json.dumps(replace_nan(json.loads(json_str)))
+    except json.JSONDecodeError:
+        # If it's not valid JSON, return it as is
+        return json_str
+
+def status_value(status, paths):
+    for path in paths:
+        value = status
+        for key in path:
+            value = value.get(key) if isinstance(value, dict) else None
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            return float(value)
+    return np.nan
+
+def extract_status_columns(chunk):
+    # One json.loads per row at ingest, the archive keeps the cleaned JSON
+    parsed = [parse_status(value) for value in chunk["status"]]
+    chunk["status"] = [
+        json.dumps(status) if status is not None else clean_json_string(value)
+        for status, value in zip(parsed, chunk["status"])
+    ]
+    for column, paths in STATUS_FIELDS.items():
+        chunk[column] = np.array([status_value(status, paths) if status else np.nan for status in parsed], dtype=np.float64)
+    return chunk
+
+
+def status_number_sql(paths):
+    # Same lookup as status_value, for backfilling rows uploaded before the columns existed
+    status = "REPLACE(status, \"'\", '\"')"
+    extracts = []
+    for path in paths:
+        extract = f"JSON_EXTRACT({status}, '$.{'.'.join(path)}')"
+        extracts.append(f"IF(JSON_TYPE({extract}) IN ('INTEGER', 'UNSIGNED INTEGER', 'DOUBLE', 'DECIMAL'), {extract} + 0, NULL)")
+    return f"COALESCE({', '.join(extracts)})"
+
+@st.cache_resource
+def ensure_status_columns(_db):
+    existing = _db.send_query("SHOW COLUMNS FROM twinnydb.interactions_all")
+    names = set(existing["Field"]) if len(existing) else set()
+    missing = [column for column in STATUS_COLUMNS if column not in names]
+    if missing:
+        _db.send_query(
+            "ALTER TABLE twinnydb.interactions_all "
+            + ", ".join(f"ADD COLUMN {column} DOUBLE NULL" for column in missing)
+        )
+        assignments = ", ".join(f"{column} = {status_number_sql(STATUS_FIELDS[column])}" for column in missing)
+        _db.send_query(f"""
+        UPDATE twinnydb.interactions_all SET {assignments}
+        WHERE status IS NOT NULL AND JSON_VALID(REPLACE(status, "'", '"'));
+        """)
+    return missing
@@ -0,0 +1,113 @@
+import os
+import json
+import sqlite3
+import threading
+from collections import OrderedDict
+
+
+class StemCache:
+    """Token -> stems memo: an in-process LRU in front of an SQLite file.
+
+    The file persists across uploads and restarts and is shared by the ingest worker
+    processes, so a token only crosses into the JVM the first time any of them sees it.
+    New entries are buffered and written by `flush()`.
+    """
+
+    def __init__(self, path, capacity=200_000):
+        self.path = path
+        self.capacity = capacity
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._memory = OrderedDict()
+        self._pending = {}
+        self._lock = threading.RLock()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS stems (token TEXT PRIMARY KEY, stems TEXT NOT NULL)")
+        self._conn.commit()
+
+    def _remember(self, token, stems):
+        self._memory[token] = stems
+        self._memory.move_to_end(token)
+        if len(self._memory) > self.capacity:
+            self._memory.popitem(last=False)
+
+    def get(self, token):
+        with self._lock:
+            stems = self._memory.get(token)
+            if stems is not None:
+                self._memory.move_to_end(token)
+                self.hits += 1
+                return stems
+            row = self._conn.execute("SELECT stems FROM stems WHERE token = ?", (token,)).fetchone()
+            if row is None:
+                return None
+            stems = json.loads(row[0])
+            self._remember(token, stems)
+            self.disk_hits += 1
+            return stems
+
+    def put(self, token, stems):
+        with self._lock:
+            self._remember(token, stems)
+            self._pending[token] = stems
+
+    def stem(self, token, analyze):
+        stems = self.get(token)
+        if stems is None:
+            with self._lock:
+                self.misses += 1
+            stems = analyze(token)
+            self.put(token, stems)
+        return stems
+
+    def stem_many(self, tokens, analyze):
+        # analyze gets every distinct uncached token in one call and returns their stems in order
+        stems = {}
+        missing = []
+        distinct = dict.fromkeys(tokens)
+        for token in distinct:
+            cached = self.get(token)
+            if cached is None:
+                missing.append(token)
+            else:
+                stems[token] = cached
+        with self._lock:
+            # Repeats within the batch never reach the analyzer either
+            self.hits += len(tokens) - len(distinct)
+            self.misses += len(missing)
+        if missing:
+            for token, token_stems in zip(missing, analyze(missing)):
+                self.put(token, token_stems)
+                stems[token] = token_stems
+        return stems
+
+    def flush(self):
+        with self._lock:
+            if not self._pending:
+                return
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO stems (token, stems) VALUES (?, ?)",
+                [(token, json.dumps(stems, ensure_ascii=False)) for token, stems in self._pending.items()],
+            )
+            self._conn.commit()
+            self._pending = {}
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            self._pending = {}
+            self._conn.execute("DELETE FROM stems")
+            self._conn.commit()
+
+    def counts(self):
+        return {"hits": self.hits, "disk_hits": self.disk_hits, "misses": self.misses}
+
+    def stats(self):
+        counts = self.counts()
+        lookups = sum(counts.values())
+        counts["hit_rate"] = (counts["hits"] + counts["disk_hits"]) / lookups if lookups else None
+        counts["memory_entries"] = len(self._memory)
+        return counts
@@ -0,0 +1,141 @@
+import threading
+import numpy as np
+import pandas as pd
+import streamlit as st
+from utils.keyword_matrix import explode_tokens
+
+
+VOCAB_TABLE = "twinnydb.token_vocab"
+# Binary collation so the unique key compares words exactly, as the dict does
+CREATE_VOCAB_TABLE = f"""
+CREATE TABLE IF NOT EXISTS {VOCAB_TABLE} (
+    id INT NOT NULL AUTO_INCREMENT,
+    word VARCHAR(191) CHARACTER SET utf8mb4 COLLATE utf8mb4_bin NOT NULL,
+    PRIMARY KEY (id),
+    UNIQUE KEY uq_token_vocab_word (word)
+);
+"""
+MAX_WORD_LENGTH = 191
+
+# Token-id columns of interactions_all and the text column each one is built from
+TOKEN_COLUMNS = {
+    "query_token_ids": "user_query",
+    "response_token_ids": "response",
+    "query_stem_ids": "query_stemmed_words",
+    "response_stem_ids": "response_stemmed_words",
+}
+ID_DTYPE = np.dtype("<i4")
+
+
+class TokenVocabulary:
+    """Word <-> id, persisted in the token_vocab table so every process sees the same ids.
+
+    Ids never change once assigned. Id 0 is never used, it stands for tokens that are
+    not stored (longer than the column allows); ids skipped by concurrent inserts map
+    to "" as well.
+    """
+
+    def __init__(self, db):
+        self.db = db
+        self.words = [""]
+        self.ids = {}
+        self._lock = threading.RLock()
+        db.send_query(CREATE_VOCAB_TABLE)
+        self.sync()
+
+    def __len__(self):
+        return len(self.words)
+
+    def sync(self):
+        # Words added by other processes since the last call
+        with self._lock:
+            rows = self.db.send_query(
+                f"SELECT id, word FROM {VOCAB_TABLE} WHERE id >= {len(self.words)} ORDER BY id"
+            )
+            for word_id, word in zip(rows["id"].astype(int), rows["word"]) if len(rows) else ():
+                if isinstance(word, (bytes, bytearray)):
+                    word = word.decode("utf-8")
+                self.words.extend([""] * (word_id - len(self.words)))
+                self.words.append(word)
+                self.ids[word] = word_id
+
+    def lookup(self, tokens):
+        # Ids for a token array, unseen words are added to the table first
+        codes, uniques = pd.factorize(np.asarray(tokens, dtype=object))
+        new = [word for word in uniques if word not in self.ids and len(word) <= MAX_WORD_LENGTH]
+        if new:
+            with self._lock:
+                self.sync()
+                new = [word for word in new if word not in self.ids]
+                if new:
+                    self.db.manager.write_list_to_db(
+                        query=f"INSERT IGNORE INTO {VOCAB_TABLE} (word) VALUES (%s)",
+                        data=[[word] for word in new],
+                    )
+                    self.sync()
+        unique_ids = np.fromiter((self.ids.get(word, 0) for word in uniques), dtype=np.int64, count=len(uniques))
+        return unique_ids[codes]
+
+    def array(self):
+        return np.asarray(self.words, dtype=object)
+
+
+class TokenArrays:
+    """Token ids of many rows as one flat int32 array plus offsets, row i being
+    `ids[offsets[i]:offsets[i + 1]]`. Stored per row as little-endian int32 blobs."""
+
+    def __init__(self, ids, offsets):
+        self.ids = np.asarray(ids, dtype=np.int32)
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    @classmethod
+    def from_texts(cls, texts, vocabulary):
+        # The same tokens the keyword views always used, see keyword_matrix.explode_tokens
+        rows, tokens = explode_tokens(texts)
+        ids = vocabulary.lookup(tokens)
+        stored = ids > 0
+        rows, ids = rows[stored], ids[stored]
+        return cls(ids, np.searchsorted(rows, np.arange(len(texts) + 1)))
+
+    @classmethod
+    def from_blobs(cls, blobs):
+        # One join and one frombuffer for the whole column, NULL blobs are empty rows
+        blobs = [b"" if blob is None or (isinstance(blob, float) and np.isnan(blob)) else blob for blob in blobs]
+        lengths = np.fromiter((len(blob) // ID_DTYPE.itemsize for blob in blobs), dtype=np.int64, count=len(blobs))
+        ids = np.frombuffer(b"".join(blobs), dtype=ID_DTYPE)
+        return cls(ids, np.concatenate([[0], np.cumsum(lengths)]))
+
+    def blobs(self):
+        ids = self.ids.astype(ID_DTYPE, copy=False)
+        return [ids[start:stop].tobytes() for start, stop in zip(self.offsets[:-1], self.offsets[1:])]
+
+    def lengths(self):
+        return np.diff(self.offsets)
+
+    def row_ids(self):
+        # Row number of every token, aligned with `ids`
+        return np.repeat(np.arange(len(self), dtype=np.int64), self.lengths())
+
+    def take(self, positions):
+        # Rows by position or boolean mask, in the given order
+        positions = np.arange(len(self))[positions] if np.asarray(positions).dtype == bool else np.asarray(positions, dtype=np.int64)
+        lengths = self.lengths()[positions]
+        offsets = np.concatenate([[0], np.cumsum(lengths)])
+        gather = np.repeat(self.offsets[:-1][positions] - offsets[:-1], lengths) + np.arange(offsets[-1])
+        return TokenArrays(self.ids[gather], offsets)
+
+
+@st.cache_resource
+def ensure_token_columns(_db):
+    existing = _db.send_query("SHOW COLUMNS FROM twinnydb.interactions_all")
+    names = set(existing["Field"]) if len(existing) else set()
+    missing = [column for column in TOKEN_COLUMNS if column not in names]
+    if missing:
+        _db.send_query(
+            "ALTER TABLE twinnydb.interactions_all "
+            + ", ".join(f"ADD COLUMN {column} MEDIUMBLOB NULL" for column in missing)
+        )
+    return missing
@@ -0,0 +1,128 @@
+import os
+import re
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+
+TOKENIZER_WORKERS = max(1, (os.cpu_count() or 2) - 1)
+TOKENIZER_BATCH_SIZE = 256
+
+# Analyzers tried in order by stems(), nouns() and morphs() use the first one
+BACKENDS = {
+    "okt": ["Okt", "Hannanum"],
+    "hannanum": ["Hannanum"],
+    "simple": [],
+}
+
+# Particles stripped by the pure-Python backend, longest first
+_PARTICLES = sorted(
+    ["은", "는", "이", "가", "을", "를", "의", "에", "에서", "에게", "으로", "로", "와", "과", "도", "만", "까지", "부터", "이나", "나", "요", "입니다"],
+    key=len, reverse=True,
+)
+_WORD = re.compile(r"[가-힣]+|[A-Za-z]+|\d+")
+
+
+class SimpleAnalyzer:
+    # No JVM: regex words with trailing particles stripped, good enough for tests and dev boxes
+    def morphs(self, text):
+        return _WORD.findall(text)
+
+    def nouns(self, text):
+        nouns = []
+        for word in _WORD.findall(text):
+            if not "가" <= word[0] <= "힣":
+                continue
+            for particle in _PARTICLES:
+                if word.endswith(particle) and len(word) > len(particle):
+                    word = word[:-len(particle)]
+                    break
+            nouns.append(word)
+        return nouns
+
+
+class Backend:
+    def __init__(self, name):
+        self.name = name
+        if BACKENDS[name]:
+            from konlpy import tag
+            self.analyzers = [getattr(tag, analyzer)() for analyzer in BACKENDS[name]]
+        else:
+            self.analyzers = [SimpleAnalyzer()]
+
+    def morphs(self, texts):
+        return [self.analyzers[0].morphs(text) if text else [] for text in texts]
+
+    def nouns(self, texts):
+        return [self.analyzers[0].nouns(text) if text else [] for text in texts]
+
+    def stems(self, words):
+        # Nouns from the first analyzer that finds any, else the word itself
+        stemmed = []
+        for word in words:
+            for analyzer in self.analyzers:
+                nouns = analyzer.nouns(word)
+                if nouns:
+                    break
+            stemmed.append(nouns or [word])
+        return stemmed
+
+
+_worker_backend = None
+
+def _init_worker(name):
+    global _worker_backend
+    _worker_backend = Backend(name)
+    # Start the JVM now rather than on the first batch
+    _worker_backend.stems(["준비"])
+
+def _run_batch(method, texts):
+    return getattr(_worker_backend, method)(texts)
+
+
+class Tokenizer:
+    """Batch Korean tokenization on worker processes that each keep a warm analyzer.
+
+    `morphs`, `nouns` and `stems` take a list of texts and return one token list per
+    text, in order. Batches are spread over the pool so throughput scales with cores;
+    `workers=0` runs the backend in this process (ingest workers, tests).
+    """
+
+    def __init__(self, backend="okt", workers=TOKENIZER_WORKERS, batch_size=TOKENIZER_BATCH_SIZE):
+        self.backend = backend
+        self.workers = workers
+        self.batch_size = batch_size
+        self._local = None
+        self._pool = None
+
+    def _executor(self):
+        if self._pool is None:
+            # Spawned workers never inherit a JVM from this process
+            context = multiprocessing.get_context("spawn")
+            self._pool = ProcessPoolExecutor(self.workers, mp_context=context, initializer=_init_worker, initargs=(self.backend,))
+        return self._pool
+
+    def _run(self, method, texts):
+        texts = ["" if not isinstance(text, str) else text for text in texts]
+        if not texts:
+            return []
+        if self.workers == 0:
+            if self._local is None:
+                self._local = Backend(self.backend)
+            return getattr(self._local, method)(texts)
+        batches = [texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+        futures = [self._executor().submit(_run_batch, method, batch) for batch in batches]
+        return [tokens for future in futures for tokens in future.result()]
+
+    def morphs(self, texts):
+        return self._run("morphs", texts)
+
+    def nouns(self, texts):
+        return self._run("nouns", texts)
+
+    def stems(self, words):
+        return self._run("stems", words)
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None